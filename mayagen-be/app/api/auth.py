@@ -1,6 +1,6 @@
 from datetime import timedelta
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
@@ -10,6 +10,7 @@ from ..database import get_session
 from ..models import User
 from .deps import get_current_user
 from ..helpers import api_response_helper as responses
+from ..services.rate_limit import ip_limiter, username_limiter, client_ip
 
 from pydantic import BaseModel, EmailStr
 
@@ -20,11 +21,27 @@ class RegisterRequest(BaseModel):
 
 router = APIRouter()
 
+def _throttled(retry_after: int):
+    return responses.api_error(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        message="Too Many Attempts",
+        error=f"Too many attempts. Try again in {retry_after} seconds.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
 @router.post("/register")
 async def register(
     request: RegisterRequest,
+    http_request: Request,
     session: AsyncSession = Depends(get_session)
 ):
+    # Hashing is expensive: registrations count against the per-IP budget too
+    ip_key = client_ip(http_request)
+    retry_after = ip_limiter.retry_after(ip_key)
+    if retry_after:
+        return _throttled(retry_after)
+    ip_limiter.hit(ip_key)
+
     # Check existing user
     result = await session.execute(select(User).where((User.username == request.username) | (User.email == request.email)))
     if result.scalars().first():
@@ -38,7 +55,7 @@ async def register(
     db_user = User(
         username=request.username,
         email=request.email,
-        hashed_password=security.get_password_hash(request.password)
+        hashed_password=await security.get_password_hash_async(request.password)
     )
     session.add(db_user)
     await session.commit()
@@ -50,20 +67,32 @@ async def register(
 
 @router.post("/token")
 async def login_for_access_token(
+    http_request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_session)
 ):
+    # Throttle before doing any bcrypt work
+    ip_key = client_ip(http_request)
+    user_key = form_data.username.lower()
+    retry_after = ip_limiter.retry_after(ip_key) or username_limiter.retry_after(user_key)
+    if retry_after:
+        return _throttled(retry_after)
+    ip_limiter.hit(ip_key)
+
     # Authenticate User
     result = await session.execute(select(User).where(User.username == form_data.username))
     user = result.scalars().first()
     
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not user or not await security.verify_password_async(form_data.password, user.hashed_password):
+        username_limiter.hit(user_key)
         return responses.api_error(
             status_code=status.HTTP_401_UNAUTHORIZED,
             message="Login Failed",
             error="Incorrect username or password"
         )
         
+    username_limiter.reset(user_key)
+
     # Create Token
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
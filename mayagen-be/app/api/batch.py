@@ -2,16 +2,27 @@
 Batch API Routes for Bulk Image Generation.
 
 Endpoints:
-- POST /batch              Create new batch job
+- POST /batch              Create new batch job (JSON: template x variations,
+                           multipart: uploaded JSONL/CSV prompt file)
 - GET  /batch              List user's batch jobs
 - GET  /batch/{id}         Get batch job details
 - GET  /batch/{id}/preview Get sample prompts preview
+- GET  /batch/{id}/duplicates Near-duplicate image clusters
 - DELETE /batch/{id}       Cancel batch job
 """
 
-from typing import Optional, Dict, List, Any
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, Any, Tuple
+from datetime import datetime
+import asyncio
+import csv
+import logging
+import random
+import shutil
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from sqlmodel import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
@@ -19,11 +30,20 @@ import os
 from ..database import get_session
 from ..models import BatchJob, BatchJobStatus, User, Image, JobStatus
 from ..helpers import api_response_helper as responses
+from ..helpers import etag_helper
+from ..schemas import BATCH_IMAGE_COLUMNS, BatchImageItem
+from ..services.archive import batch_archives, stream_zip
+from ..services.storage import resolve_image_path, safe_category_name
+from ..services.events import publish_batch
+from ..services.prompt_files import SUFFIXES, discard_prompt_file, iter_prompt_rows, prompt_file_suffix
 from ..services.prompt_generator import generate_prompts, get_sample_prompts, estimate_unique_combinations, DEFAULT_VARIATIONS
+from ..services.duplicates import duplicate_index
 from . import deps
+from .jobs import MAX_IMAGE_SIZE, MIN_IMAGE_SIZE
 from ..core import config
 
 router = APIRouter()
+logger = logging.getLogger("batch")
 
 
 # Request/Response Models
@@ -31,31 +51,223 @@ class BatchJobCreate(BaseModel):
     name: str = "Untitled Batch"
     category: str
     target_subject: str
-    total_images: int = Field(ge=1, le=10000)  # Max 10k images per batch
+    total_images: int = Field(ge=1, le=config.BATCH_MAX_IMAGES)
     variations: Dict[str, List[str]] = {}
+    # Share per value, e.g. {"environments": {"outdoor": 0.7}} (others split the rest)
+    weights: Dict[str, Dict[str, float]] = {}
+    # Combinations never to generate, e.g. [{"environment": "underwater", "action": "running"}]
+    exclusions: List[Dict[str, str]] = []
     base_prompt_template: Optional[str] = None
     model: str = "sd15"
     provider: str = "comfyui"
     width: int = 512
     height: int = 512
     is_public: bool = True
+    seed: Optional[int] = Field(default=None, ge=0, lt=2 ** 31)  # Random if omitted
+    # Regenerate near-duplicates of earlier images with a new seed
+    requeue_duplicates: bool = False
+
+    @field_validator("category")
+    @classmethod
+    def flat_category(cls, value: str) -> str:
+        # Becomes the output folder name: never a path or a reserved folder
+        return safe_category_name(value)
+
+
+class BatchFileCreate(BaseModel):
+    """Form fields sent with a prompt file; rows may override model/size/category."""
+    name: str = "Untitled Batch"
+    category: str = "uncategorized"
+    model: str = "sd15"
+    provider: str = "comfyui"
+    width: int = 512
+    height: int = 512
+    is_public: bool = True
+    requeue_duplicates: bool = False
+
+    @field_validator("category")
+    @classmethod
+    def flat_category(cls, value: str) -> str:
+        # Rows without a category of their own fall back to this folder
+        return safe_category_name(value)
 
 
 class BatchJobPreviewRequest(BaseModel):
     target_subject: str
     variations: Dict[str, List[str]] = {}
+    weights: Dict[str, Dict[str, float]] = {}
+    exclusions: List[Dict[str, str]] = []
     base_prompt_template: Optional[str] = None
     count: int = Field(default=5, ge=1, le=10)
+    seed: Optional[int] = Field(default=None, ge=0, lt=2 ** 31)
+
+
+MAX_ROW_ERRORS = 50  # Invalid rows reported per upload (all rows are still checked)
+
+
+def _validation_error(e: ValidationError) -> RequestValidationError:
+    return RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+
+def _save_upload(source, path: str):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+
+
+def _scan_prompt_file(path: str, defaults: Dict[str, Any]) -> Tuple[int, int, List[Dict[str, Any]]]:
+    """One streaming pass: (valid rows, invalid rows, first MAX_ROW_ERRORS errors)."""
+    valid = invalid = 0
+    errors = []
+
+    def on_error(row: int, reason: str):
+        nonlocal invalid
+        invalid += 1
+        if len(errors) < MAX_ROW_ERRORS:
+            errors.append({"row": row, "error": reason})
+
+    for row in iter_prompt_rows(path, defaults, on_error=on_error):
+        if row.model not in config.WORKFLOWS:
+            on_error(row.index, f"unknown model '{row.model}'")
+        elif not (MIN_IMAGE_SIZE <= row.width <= MAX_IMAGE_SIZE and MIN_IMAGE_SIZE <= row.height <= MAX_IMAGE_SIZE):
+            on_error(row.index, f"width and height must be between {MIN_IMAGE_SIZE} and {MAX_IMAGE_SIZE}")
+        else:
+            valid += 1
+            if valid > config.BATCH_MAX_IMAGES:
+                break
+    return valid, invalid, errors
+
+
+async def create_file_batch(request: Request, session: AsyncSession, current_user: User):
+    """
+    Batch from an uploaded prompt file (multipart `file` plus BatchFileCreate
+    fields). The upload is spooled to disk, checked in one streaming pass and
+    kept under BATCH_UPLOAD_DIR; the worker expands it into image rows in
+    chunks like a template batch, then deletes it.
+    """
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        return responses.api_error(status_code=400, message="Invalid prompt file", error="Multipart body needs a 'file' field")
+    try:
+        suffix = prompt_file_suffix(upload.filename or "")
+        if suffix is None:
+            return responses.api_error(
+                status_code=400,
+                message="Invalid prompt file",
+                error=f"Unsupported file type, expected one of: {', '.join(SUFFIXES)} (optionally .gz)"
+            )
+        try:
+            data = BatchFileCreate.model_validate({key: value for key, value in form.items() if key != "file"})
+        except ValidationError as e:
+            raise _validation_error(e)
+
+        config.BATCH_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        path = str(config.BATCH_UPLOAD_DIR / f"{uuid.uuid4().hex}{suffix}")
+        defaults = {"model": data.model, "width": data.width, "height": data.height, "category": data.category}
+        try:
+            await asyncio.to_thread(_save_upload, upload.file, path)
+            total, invalid, errors = await asyncio.to_thread(_scan_prompt_file, path, defaults)
+        except (OSError, EOFError, ValueError, csv.Error) as e:
+            discard_prompt_file(path)
+            return responses.api_error(status_code=400, message="Invalid prompt file", error=str(e))
+    finally:
+        await upload.close()
+
+    if invalid or not total or total > config.BATCH_MAX_IMAGES:
+        discard_prompt_file(path)
+        if invalid:
+            return responses.api_error(
+                status_code=400,
+                message=f"{invalid} rows of {upload.filename} are invalid; no batch was created",
+                error=errors
+            )
+        error = "No prompts in file" if not total else f"At most {config.BATCH_MAX_IMAGES} prompts per file"
+        return responses.api_error(status_code=400, message="Invalid prompt file", error=error)
+
+    try:
+        batch = BatchJob(
+            name=data.name,
+            category=data.category,
+            target_subject=upload.filename,
+            total_images=total,
+            source="file",
+            prompt_file=path,
+            model=data.model,
+            provider=data.provider,
+            width=data.width,
+            height=data.height,
+            user_id=current_user.id,
+            status=BatchJobStatus.QUEUED,
+            is_public=data.is_public,
+            requeue_duplicates=data.requeue_duplicates
+        )
+        session.add(batch)
+        await session.commit()
+        await session.refresh(batch)
+    except Exception:
+        discard_prompt_file(path)
+        raise
+
+    return responses.api_success(
+        message="Batch job created successfully",
+        data={
+            "id": batch.id,
+            "name": batch.name,
+            "status": batch.status,
+            "source": batch.source,
+            "total_images": batch.total_images,
+            "created_at": batch.created_at.isoformat()
+        }
+    )
 
 
-@router.post("/batch")
+@router.post(
+    "/batch",
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": BatchJobCreate.model_json_schema()},
+        "multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary"},
+                **BatchFileCreate.model_json_schema()["properties"]
+            }
+        }}
+    }}}
+)
 async def create_batch_job(
-    data: BatchJobCreate,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(deps.get_current_user)
 ):
-    """Create a new batch job for bulk image generation."""
+    """
+    Create a new batch job for bulk image generation: a JSON BatchJobCreate
+    (template x variations), or a multipart prompt-file upload (see
+    create_file_batch).
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip().lower() == "multipart/form-data":
+        try:
+            return await create_file_batch(request, session, current_user)
+        except RequestValidationError:
+            raise
+        except Exception as e:
+            logger.exception("Failed to create prompt-file batch")
+            return responses.api_error(status_code=500, message="Failed to create batch job", error=str(e))
+
+    try:
+        data = BatchJobCreate.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise _validation_error(e)
+
     try:
+        # Exact feasible count; also rejects exclusions that rule out everything
+        try:
+            max_combinations = estimate_unique_combinations(
+                data.variations, data.base_prompt_template, data.weights, data.exclusions
+            )
+        except ValueError as e:
+            return responses.api_error(status_code=400, message="Invalid variations", error=str(e))
+        
         # Create batch job
         batch = BatchJob(
             name=data.name,
@@ -63,6 +275,8 @@ async def create_batch_job(
             target_subject=data.target_subject,
             total_images=data.total_images,
             variations=data.variations,
+            weights=data.weights or None,
+            exclusions=data.exclusions or None,
             base_prompt_template=data.base_prompt_template,
             model=data.model,
             provider=data.provider,
@@ -70,16 +284,15 @@ async def create_batch_job(
             height=data.height,
             user_id=current_user.id,
             status=BatchJobStatus.QUEUED,
-            is_public=data.is_public
+            is_public=data.is_public,
+            seed=data.seed if data.seed is not None else random.randrange(2 ** 31),
+            requeue_duplicates=data.requeue_duplicates
         )
         
         session.add(batch)
         await session.commit()
         await session.refresh(batch)
         
-        # Estimate combinations
-        max_combinations = estimate_unique_combinations(data.variations)
-        
         return responses.api_success(
             message="Batch job created successfully",
             data={
@@ -88,6 +301,7 @@ async def create_batch_job(
                 "status": batch.status,
                 "total_images": batch.total_images,
                 "max_unique_combinations": max_combinations,
+                "seed": batch.seed,
                 "created_at": batch.created_at.isoformat()
             }
         )
@@ -124,6 +338,7 @@ async def list_batch_jobs(
                 "generated_count": batch.generated_count,
                 "failed_count": batch.failed_count,
                 "progress": round((batch.generated_count / batch.total_images) * 100, 1) if batch.total_images > 0 else 0,
+                "source": batch.source,
                 "created_at": batch.created_at.isoformat()
             })
         
@@ -140,6 +355,7 @@ async def list_batch_jobs(
 @router.get("/batch/{batch_id}")
 async def get_batch_job(
     batch_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(deps.get_current_user)
 ):
@@ -154,6 +370,13 @@ async def get_batch_job(
         
         if not batch:
             return responses.api_error(status_code=404, message="Not Found", error="Batch job not found")
+
+        etag = etag_helper.make_etag(
+            "batch", batch.id, batch.updated_at.isoformat(), batch.status,
+            batch.generated_count, batch.failed_count
+        )
+        if etag_helper.is_not_modified(request, etag):
+            return etag_helper.not_modified(etag, private=True)
         
         return responses.api_success(
             message="Batch job retrieved",
@@ -168,7 +391,12 @@ async def get_batch_job(
                 "failed_count": batch.failed_count,
                 "progress": round((batch.generated_count / batch.total_images) * 100, 1) if batch.total_images > 0 else 0,
                 "variations": batch.variations,
+                "weights": batch.weights,
+                "exclusions": batch.exclusions,
                 "base_prompt_template": batch.base_prompt_template,
+                "seed": batch.seed,
+                "source": batch.source,
+                "requeue_duplicates": batch.requeue_duplicates,
                 "model": batch.model,
                 "provider": batch.provider,
                 "width": batch.width,
@@ -176,7 +404,8 @@ async def get_batch_job(
                 "error_message": batch.error_message,
                 "created_at": batch.created_at.isoformat(),
                 "updated_at": batch.updated_at.isoformat()
-            }
+            },
+            headers=etag_helper.etag_headers(etag, private=True)
         )
     except Exception as e:
         import traceback
@@ -195,10 +424,15 @@ async def preview_batch_prompts(
             target_subject=data.target_subject,
             variations=data.variations,
             template=data.base_prompt_template,
-            count=data.count
+            count=data.count,
+            seed=data.seed,
+            weights=data.weights,
+            exclusions=data.exclusions
         )
         
-        max_combinations = estimate_unique_combinations(data.variations)
+        max_combinations = estimate_unique_combinations(
+            data.variations, data.base_prompt_template, data.weights, data.exclusions
+        )
         
         return responses.api_success(
             message="Preview prompts generated",
@@ -207,6 +441,8 @@ async def preview_batch_prompts(
                 "max_unique_combinations": max_combinations
             }
         )
+    except ValueError as e:
+        return responses.api_error(status_code=400, message="Invalid variations", error=str(e))
     except Exception as e:
         return responses.api_error(status_code=500, message="Failed to generate preview", error=str(e))
 
@@ -236,7 +472,11 @@ async def cancel_batch_job(
                 error=f"Cannot cancel batch job with status: {batch.status}"
             )
         
+        now = datetime.utcnow()
         batch.status = BatchJobStatus.CANCELLED
+        batch.updated_at = now
+        # Not expanded yet (or halfway): the uploaded prompt file is no longer needed
+        prompt_file, batch.prompt_file = batch.prompt_file, None
         
         # Cancel all queued images for this batch
         from sqlalchemy import update
@@ -244,11 +484,14 @@ async def cancel_batch_job(
             update(Image)
             .where(Image.batch_job_id == batch_id)
             .where(Image.status == JobStatus.QUEUED)
-            .values(status=JobStatus.CANCELLED)
+            .values(status=JobStatus.CANCELLED, updated_at=now)
         )
         await session.execute(image_stmt)
         
         await session.commit()
+        discard_prompt_file(prompt_file)
+        await batch_archives.discard(batch.id)
+        await publish_batch(batch)
         
         return responses.api_success(
             message="Batch job cancelled",
@@ -295,40 +538,18 @@ async def get_batch_images(
         total_result = await session.execute(count_stmt)
         total = total_result.scalar_one()
 
-        # Get paginated images
-        base_url = config.API_BASE_URL + "/images"
+        # Get paginated images (only the columns the grid needs)
         offset = (page - 1) * limit
         
         statement = (
-            select(Image)
+            select(*BATCH_IMAGE_COLUMNS)
             .where(Image.batch_job_id == batch_id)
             .order_by(Image.created_at.desc())
             .offset(offset)
             .limit(limit)
         )
         results = await session.execute(statement)
-        images = results.scalars().all()
-
-        image_list = []
-        for img in images:
-            url = None
-            if img.status == JobStatus.COMPLETED:
-                safe_category = img.category.replace("\\", "/") if img.category else "uncategorized"
-                # Check absolute path logic? 
-                # Assuming api/images/ is generic, here we point to static or api route
-                # Current system seems to assume static serving or api route access
-                url = f"{base_url}/{safe_category}/{img.filename}"
-
-            image_list.append({
-                "id": img.id,
-                "filename": img.filename,
-                "category": img.category,
-                "url": url,
-                "prompt": img.prompt,
-                "model": img.model,
-                "status": img.status,
-                "created_at": img.created_at.isoformat()
-            })
+        image_list = [BatchImageItem.from_row(row) for row in results]
 
         return responses.api_success(
             message="Batch images retrieved",
@@ -350,18 +571,73 @@ async def get_batch_images(
         return responses.api_error(status_code=500, message="Failed to get batch images", error=str(e))
 
 
+@router.get("/batch/{batch_id}/duplicates")
+async def get_batch_duplicates(
+    batch_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(deps.get_current_user),
+    max_distance: Optional[int] = None,
+    limit: int = 50
+):
+    """
+    Clusters of near-identical images in a batch (perceptual hashes at most
+    `max_distance` bits apart, default PHASH_MAX_DISTANCE), largest first.
+    """
+    try:
+        batch_stmt = select(BatchJob.id).where(
+            BatchJob.id == batch_id,
+            BatchJob.user_id == current_user.id
+        )
+        if (await session.execute(batch_stmt)).scalar_one_or_none() is None:
+            return responses.api_error(status_code=404, message="Not Found", error="Batch job not found")
+        if not duplicate_index.ready:
+            return responses.api_error(
+                status_code=503, message="Service Unavailable", error="Near-duplicate index is still loading"
+            )
+
+        max_distance = duplicate_index.max_distance if max_distance is None else max(0, min(max_distance, 64))
+        clusters = duplicate_index.clusters(batch_id, max_distance)
+        shown = clusters[:max(1, limit)]
+
+        ids = [image_id for cluster in shown for image_id in cluster]
+        items = {}
+        if ids:
+            results = await session.execute(select(*BATCH_IMAGE_COLUMNS).where(Image.id.in_(ids)))
+            items = {row.id: BatchImageItem.from_row(row) for row in results}
+
+        return responses.api_success(
+            message="Near-duplicate clusters retrieved",
+            data={
+                "batch_id": batch_id,
+                "max_distance": max_distance,
+                "hashed_images": duplicate_index.hashed_count(batch_id),
+                "total_clusters": len(clusters),
+                # Images that could go while keeping one per cluster
+                "redundant_images": sum(len(cluster) - 1 for cluster in clusters),
+                "clusters": [
+                    [items[image_id] for image_id in cluster if image_id in items] for cluster in shown
+                ]
+            }
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return responses.api_error(status_code=500, message="Failed to get duplicates", error=str(e))
+
+
 @router.get("/batch/{batch_id}/download")
 async def download_batch_images(
     batch_id: int,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(deps.get_current_user)
 ):
-    """Download all images in a batch as a ZIP file."""
+    """
+    Download all images in a batch as a ZIP file.
+    COMPLETED batches are served from their prebuilt archive (Range / resume
+    supported). Otherwise the archive is streamed (STORED, ZIP64) while files
+    are read, so memory stays constant whatever the batch size.
+    """
     try:
-        import zipfile
-        import io
-        from fastapi import Response
-        
         # Verify batch
         batch_stmt = select(BatchJob).where(
             BatchJob.id == batch_id,
@@ -373,37 +649,33 @@ async def download_batch_images(
         if not batch:
             raise HTTPException(status_code=404, detail="Batch not found")
 
-        # Get completed images
-        stmt = select(Image).where(
+        # Filename: _MAYAGEN_{CATEGORY}_{RANDOMID}.zip
+        safe_cat = batch.category.replace("/", "_").replace("\\", "_").upper()
+        filename = f"_MAYAGEN_{safe_cat}_{batch.id}.zip"
+
+        if batch.status == BatchJobStatus.COMPLETED:
+            archive_path = batch_archives.get(batch.id)
+            if archive_path:
+                # FileResponse handles Range/If-Range and uses the server's pathsend/sendfile when available
+                return FileResponse(archive_path, media_type="application/zip", filename=filename)
+
+        # Only the columns needed to locate files; resolved before the response
+        # starts so the stream doesn't hold the DB session open
+        stmt = select(Image.filename, Image.category, Image.file_path).where(
             Image.batch_job_id == batch_id,
             Image.status == JobStatus.COMPLETED
-        )
+        ).order_by(Image.id)
         result = await session.execute(stmt)
-        images = result.scalars().all()
+        files = [
+            (row.filename, resolve_image_path(row.file_path, row.category, row.filename))
+            for row in result.all()
+        ]
         
-        if not images:
+        if not files:
              raise HTTPException(status_code=404, detail="No completed images to download")
 
-        # Create ZIP in memory
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            for img in images:
-                # Construct file path
-                # Ideally this should use a config for base path
-                base_path = "synthetic_dataset" 
-                file_path = os.path.join(base_path, img.category, img.filename)
-                
-                if os.path.exists(file_path):
-                    zip_file.write(file_path, img.filename)
-        
-        zip_buffer.seek(0)
-        
-        # Filename: _MAYAGEN_{CATEGORY}_{RANDOMID}.zip
-        safe_cat = batch.category.replace("/", "_").replace("\\", "_").upper()
-        filename = f"_MAYAGEN_{safe_cat}_{batch.id}.zip"
-        
-        return Response(
-            content=zip_buffer.getvalue(),
+        return StreamingResponse(
+            stream_zip(files),
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..core import config, security
 from ..database import get_session
 from ..models import User
+from ..services.auth_cache import auth_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
@@ -20,26 +21,21 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    result = await session.execute(select(User).where(User.username == username))
-    user = result.scalars().first()
+    user = await resolve_user(token, session)
     if user is None:
         raise credentials_exception
     return user
 
-async def get_current_user_optional(
-    token: Optional[str] = Depends(oauth2_scheme_optional),
-    session: AsyncSession = Depends(get_session)
-) -> Optional[User]:
+async def resolve_user(token: Optional[str], session: AsyncSession) -> Optional[User]:
+    """Decode a bearer token and load its user. None if missing/invalid."""
     if not token:
         return None
+
+    # Hot path: token already verified recently
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
         username: str = payload.get("sub")
@@ -50,7 +46,15 @@ async def get_current_user_optional(
         
     result = await session.execute(select(User).where(User.username == username))
     user = result.scalars().first()
+    if user is not None:
+        auth_cache.put(token, user, expires_at=payload.get("exp"))
     return user
 
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    session: AsyncSession = Depends(get_session)
+) -> Optional[User]:
+    return await resolve_user(token, session)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     return current_user
@@ -0,0 +1,241 @@
+"""
+Event Streaming Routes (server push for job & batch status).
+
+Endpoints:
+- GET /events/stream?jobs=1,2&batch=3   Server-Sent Events
+- WS  /events/ws                        WebSocket; send {"jobs": [...], "batch": [...]} to subscribe
+
+Browsers' EventSource cannot set headers, so both endpoints also accept ?token=<jwt>.
+On subscribe, the current state of every job/batch is sent first, then transitions
+as the worker produces them.
+"""
+
+import json
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+
+from ..core import config
+from ..database import get_session_context
+from ..models import BatchJob, Image, User
+from ..helpers import api_response_helper as responses
+from ..services.events import Subscription, event_broker, image_event, batch_event, image_topics
+from . import deps
+
+router = APIRouter()
+
+MAX_SUBSCRIPTIONS = 500
+
+
+def _parse_ids(raw: Optional[str]) -> List[int]:
+    if not raw:
+        return []
+    return [int(part) for part in raw.split(",") if part.strip()]
+
+
+async def _authorize(
+    user: Optional[User],
+    job_ids: List[int],
+    batch_ids: List[int]
+) -> List[str]:
+    """
+    Resolve requested ids to the topics this user may watch. Public jobs are
+    visible to anyone; private jobs and batches only to their owner.
+    """
+    topics: List[str] = []
+
+    async with get_session_context() as session:
+        if job_ids:
+            result = await session.execute(
+                select(Image.id, Image.is_public, Image.user_id).where(Image.id.in_(job_ids))
+            )
+            for img in result.all():
+                if img.is_public or (user and user.id == img.user_id):
+                    topics.append(f"image:{img.id}")
+
+        if batch_ids and user:
+            result = await session.execute(
+                select(BatchJob.id).where(BatchJob.id.in_(batch_ids), BatchJob.user_id == user.id)
+            )
+            topics.extend(f"batch:{batch_id}" for batch_id in result.scalars().all())
+
+    return topics
+
+
+async def _snapshot(topics: List[str]) -> List[Dict[str, Any]]:
+    """Current state of every job/batch behind `topics` (read after subscribing)."""
+    image_ids = [int(topic.split(":", 1)[1]) for topic in topics if topic.startswith("image:")]
+    batch_ids = [int(topic.split(":", 1)[1]) for topic in topics if topic.startswith("batch:")]
+    snapshot: List[Dict[str, Any]] = []
+
+    async with get_session_context() as session:
+        if image_ids:
+            result = await session.execute(select(Image).where(Image.id.in_(image_ids)))
+            for img in result.scalars().all():
+                snapshot.append({"event": "image", "data": image_event(img), "topics": image_topics(img.id)})
+        if batch_ids:
+            result = await session.execute(select(BatchJob).where(BatchJob.id.in_(batch_ids)))
+            for batch in result.scalars().all():
+                snapshot.append({"event": "batch", "data": batch_event(batch), "topics": [f"batch:{batch.id}"]})
+
+    return snapshot
+
+
+def _unseen(snapshot: List[Dict[str, Any]], sub: Subscription) -> List[Dict[str, Any]]:
+    """
+    Drop snapshot entries a queued event already supersedes: a transition
+    published while the snapshot was being read must not be followed by the
+    older state.
+    """
+    latest: Dict[Tuple[str, Any], str] = {}
+    for event in sub.pending():
+        key = (event["event"], event["data"].get("id"))
+        updated_at = event["data"].get("updated_at") or ""
+        if updated_at >= latest.get(key, ""):
+            latest[key] = updated_at
+
+    fresh = []
+    for event in snapshot:
+        queued = latest.get((event["event"], event["data"]["id"]))
+        if queued is not None and queued >= (event["data"].get("updated_at") or ""):
+            continue
+        fresh.append(event)
+    return fresh
+
+
+def _parse_message(raw: str) -> Tuple[List[int], List[int]]:
+    """Job and batch ids from a WebSocket subscribe message; ValueError if malformed."""
+    message = json.loads(raw)
+    if not isinstance(message, dict):
+        raise ValueError("Message must be an object like {\"jobs\": [1, 2], \"batch\": [3]}")
+    ids = []
+    for field in ("jobs", "batch"):
+        values = message.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in values):
+            raise ValueError(f"'{field}' must be a list of integers")
+        ids.append(values)
+    return ids[0], ids[1]
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+@router.get("/events/stream")
+async def stream_events(
+    request: Request,
+    jobs: Optional[str] = None,
+    batch: Optional[str] = None,
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(deps.oauth2_scheme_optional)
+):
+    """Server-Sent Events stream of status transitions for jobs and/or batches."""
+    try:
+        job_ids = _parse_ids(jobs)
+        batch_ids = _parse_ids(batch)
+    except ValueError:
+        return responses.api_error(status_code=422, message="Validation Error", error="jobs and batch must be comma-separated integers")
+
+    if not job_ids and not batch_ids:
+        return responses.api_error(status_code=400, message="Nothing to subscribe", error="Provide ?jobs=<ids> and/or ?batch=<ids>")
+    if len(job_ids) + len(batch_ids) > MAX_SUBSCRIPTIONS:
+        return responses.api_error(status_code=400, message="Too many subscriptions", error=f"At most {MAX_SUBSCRIPTIONS} ids per stream")
+
+    async with get_session_context() as session:
+        user = await deps.resolve_user(header_token or token, session)
+
+    topics = await _authorize(user, job_ids, batch_ids)
+    if not topics:
+        return responses.api_error(status_code=404, message="Not Found", error="No accessible jobs or batches")
+
+    # Subscribe before reading the snapshot so no transition falls in between
+    sub = event_broker.subscribe(topics)
+    try:
+        snapshot = _unseen(await _snapshot(topics), sub)
+    except Exception:
+        event_broker.unsubscribe(sub)
+        raise
+
+    async def event_generator():
+        try:
+            for event in snapshot:
+                yield _format_sse(event)
+            while True:
+                if await request.is_disconnected():
+                    break
+                event = await sub.get(timeout=config.EVENTS_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            event_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/events/ws")
+async def events_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    WebSocket variant. Client messages: {"jobs": [1, 2], "batch": [3]} (may be sent repeatedly).
+    Server messages: {"event": "image" | "batch", "data": {...}}.
+    """
+    await websocket.accept()
+
+    async with get_session_context() as session:
+        user = await deps.resolve_user(token, session)
+
+    sub = event_broker.subscribe([])
+
+    async def receive_subscriptions():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                raw = message.get("text")
+                if raw is None:
+                    raw = (message.get("bytes") or b"").decode("utf-8")
+                job_ids, batch_ids = _parse_message(raw)
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError too; a bad message never closes the socket
+                await websocket.send_json({"event": "error", "data": {"error": str(e)}})
+                continue
+            if len(sub.topics) + len(job_ids) + len(batch_ids) > MAX_SUBSCRIPTIONS:
+                await websocket.send_json({"event": "error", "data": {"error": f"At most {MAX_SUBSCRIPTIONS} subscriptions"}})
+                continue
+
+            topics = await _authorize(user, job_ids, batch_ids)
+            event_broker.extend(sub, topics)
+            for event in _unseen(await _snapshot(topics), sub):
+                sub.push(event)
+
+    async def send_events():
+        while True:
+            event = await sub.get(timeout=config.EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                await websocket.send_json({"event": "ping", "data": {}})
+                continue
+            await websocket.send_json({"event": event["event"], "data": event["data"]})
+
+    receiver = asyncio.create_task(receive_subscriptions())
+    sender = asyncio.create_task(send_events())
+    try:
+        done, pending = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            exc = task.exception()
+            if exc and not isinstance(exc, WebSocketDisconnect):
+                raise exc
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_broker.unsubscribe(sub)
@@ -1,18 +1,31 @@
+import asyncio
+import logging
 import os
+from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core import config
+from ..core.security import media_url_expiry
 from ..database import get_session
 from ..models import Image, User, JobStatus
 from ..models import Image, User, JobStatus
 from ..helpers import api_response_helper as responses
+from ..helpers import etag_helper
+from ..schemas import (
+    IMAGE_LIST_COLUMNS, RECENT_IMAGE_COLUMNS,
+    ImageListItem, RecentImageItem, image_url, public_url_expiry, thumbnail_urls
+)
+from ..services.cache import feed_cache
+from ..services.progress import progress_table
+from ..services.storage import image_view_path, relocate_image_files
+from ..services.object_storage import image_ext, image_key, object_storage, visibility_moves
 from . import deps
 
 router = APIRouter()
+logger = logging.getLogger("images")
 
 from sqlalchemy import case
 
@@ -22,6 +35,7 @@ from sqlalchemy import func
 
 @router.get("/images")
 async def list_images(
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: Optional[User] = Depends(deps.get_current_user_optional), # Optional auth
     page: int = 1,
@@ -29,68 +43,35 @@ async def list_images(
 ):
     try:
         """Lists generated images. Public feed."""
-        base_url = config.API_BASE_URL + "/images"
-        
-        # Calculate offset
-        offset = (page - 1) * limit
-        
-        # Base query for filtering
-        base_query = select(Image).where(Image.is_public == True).where(Image.status == JobStatus.COMPLETED)
-        
-        # Count total
-        count_statement = select(func.count()).select_from(base_query.subquery())
-        total_result = await session.execute(count_statement)
-        total = total_result.scalar_one()
-
-        # Custom sort order: COMPLETED (1), PROCESSING (2), QUEUED (3), FAILED (4)
-        status_order = case(
-            (Image.status == JobStatus.COMPLETED, 1),
-            (Image.status == JobStatus.PROCESSING, 2),
-            (Image.status == JobStatus.QUEUED, 3),
-            (Image.status == JobStatus.FAILED, 4),
-            else_=5
-        )
-        
-        # Query DB sorted by Status Priority then Created At desc
-        # Query DB sorted by Status Priority then Created At desc
-        # Filter: Only public images AND COMPLETED
-        statement = (
-            select(Image, User)
-            .join(User, isouter=True)
-            .where(Image.is_public == True)
-            .where(Image.status == JobStatus.COMPLETED)
-            .order_by(Image.created_at.desc())
-            .offset(offset)
-            .limit(limit)
-        )
-        results = await session.execute(statement)
-        # Results is list of (Image, User) tuples
-        
-        response_list = []
-        for img, user in results:
-            # Construct URL based on predictable structure: /images/{category}/{filename}
-            # Since we filter by COMPLETED, url is always generated
-            safe_category = img.category.replace("\\", "/") if img.category else "uncategorized"
-            url = f"{base_url}/{safe_category}/{img.filename}"
-
-            response_list.append({
-                "id": img.id,
-                "filename": img.filename,
-                "category": img.category,
-                "url": url,
-                "prompt": img.prompt,
-                "model": img.model,
-                "width": img.width,
-                "height": img.height,
-                "created_at": img.created_at.isoformat(),
-                "created_by": user.username if user else "Anonymous",
-                "is_public": img.is_public,
-                "status": img.status
-            })
+        async def load_page():
+            # Calculate offset
+            offset = (page - 1) * limit
             
-        return responses.api_success(
-            message="Images List Retrieved",
-            data={
+            # Count total
+            count_statement = (
+                select(func.count(Image.id))
+                .where(Image.is_public == True)
+                .where(Image.status == JobStatus.COMPLETED)
+            )
+            total_result = await session.execute(count_statement)
+            total = total_result.scalar_one()
+
+            # Query DB sorted by Created At desc, only the columns the list needs
+            # Filter: Only public images AND COMPLETED
+            statement = (
+                select(*IMAGE_LIST_COLUMNS, User.username)
+                .select_from(Image)
+                .join(User, Image.user_id == User.id, isouter=True)
+                .where(Image.is_public == True)
+                .where(Image.status == JobStatus.COMPLETED)
+                .order_by(Image.created_at.desc())
+                .offset(offset)
+                .limit(limit)
+            )
+            results = await session.execute(statement)
+            response_list = [ImageListItem.from_row(row, row.username) for row in results]
+
+            return {
                 "images": response_list,
                 "meta": {
                     "total": total,
@@ -99,6 +80,21 @@ async def list_images(
                     "total_pages": (total + limit - 1) // limit
                 }
             }
+
+        # Feed content only changes when the generation is bumped
+        # (or, with presigned bucket URLs, when the signing window rolls over)
+        generation = await feed_cache.generation()
+        etag = etag_helper.make_etag("images", generation, page, limit, public_url_expiry())
+        if etag_helper.is_not_modified(request, etag):
+            return etag_helper.not_modified(etag)
+
+        # Same public data for every visitor: serve from the feed cache
+        data = await feed_cache.get_or_compute("images", (page, limit), load_page)
+            
+        return responses.api_success(
+            message="Images List Retrieved",
+            data=data,
+            headers=etag_helper.etag_headers(etag)
         )
     except Exception as e:
         import traceback
@@ -108,6 +104,7 @@ async def list_images(
 
 @router.get("/images/me")
 async def get_my_images(
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(deps.get_current_user),
     page: int = 1,
@@ -115,8 +112,6 @@ async def get_my_images(
 ):
     """Get all images created by the current user (Private & Public)."""
     try:
-        base_url = config.API_BASE_URL + "/images"
-        
         offset = (page - 1) * limit
         
         # Custom sort order: COMPLETED (1), PROCESSING (2), QUEUED (3), FAILED (4)
@@ -128,42 +123,29 @@ async def get_my_images(
             else_=5
         )
 
-        # Count total
-        count_statement = select(func.count()).where(Image.user_id == current_user.id)
+        # Count total + latest change: together they fingerprint the collection
+        # (rows are never deleted, and every status change bumps updated_at)
+        count_statement = (
+            select(func.count(), func.max(Image.updated_at))
+            .where(Image.user_id == current_user.id)
+        )
         total_result = await session.execute(count_statement)
-        total = total_result.scalar_one()
+        total, last_updated = total_result.one()
+
+        # Signed URLs of private images change once per signing window
+        etag = etag_helper.make_etag("me", current_user.id, total, last_updated, page, limit, media_url_expiry())
+        if etag_helper.is_not_modified(request, etag):
+            return etag_helper.not_modified(etag, private=True)
 
         statement = (
-            select(Image)
+            select(*IMAGE_LIST_COLUMNS)
             .where(Image.user_id == current_user.id)
             .order_by(status_order, Image.created_at.desc())
             .offset(offset)
             .limit(limit)
         )
         results = await session.execute(statement)
-        images = results.scalars().all()
-        
-        response_list = []
-        for img in images:
-            url = None
-            if img.status == JobStatus.COMPLETED:
-                safe_category = img.category.replace("\\", "/") if img.category else "uncategorized"
-                url = f"{base_url}/{safe_category}/{img.filename}"
-
-            response_list.append({
-                "id": img.id,
-                "filename": img.filename,
-                "category": img.category,
-                "url": url,
-                "prompt": img.prompt,
-                "model": img.model,
-                "width": img.width,
-                "height": img.height,
-                "created_at": img.created_at.isoformat(),
-                "created_by": current_user.username,
-                "is_public": img.is_public,
-                "status": img.status
-            })
+        response_list = [ImageListItem.from_row(row, current_user.username) for row in results]
             
         return responses.api_success(
             message="User Collection Retrieved",
@@ -175,7 +157,8 @@ async def get_my_images(
                     "limit": limit,
                     "total_pages": (total + limit - 1) // limit
                 }
-            }
+            },
+            headers=etag_helper.etag_headers(etag, private=True)
         )
     except Exception as e:
         import traceback
@@ -184,46 +167,41 @@ async def get_my_images(
 
 @router.get("/images/recent")
 async def get_recent_images(
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: Optional[User] = Depends(deps.get_current_user_optional),
     limit: int = 8
 ):
     """Get recent COMPLETED images. If logged in, shows user's images. Else public."""
     try:
-        base_url = config.API_BASE_URL + "/images"
-        
-        # Custom sort order: COMPLETED (1), PROCESSING (2), QUEUED (3), FAILED (4)
-        # But for Recent Public Feed, we only want COMPLETED + PUBLIC
-        
-        statement = (
-            select(Image, User)
-            .join(User, isouter=True)
-            .where(Image.is_public == True)
-            .where(Image.status == JobStatus.COMPLETED)
-            .order_by(Image.created_at.desc())
-            .limit(limit)
-        )
+        async def load_recent():
+            # For Recent Public Feed, we only want COMPLETED + PUBLIC
+            statement = (
+                select(*RECENT_IMAGE_COLUMNS)
+                .select_from(Image)
+                .join(User, Image.user_id == User.id, isouter=True)
+                .where(Image.is_public == True)
+                .where(Image.status == JobStatus.COMPLETED)
+                .order_by(Image.created_at.desc())
+                .limit(limit)
+            )
 
-        results = await session.execute(statement)
-        
-        response_list = []
-        for img, user in results:
-            safe_category = img.category.replace("\\", "/") if img.category else "uncategorized"
-            url = f"{base_url}/{safe_category}/{img.filename}"
-            
-            response_list.append({
-                "id": img.id,
-                "filename": img.filename,
-                "url": url,
-                "prompt": img.prompt,
-                "category": img.category,
-                "model": img.model,
-                "created_by": user.username if user else "Anonymous"
-            })
+            results = await session.execute(statement)
+            response_list = [RecentImageItem.from_row(row) for row in results]
+
+            return {"images": response_list, "count": len(response_list)}
+
+        generation = await feed_cache.generation()
+        etag = etag_helper.make_etag("recent", generation, limit, public_url_expiry())
+        if etag_helper.is_not_modified(request, etag):
+            return etag_helper.not_modified(etag)
+
+        data = await feed_cache.get_or_compute("recent", (limit,), load_recent)
         
         return responses.api_success(
             message="Recent Images Retrieved",
-            data={"images": response_list, "count": len(response_list)}
+            data=data,
+            headers=etag_helper.etag_headers(etag)
         )
     except Exception as e:
         import traceback
@@ -233,13 +211,12 @@ async def get_recent_images(
 @router.get("/images/{image_id}")
 async def get_image(
     image_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     current_user: Optional[User] = Depends(deps.get_current_user_optional)
 ):
     try:
         """Get a single image detail."""
-        base_url = config.API_BASE_URL + "/images"
-        
         # Query with User join
         statement = select(Image, User).where(Image.id == image_id).join(User, isouter=True)
         result = await session.execute(statement)
@@ -255,10 +232,24 @@ async def get_image(
             if not current_user or current_user.id != img.user_id:
                 return responses.api_error(status_code=403, message="Access Denied", error="This image is private and can only be viewed by its creator.")
 
-        url = None
-        if img.status == JobStatus.COMPLETED:
-            safe_category = img.category.replace("\\", "/") if img.category else "uncategorized"
-            url = f"{base_url}/{safe_category}/{img.filename}"
+        # Checked after access control so a 304 never leaks a private image's existence
+        # Live progress (only while PROCESSING) changes the payload without touching the row
+        progress = progress_table.get(img.id) if img.status == JobStatus.PROCESSING else None
+        progress_version = (progress["step"], progress["max_steps"], progress["preview_seq"]) if progress else None
+
+        private = not img.is_public
+        etag = etag_helper.make_etag(
+            "image", img.id, img.updated_at.isoformat(), img.status, img.is_public, progress_version,
+            media_url_expiry() if private else public_url_expiry()
+        )
+        if etag_helper.is_not_modified(request, etag):
+            return etag_helper.not_modified(etag, private=private)
+
+        url = (
+            image_url(img.category, img.filename, img.is_public, img.content_hash, img.storage_backend)
+            if img.status == JobStatus.COMPLETED else None
+        )
+        thumb_url, srcset = thumbnail_urls(img.thumbnails, img.is_public, img.storage_backend)
 
         return responses.api_success(
             message="Image Detail Retrieved",
@@ -268,6 +259,8 @@ async def get_image(
                 "filename": img.filename,
                 "category": img.category,
                 "url": url,
+                "thumb_url": thumb_url,
+                "srcset": srcset,
                 "prompt": img.prompt,
                 "width": img.width,
                 "height": img.height,
@@ -276,13 +269,114 @@ async def get_image(
                 "created_at": img.created_at.isoformat(),
                 "created_by": user.username if user else "Anonymous",
                 "is_public": img.is_public,
-                "status": img.status
-            }
+                "status": img.status,
+                "progress": progress
+            },
+            headers=etag_helper.etag_headers(etag, private=private)
         )
     except Exception as e:
         return responses.api_error(status_code=500, message="Failed to retrieve image", error=str(e))
 
 
+async def _check_image_access(session: AsyncSession, image_id: int, current_user: Optional[User]):
+    """Returns (status, None) if the user may view the image, else (None, error response)."""
+    result = await session.execute(
+        select(Image.user_id, Image.is_public, Image.status).where(Image.id == image_id)
+    )
+    row = result.first()
+    if not row:
+        return None, responses.api_error(status_code=404, message="Not Found", error="Image not found")
+    if not row.is_public and (not current_user or current_user.id != row.user_id):
+        return None, responses.api_error(status_code=403, message="Access Denied", error="This image is private and can only be viewed by its creator.")
+    return row.status, None
+
+
+@router.get("/images/{image_id}/progress")
+async def get_image_progress(
+    image_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    """Step-level progress of a running job (step, max_steps, percent, eta_seconds)."""
+    try:
+        status, error = await _check_image_access(session, image_id, current_user)
+        if error:
+            return error
+
+        return responses.api_success(
+            message="Image Progress Retrieved",
+            data={
+                "id": image_id,
+                "status": status,
+                "progress": progress_table.get(image_id) if status == JobStatus.PROCESSING else None
+            },
+            headers={"Cache-Control": "no-store"}
+        )
+    except Exception as e:
+        return responses.api_error(status_code=500, message="Failed to retrieve progress", error=str(e))
+
+
+@router.get("/images/{image_id}/preview")
+async def get_image_preview(
+    image_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    """Latest low-resolution preview frame of a running job."""
+    try:
+        status, error = await _check_image_access(session, image_id, current_user)
+        if error:
+            return error
+
+        preview = progress_table.get_preview(image_id)
+        if not preview:
+            return responses.api_error(status_code=404, message="Not Found", error="No preview available")
+
+        data, media_type = preview
+        return Response(content=data, media_type=media_type, headers={"Cache-Control": "no-store"})
+    except Exception as e:
+        return responses.api_error(status_code=500, message="Failed to retrieve preview", error=str(e))
+
+
+async def _move_image_files(
+    session: AsyncSession,
+    img: Image,
+    file_path: Optional[str],
+    to_public: bool,
+    best_effort: bool = False
+) -> None:
+    """
+    Move an image's files (view, thumbnails, bucket objects) into the public or
+    private tree. `best_effort` (used to undo a failed move) logs errors instead
+    of raising them.
+    """
+    try:
+        await asyncio.to_thread(
+            relocate_image_files, file_path, img.category, img.filename, img.thumbnails, to_public
+        )
+        if img.storage_backend != "local":
+            # Content-addressed keys can be shared by identical outputs; keep the
+            # old object if another image still references it
+            keep = []
+            ext = image_ext(img.filename)
+            if img.content_hash:
+                shared = await session.execute(
+                    select(func.count()).where(
+                        Image.content_hash == img.content_hash,
+                        Image.id != img.id,
+                        Image.is_public == (not to_public),
+                        Image.storage_backend == img.storage_backend
+                    )
+                )
+                if shared.scalar_one():
+                    keep.append(image_key(img.content_hash, not to_public, ext))
+            await object_storage.move(visibility_moves(img.content_hash, img.thumbnails, to_public, ext), keep=keep)
+    except Exception:
+        if not best_effort:
+            raise
+        logger.exception(f"Could not move files of image {img.id} back")
+
+
 class ImageUpdate(BaseModel):
     is_public: Optional[bool] = None
 
@@ -305,12 +399,37 @@ async def update_image(
         if img.user_id != current_user.id:
             return responses.api_error(status_code=403, message="Access Denied", error="You can only update your own images")
             
+        visibility_changed = data.is_public is not None and data.is_public != img.is_public
+        was_public, old_file_path, old_updated_at = img.is_public, img.file_path, img.updated_at
         if data.is_public is not None:
             img.is_public = data.is_public
-            
+        img.updated_at = datetime.utcnow()
+
+        # Files move between the public and the private (signed URL only) tree.
+        # Jobs still generating are moved by the worker when they complete.
+        move_files = visibility_changed and img.status == JobStatus.COMPLETED
+        if move_files and img.filename:
+            img.file_path = image_view_path(img.category, img.filename, img.is_public)
+
+        # Row first, files second (as the compactor does): a failed commit or a
+        # cancelled request leaves the files where the row says they are
         session.add(img)
         await session.commit()
-        await session.refresh(img)
+
+        if move_files:
+            try:
+                await _move_image_files(session, img, old_file_path, img.is_public)
+            except Exception:
+                logger.exception(f"Moving files of image {img.id} failed, reverting visibility")
+                await _move_image_files(session, img, img.file_path, was_public, best_effort=True)
+                img.is_public, img.file_path, img.updated_at = was_public, old_file_path, old_updated_at
+                session.add(img)
+                await session.commit()
+                raise
+
+        # Public feed pages may now include/exclude this image
+        if visibility_changed and img.status == JobStatus.COMPLETED:
+            await feed_cache.invalidate()
         
         return responses.api_success(
             message="Image updated",
@@ -1,13 +1,20 @@
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core import config
 from ..database import get_session
 from ..models import Image, User, JobStatus
-from ..models import Image, User, JobStatus
+from ..models import BatchJob, BatchJobStatus
 from . import deps
 from ..helpers import api_response_helper as responses
+from ..services.events import publish_batch
+from ..services.storage import safe_category_name
 
 router = APIRouter()
 
@@ -28,8 +35,14 @@ async def generate_image(
     current_user: User = Depends(deps.get_current_user)
 ):
     try:
+        # Same checks as every row of /generate/bulk
+        try:
+            _check_request(req)
+        except ValueError as e:
+            return responses.api_error(status_code=400, message="Invalid request", error=str(e))
+
         # Determine Folder Path (Still needed for the filename)
-        safe_category = "".join([c for c in req.category if c.isalnum() or c in (' ', '_', '-')]).strip().replace(" ", "_")
+        safe_category = safe_category_name(req.category)
         
         # We define the Target Path, but don't create file yet
         filename = f"{req.filename_prefix}_{uuid.uuid4().hex}.png"
@@ -59,7 +72,7 @@ async def generate_image(
             data={
                 "status": "QUEUED",
                 "job_id": db_image.id,
-                "message": "Job queued successfully. Please poll /api/images/{id} for status.",
+                "message": "Job queued successfully. Subscribe to /api/v1/events/stream?jobs={id} (or poll /api/v1/images/{id}) for status.",
                 "prompt": req.prompt,
                 "category": safe_category
             }
@@ -67,3 +80,255 @@ async def generate_image(
 
     except Exception as e:
         return responses.api_error(status_code=500, message="Generation Failed", error=str(e))
+
+
+# Bulk submission: content types read as one job spec per line
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+BULK_MAX_ERRORS = 50  # Row errors reported per request (all rows are still checked)
+MIN_IMAGE_SIZE, MAX_IMAGE_SIZE = 64, 2048
+
+class BodyTooLarge(Exception):
+    """The bulk body is over BULK_MAX_BODY_BYTES (answered with 413)."""
+
+
+async def _capped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass chunks through, failing once more than BULK_MAX_BODY_BYTES went by."""
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > config.BULK_MAX_BODY_BYTES:
+            raise BodyTooLarge()
+        yield chunk
+
+async def _read_all(chunks: AsyncIterator[bytes]) -> bytes:
+    """Whole (capped) body, for the JSON array form which can't be parsed row by row."""
+    data = bytearray()
+    async for chunk in _capped(chunks):
+        data += chunk
+    return bytes(data)
+
+async def _ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """(row, raw line) per non-empty line, parsed as the body streams in."""
+    buffer = b""
+    row = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield row, line
+                row += 1
+    if buffer.strip():
+        yield row, buffer
+
+async def _upload_chunks(upload) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(1024 * 1024):
+        yield chunk
+
+async def _json_items(data: bytes) -> AsyncIterator[Tuple[int, Any]]:
+    specs = json.loads(data)
+    if isinstance(specs, dict):
+        specs = specs.get("jobs")
+    if not isinstance(specs, list):
+        raise ValueError('Expected a JSON array of jobs (or {"jobs": [...]})')
+    for row, spec in enumerate(specs):
+        yield row, spec
+
+async def _bulk_specs(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Raw job specs from the body: a JSON array (or {"jobs": [...]}), NDJSON
+    (streamed, never buffered whole), or a multipart upload in the `file`
+    field (.json is read as an array, anything else as NDJSON).
+    Every form is capped at BULK_MAX_BODY_BYTES (BodyTooLarge), checked
+    against Content-Length first when the client sends one.
+    """
+    try:
+        declared = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        declared = 0
+    if declared > config.BULK_MAX_BODY_BYTES:
+        raise BodyTooLarge()
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise ValueError("Multipart body needs a 'file' field")
+        if (upload.filename or "").lower().endswith(".json"):
+            return _json_items(await _read_all(_upload_chunks(upload)))
+        return _ndjson_lines(_capped(_upload_chunks(upload)))
+    if content_type in NDJSON_TYPES:
+        return _ndjson_lines(_capped(request.stream()))
+    return _json_items(await _read_all(request.stream()))
+
+def _check_request(req: GenerateRequest) -> None:
+    """Checks shared by /generate and every /generate/bulk row (ValueError)."""
+    if not req.prompt.strip():
+        raise ValueError("prompt is empty")
+    if req.model not in config.WORKFLOWS:
+        raise ValueError(f"unknown model '{req.model}' (available: {', '.join(config.WORKFLOWS)})")
+    for name, size in (("width", req.width), ("height", req.height)):
+        if not MIN_IMAGE_SIZE <= size <= MAX_IMAGE_SIZE:
+            raise ValueError(f"{name} must be between {MIN_IMAGE_SIZE} and {MAX_IMAGE_SIZE}")
+
+def _validate_spec(spec: Any) -> GenerateRequest:
+    req = GenerateRequest.model_validate_json(spec) if isinstance(spec, bytes) else GenerateRequest.model_validate(spec)
+    _check_request(req)
+    return req
+
+def _spec_error(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors(include_url=False)
+        )
+    return str(e)
+
+def _body_too_large():
+    return responses.api_error(
+        status_code=413,
+        message="Request body too large",
+        error=f"At most {config.BULK_MAX_BODY_BYTES} bytes per request"
+    )
+
+@router.post("/generate/bulk")
+async def generate_bulk(
+    request: Request,
+    batch_name: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Queue many `/generate` jobs in one request.
+
+    Body: a JSON array of job specs, NDJSON (Content-Type: application/x-ndjson)
+    or a multipart upload (`file`). Every row is validated; if any row is
+    invalid nothing is queued and the errors are returned by row number.
+    The body is read and validated in full before the database is touched
+    (at most BULK_MAX_BODY_BYTES of body and BULK_MAX_JOBS small rows are
+    held, 413 past either); then the rows are inserted
+    BULK_INSERT_CHUNK_SIZE at a time as multi-row INSERT ... RETURNING
+    statements, in one short transaction.
+
+    With `?batch_name=...` the jobs are also grouped under a new batch job,
+    so /batch/{id} (progress, events, ZIP download, cancel) works for them.
+    """
+    try:
+        user_id = current_user.id
+        # Nothing stays open (not even the auth lookup's transaction) while the body uploads
+        await session.close()
+
+        try:
+            specs = await _bulk_specs(request)
+        except BodyTooLarge:
+            return _body_too_large()
+        except (ValueError, UnicodeDecodeError) as e:
+            return responses.api_error(status_code=400, message="Invalid request body", error=str(e))
+
+        rows = []
+        errors = []
+        invalid = 0
+        count = 0
+        first = None
+        categories = set()
+        now = datetime.utcnow()
+
+        try:
+            async for row, spec in specs:
+                count += 1
+                if count > config.BULK_MAX_JOBS:
+                    return responses.api_error(
+                        status_code=413,
+                        message="Too many jobs",
+                        error=f"At most {config.BULK_MAX_JOBS} jobs per request"
+                    )
+                try:
+                    req = _validate_spec(spec)
+                except (ValidationError, ValueError) as e:
+                    invalid += 1
+                    if len(errors) < BULK_MAX_ERRORS:
+                        errors.append({"row": row, "error": _spec_error(e)})
+                    continue
+                if invalid:
+                    continue  # Keep checking the remaining rows, but don't keep them
+
+                first = first or req
+                safe_category = safe_category_name(req.category)
+                categories.add(safe_category)
+                filename = f"{req.filename_prefix}_{uuid.uuid4().hex}.png"
+                rows.append({
+                    "filename": filename,
+                    "file_path": filename,
+                    "prompt": req.prompt,
+                    "width": req.width,
+                    "height": req.height,
+                    "model": req.model,
+                    "provider": req.provider,
+                    "category": safe_category,
+                    "user_id": user_id,
+                    "batch_job_id": None,
+                    "status": JobStatus.QUEUED,
+                    "is_public": req.is_public,
+                    "storage_backend": "local",
+                    "created_at": now,
+                    "updated_at": now
+                })
+        except BodyTooLarge:
+            return _body_too_large()
+        except (ValueError, UnicodeDecodeError) as e:
+            return responses.api_error(status_code=400, message="Invalid request body", error=str(e))
+
+        if invalid:
+            return responses.api_error(
+                status_code=400,
+                message=f"{invalid} of {count} jobs are invalid; nothing was queued",
+                error=errors
+            )
+        if not count:
+            return responses.api_error(status_code=400, message="Invalid request body", error="No jobs given")
+
+        batch = None
+        if batch_name is not None:
+            # Nobody sees it (or its images) before the commit
+            batch = BatchJob(
+                name=batch_name or "Untitled Batch",
+                category=categories.pop() if len(categories) == 1 else "mixed",
+                target_subject="bulk",
+                total_images=len(rows),
+                source="bulk",
+                model=first.model,
+                provider=first.provider,
+                width=first.width,
+                height=first.height,
+                is_public=first.is_public,
+                user_id=user_id,
+                status=BatchJobStatus.GENERATING
+            )
+            session.add(batch)
+            await session.flush()
+            for values in rows:
+                values["batch_job_id"] = batch.id
+
+        statement = insert(Image).returning(Image.id, sort_by_parameter_order=True)
+        job_ids = []
+        for start in range(0, len(rows), config.BULK_INSERT_CHUNK_SIZE):
+            result = await session.execute(statement, rows[start:start + config.BULK_INSERT_CHUNK_SIZE])
+            job_ids.extend(result.scalars().all())
+        await session.commit()
+        if batch:
+            await session.refresh(batch)
+            await publish_batch(batch)
+
+        return responses.api_success(
+            message=f"{len(job_ids)} jobs queued successfully",
+            data={
+                "status": "QUEUED",
+                "count": len(job_ids),
+                "batch_id": batch.id if batch else None,
+                "job_ids": job_ids
+            }
+        )
+
+    except Exception as e:
+        await session.rollback()
+        return responses.api_error(status_code=500, message="Bulk generation failed", error=str(e))
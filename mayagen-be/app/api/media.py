@@ -0,0 +1,138 @@
+"""
+Media Router (generated images and thumbnails).
+
+Replaces the StaticFiles mounts with cache-friendly delivery:
+- `Cache-Control: public, max-age=..., immutable` for versioned image URLs
+  (`?v=<sha256>`, see app.schemas.media_url), but only when the file is the
+  content-addressed object of that hash (same inode, see services.storage),
+  so the URL really can't serve anything else. A category path can stop
+  serving its file (made private, compacted to WebP), so everything else
+  gets a short max-age and must revalidate
+- strong ETag without reading the file: the content hash for verified
+  versions, else the file's mtime and size
+- Range / If-Range and HEAD via FileResponse (pathsend when the server supports it)
+- private images (under `_private/`) only with a valid signed URL, checked
+  statelessly from `exp`/`sig` (no DB lookup)
+- optional hand-off to a front proxy:
+    MEDIA_ACCEL=nginx    -> X-Accel-Redirect: {MEDIA_ACCEL_PREFIX}/images/cats/x.png
+    MEDIA_ACCEL=sendfile -> X-Sendfile: /abs/path/x.png  (Apache mod_xsendfile, lighttpd)
+
+nginx example for the accel mode:
+    location /_media/images/ { internal; alias /app/synthetic_dataset/; }
+    location /_media/thumbs/ { internal; alias /app/thumbnails/; }
+"""
+
+import asyncio
+import os
+import re
+import time
+from stat import S_ISREG
+from typing import Tuple
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from ..core import config
+from ..core.security import verify_media_signature
+from ..helpers import etag_helper
+from ..services.storage import object_path
+
+router = APIRouter()
+
+MEDIA_ROOTS = {
+    "images": os.path.realpath(config.OUTPUT_FOLDER),
+    "thumbs": os.path.realpath(str(config.THUMBNAILS_DIR)),
+}
+
+CACHE_CONTROL = f"public, max-age={config.MEDIA_CACHE_MAX_AGE}, immutable"
+UNVERSIONED_CACHE_CONTROL = f"public, max-age={config.MEDIA_UNVERSIONED_MAX_AGE}, must-revalidate"
+
+
+SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+def _is_content_version(full_path: str, stat: os.stat_result, version: str) -> bool:
+    """True if `full_path` is a view of the stored object for content hash `version`."""
+    if not SHA256_HEX.fullmatch(version):
+        return False
+    try:
+        obj = os.stat(object_path(version, os.path.splitext(full_path)[1]))
+    except OSError:
+        return False
+    return (obj.st_dev, obj.st_ino) == (stat.st_dev, stat.st_ino)
+
+
+def resolve_media_path(root_name: str, relative_path: str) -> Tuple[str, os.stat_result]:
+    """(absolute path, stat) under a media root; 404 for traversal, hidden or missing files."""
+    root = MEDIA_ROOTS[root_name]
+    parts = relative_path.replace("\\", "/").split("/")
+    if any(part in ("", ".", "..") or part.startswith(".") for part in parts):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if parts[0] == config.STORAGE_OBJECTS_PREFIX:
+        # Object store is reachable only through category views (keeps private content private)
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    full_path = os.path.realpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, full_path]) != root:
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not S_ISREG(stat.st_mode):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return full_path, stat
+
+
+def _check_signature(request: Request, root_name: str, relative_path: str) -> int:
+    """Verify exp/sig of a private file URL (see app.schemas.media_url); returns the expiry."""
+    try:
+        expires = int(request.query_params.get("exp", ""))
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Missing or malformed signature")
+    signature = request.query_params.get("sig", "")
+    if not verify_media_signature(f"{root_name}/{relative_path}", expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    return expires
+
+
+async def serve_media(request: Request, root_name: str, relative_path: str) -> Response:
+    cache_control = UNVERSIONED_CACHE_CONTROL
+    if relative_path.split("/", 1)[0] == config.PRIVATE_MEDIA_PREFIX:
+        # Checked before touching the filesystem; the signed URL itself is the
+        # cache key, so it may be cached (by CDNs too) until it expires
+        expires = _check_signature(request, root_name, relative_path)
+        cache_control = f"public, max-age={max(0, expires - int(time.time()))}, immutable"
+
+    full_path, stat = await asyncio.to_thread(resolve_media_path, root_name, relative_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    version = request.query_params.get("v")
+    if version and root_name == "images" and await asyncio.to_thread(_is_content_version, full_path, stat, version):
+        etag = f'"{version}"'
+        if cache_control == UNVERSIONED_CACHE_CONTROL:
+            cache_control = CACHE_CONTROL
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if etag_helper.is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if config.MEDIA_ACCEL == "nginx":
+        headers["X-Accel-Redirect"] = f"{config.MEDIA_ACCEL_PREFIX}/{root_name}/{quote(relative_path)}"
+        return Response(headers=headers)
+    if config.MEDIA_ACCEL == "sendfile":
+        headers["X-Sendfile"] = full_path
+        return Response(headers=headers)
+
+    # FileResponse keeps our ETag (setdefault) and uses it for If-Range checks
+    return FileResponse(full_path, headers=headers, stat_result=stat)
+
+
+@router.api_route("/images/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_image_file(file_path: str, request: Request):
+    return await serve_media(request, "images", file_path)
+
+
+@router.api_route("/thumbs/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_thumbnail_file(file_path: str, request: Request):
+    return await serve_media(request, "thumbs", file_path)
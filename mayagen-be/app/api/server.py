@@ -1,13 +1,16 @@
 import os
 from fastapi import FastAPI, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from ..core import config
 from ..database import init_db
 from ..services.worker import worker_loop
+from ..services.events import event_broker
+from ..services.thumbnails import thumbnail_service
+from ..services.compactor import compactor
+from ..services.duplicates import duplicate_index
 from ..helpers import api_response_helper as responses
-from . import auth, images, jobs, batch
+from . import auth, images, jobs, batch, events, media
 import asyncio
 
 app = FastAPI(title="MayaGen FastAPI")
@@ -57,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Create versioned API router
@@ -65,18 +69,32 @@ api_v1.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_v1.include_router(images.router, tags=["images"])
 api_v1.include_router(jobs.router, tags=["jobs"])
 api_v1.include_router(batch.router, tags=["batch"])
+api_v1.include_router(events.router, tags=["events"])
 
 # Include versioned router in app
 app.include_router(api_v1)
 
-# Mount static files
-app.mount("/images", StaticFiles(directory=config.OUTPUT_FOLDER), name="images")
+# Generated files (/images, /thumbs): immutable caching, content ETags, Range
+app.include_router(media.router)
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    # Start event fan-out (and the Postgres LISTEN bridge if enabled)
+    await event_broker.start()
+    # Near-duplicate index: saved copy + rows hashed since (loads in the background)
+    asyncio.create_task(duplicate_index.start())
     # Start Background Worker
     asyncio.create_task(worker_loop())
+    # Lossless recompression of finished images (low priority, off by default)
+    if config.COMPACTOR_ENABLED:
+        asyncio.create_task(compactor.loop())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    thumbnail_service.shutdown()
+    compactor.shutdown()
+    duplicate_index.shutdown()
 
 @app.get("/health")
 def health_check():
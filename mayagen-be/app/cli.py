@@ -1,36 +1,171 @@
 import os
+import json
 import time
+import queue
+import hashlib
 import argparse
+import threading
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from pathlib import Path
 from .core import config
 from .services.comfy_client import ComfyUIProvider
+from .services.prompt_files import PromptRow, iter_grouped_rows, iter_prompt_rows, safe_category
 
-def load_prompts(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+def entry_key(row: PromptRow) -> str:
+    """Stable id of a prompt-file row: survives reruns, changes if the row is edited."""
+    content = "\0".join(str(part) for part in (
+        row.model, row.prompt, row.negative_prompt, row.seed, row.width, row.height, row.category, row.filename
+    ))
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+    return f"{row.index:06d}-{digest}"
+
+class ManifestIndex:
+    """
+    What previous runs finished, by row index: a status byte and a 32-bit tag
+    of the row's key per index (5 bytes/row) instead of a dict of records, so
+    resuming a huge prompt file stays cheap. A torn last line (killed
+    mid-write) is ignored.
+    """
+    COMPLETED, FAILED = 1, 2
+
+    def __init__(self, manifest_path: Path):
+        self.status = bytearray()
+        self.tags = array('I')
+        if not manifest_path.exists():
+            return
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    index, tag = self._parse(record["key"])
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+                if index >= len(self.status):
+                    grow = index + 1 - len(self.status)
+                    self.status.extend(bytes(grow))
+                    self.tags.extend([0] * grow)
+                self.status[index] = self.COMPLETED if record.get("status") == "completed" else self.FAILED
+                self.tags[index] = tag
+
+    @staticmethod
+    def _parse(key: str):
+        index, digest = key.split("-", 1)
+        return int(index), int(digest[:8], 16)
+
+    def get(self, key: str) -> int:
+        """COMPLETED/FAILED if this exact row was recorded, else 0."""
+        index, tag = self._parse(key)
+        if index < len(self.status) and self.tags[index] == tag:
+            return self.status[index]
+        return 0
+
+def categorize(prompt_text: str) -> str:
+    # Categorize based on simple keyword matching (mimics the API folder structure)
+    if "portrait" in prompt_text.lower(): return "Portraits"
+    if "landscape" in prompt_text.lower(): return "Landscapes"
+    return "uncategorized"
+
+def output_file(row: PromptRow) -> str:
+    """Relative output path: deterministic, so a rerun finds (and skips) it."""
+    category = safe_category(row.category or categorize(row.prompt))
+    if row.filename:
+        name = os.path.basename(row.filename.replace("\\", "/"))
+        stem, ext = os.path.splitext(name)
+        return f"{category}/{stem}{ext or '.png'}"
+    # Create a safe filename (row number keeps same-text prompts apart)
+    safe_prompt = "".join([c for c in row.prompt[:30] if c.isalnum() or c in (' ', '_')]).strip().replace(" ", "_")
+    return f"{category}/{row.model}_{row.index + 1:06d}_{safe_prompt}.png"
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ManifestWriter:
+    """Appends one JSON line per finished entry; flushed and fsynced so a crash loses nothing."""
+    def __init__(self, path: Path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def generate_entry(entry: dict, hosts: "queue.Queue[str]", args) -> dict:
+    """Runs on a pool thread: borrow a free host slot, generate, return the manifest record."""
+    final_path = Path(args.output) / entry["file"]
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a temp name: a half-downloaded file is never mistaken for a result
+    part_path = final_path.with_name(final_path.name + ".part")
+
+    error = None
+    host = None
+    started = time.perf_counter()
+    for attempt in range(args.retries + 1):
+        host = hosts.get()
+        try:
+            # One provider (websocket + client id) per generation: providers aren't thread-safe
+            provider = ComfyUIProvider(host)
+            provider.generate(
+                entry["prompt"], str(part_path),
+                width=entry["width"], height=entry["height"],
+                workflow_path=config.WORKFLOWS[entry["model"]],
+                negative_prompt=entry["negative_prompt"], seed=entry["seed"]
+            )
+            os.replace(part_path, final_path)
+            error = None
+            break
+        except Exception as e:
+            error = str(e)
+        finally:
+            hosts.put(host)
+        if attempt < args.retries:
+            time.sleep(min(30, 2 ** attempt))
+
+    return {
+        **entry,
+        "status": "failed" if error else "completed",
+        "error": error,
+        "host": host,
+        "seconds": round(time.perf_counter() - started, 2),
+        "finished_at": datetime.utcnow().isoformat()
+    }
 
 def run_batch_generation():
     parser = argparse.ArgumentParser(description="MayaGen Synthetic Data Automation")
-    parser.add_argument("--model", type=str, default="lcm", choices=config.WORKFLOWS.keys(), help="Model to use (lcm, sd15, flux)")
-    parser.add_argument("--input", type=str, default="prompts.txt", help="Path to prompts file")
+    parser.add_argument("--model", type=str, default="lcm", choices=config.WORKFLOWS.keys(), help="Default model for rows without one (lcm, sd15, flux)")
+    parser.add_argument("--input", type=str, default="prompts.txt", help="Prompts file: .txt, .jsonl or .csv (optionally .gz)")
     parser.add_argument("--output", type=str, default=config.OUTPUT_FOLDER, help="Output directory")
+    parser.add_argument("--hosts", type=str, default=config.COMFYUI["server_address"], help="Comma-separated ComfyUI servers (host:port,...)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent generations per host")
+    parser.add_argument("--manifest", type=str, default=None, help="JSONL manifest (default: <output>/manifest_<input name>.jsonl)")
+    parser.add_argument("--retries", type=int, default=1, help="Retries per prompt (on another free host)")
+    parser.add_argument("--retry-failed", action="store_true", help="Also rerun entries the manifest records as failed")
+    parser.add_argument("--no-group", action="store_true", help="Keep file order instead of grouping rows by model and size")
+    parser.add_argument("--width", type=int, default=512, help="Default width")
+    parser.add_argument("--height", type=int, default=512, help="Default height")
+    parser.add_argument("--negative", type=str, default=None, help="Default negative prompt (else the workflow's)")
+    parser.add_argument("--category", type=str, default=None, help="Default category (else guessed from the prompt)")
     args = parser.parse_args()
 
+    hosts = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    workers = max(1, args.concurrency) * len(hosts)
+
     print("============================================")
-    print(f" MAYAGEN AUTOMATION | Model: {args.model.upper()}")
+    print(f" MAYAGEN AUTOMATION | Default model: {args.model.upper()}")
+    print(f" Hosts: {', '.join(hosts)} | Concurrency: {workers}")
     print("============================================")
 
     # 1. Setup
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
-    
-    provider = ComfyUIProvider(config.COMFYUI["server_address"])
-    
-    # Resolve Workflow
-    workflow_path = config.WORKFLOWS.get(args.model)
-    if not workflow_path or not workflow_path.exists():
-        print(f"[Error] Workflow file not found: {workflow_path}")
-        return
 
     # 2. Get Prompts
     prompts_file = Path(args.input)
@@ -40,37 +175,110 @@ def run_batch_generation():
         if not prompts_file.exists():
              print(f"[Error] Prompts file not found: {args.input}")
              return
+    manifest_path = Path(args.manifest) if args.manifest else output_dir / f"manifest_{prompts_file.name.replace('.', '_')}.jsonl"
 
-    prompts = load_prompts(prompts_file)
-    print(f"[System] Loaded {len(prompts)} prompts from {prompts_file.name}\n")
-
-    # 3. Generate Loop
-    for i, prompt_text in enumerate(prompts):
-        print(f"\n[{i+1}/{len(prompts)}] Generating: {prompt_text[:50]}...")
-        
-        # Categorize based on simple keyword matching (optional logic)
-        category = "uncategorized"
-        # Create a safe filename
-        safe_prompt = "".join([c for c in prompt_text[:30] if c.isalnum() or c in (' ', '_')]).strip().replace(" ", "_")
-        timestamp = int(time.time())
-        filename = f"{args.model}_{timestamp}_{safe_prompt}.png"
-        
-        # Subfolder logic (optional, keeping flat for script default or mimic API structure?)
-        # Let's mimic API structure to keep gallery happy
-        if "portrait" in prompt_text.lower(): category = "Portraits"
-        elif "landscape" in prompt_text.lower(): category = "Landscapes"
-        
-        cat_dir = output_dir / category
-        cat_dir.mkdir(exist_ok=True)
-        final_path = cat_dir / filename
-        
-        try:
-            provider.generate(prompt_text, str(final_path), width=512, height=512 if args.model == "lcm" else 512, workflow_path=workflow_path)
-            print(f"   -> Saved to {category}/{filename}")
-        except Exception as e:
-            print(f"[Error] Generation failed: {e}")
+    defaults = {
+        "model": args.model, "width": args.width, "height": args.height,
+        "negative_prompt": args.negative, "category": args.category
+    }
+    done = ManifestIndex(manifest_path)
+
+    def is_done(row: PromptRow) -> bool:
+        status = done.get(entry_key(row))
+        if status == ManifestIndex.COMPLETED:
+            return (output_dir / output_file(row)).exists()
+        return status == ManifestIndex.FAILED and not args.retry_failed
+
+    # First streaming pass: sizes of the (model, width, height) groups still to run
+    groups = {}
+    skipped = 0
+    for row in iter_prompt_rows(str(prompts_file), defaults):
+        if is_done(row):
+            skipped += 1
+        else:
+            groups[row.group] = groups.get(row.group, 0) + 1
+
+    for (model, width, height), count in list(groups.items()):
+        workflow_path = config.WORKFLOWS.get(model)
+        if not workflow_path or not workflow_path.exists():
+            print(f"[Error] Workflow not found for model '{model}': skipping {count} prompts")
+            del groups[(model, width, height)]
+    total = sum(groups.values())
+
+    print(f"[System] {total + skipped} prompts in {prompts_file.name}, {len(groups)} model/size groups")
+    for (model, width, height), count in groups.items():
+        print(f"         {model} {width}x{height}: {count}")
+    if skipped:
+        print(f"[System] Resuming from {manifest_path.name}: {skipped} already done, {total} to go")
+    print(f"[System] Manifest: {manifest_path}\n")
+
+    def pending_entries():
+        rows = iter_prompt_rows(str(prompts_file), defaults, warn=False) if args.no_group \
+            else iter_grouped_rows(str(prompts_file), defaults, groups)
+        for row in rows:
+            if row.group not in groups or is_done(row):
+                continue
+            yield {
+                "key": entry_key(row),
+                "index": row.index,
+                "prompt": row.prompt,
+                "negative_prompt": row.negative_prompt,
+                "model": row.model,
+                "width": row.width,
+                "height": row.height,
+                "seed": row.seed,
+                "category": output_file(row).rsplit("/", 1)[0],
+                "file": output_file(row)
+            }
+
+    # 3. Generate: bounded in-flight window over a pool of host slots
+    host_slots = queue.Queue()
+    for _ in range(max(1, args.concurrency)):
+        for host in hosts:
+            host_slots.put(host)
+
+    manifest = ManifestWriter(manifest_path)
+    completed = failed = 0
+    started = time.perf_counter()
+    entries = pending_entries()
+    in_flight = set()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while len(in_flight) < workers * 2:
+                entry = next(entries, None)
+                if entry is None:
+                    break
+                in_flight.add(executor.submit(generate_entry, entry, host_slots, args))
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                manifest.write(record)
+                if record["status"] == "completed":
+                    completed += 1
+                else:
+                    failed += 1
+                    print(f"[Error] #{record['index'] + 1} failed on {record['host']}: {record['error']}")
+
+            processed = completed + failed
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed else 0
+            eta = format_eta((total - processed) / rate) if rate else "?"
+            print(f"[{processed}/{total}] {completed} ok, {failed} failed | {rate * 60:.1f} img/min | ETA {eta}")
+    except KeyboardInterrupt:
+        print("\n[System] Interrupted: finishing running generations, rerun the same command to resume.")
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in in_flight:
+            if future.done() and not future.cancelled():
+                manifest.write(future.result())
+    finally:
+        executor.shutdown(wait=True)
+        manifest.close()
 
-    print("\n[System] Batch complete.")
+    print(f"\n[System] Batch complete: {completed} generated, {failed} failed, {skipped} skipped.")
 
 if __name__ == "__main__":
     run_batch_generation()
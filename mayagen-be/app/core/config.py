@@ -51,3 +51,98 @@ WORKFLOWS = {
 # General Settings
 OUTPUT_FOLDER = str(OUTPUT_DIR)
 IMAGE_PREFIX = "img_"
+
+# Response Cache (public feed & recent images)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # Options: "memory", "redis"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))  # Seconds
+FEED_CACHE_MAX_ENTRIES = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "512"))
+
+# Job/Batch Event Streaming (SSE / WebSocket)
+EVENTS_BRIDGE = os.getenv("EVENTS_BRIDGE", "local")  # Options: "local", "postgres" (multi-process)
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Live Generation Progress
+PROGRESS_KEEP_PREVIEWS = os.getenv("PROGRESS_KEEP_PREVIEWS", "true").lower() == "true"
+
+# Auth: verified token -> user cache (0 disables)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))  # Seconds; also how long a changed/deleted user may stay cached
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+# Password Hashing (bcrypt runs in a dedicated bounded thread pool)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # Work factor, 2^rounds iterations
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+# Login Throttling (sliding window, per client IP and per username)
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "20"))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "10"))
+LOGIN_THROTTLE_WINDOW_SECONDS = int(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "300"))
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"  # Use X-Forwarded-For
+
+# Prebuilt Batch Archives (appended by the worker, served with Range support)
+BATCH_ARCHIVES = os.getenv("BATCH_ARCHIVES", "true").lower() == "true"
+BATCH_ARCHIVE_DIR = Path(os.getenv("BATCH_ARCHIVE_DIR", str(BASE_DIR / "batch_archives")))
+
+# Prompt-file batches (POST /batch multipart): uploads wait here until the worker expands them
+BATCH_UPLOAD_DIR = Path(os.getenv("BATCH_UPLOAD_DIR", str(BASE_DIR / "batch_uploads")))
+# Images per batch, whether from a template (total_images) or a prompt file (rows)
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "10000"))
+
+# Thumbnails (WebP/AVIF derivatives rendered in a process pool, served under /thumbs)
+THUMBNAILS_ENABLED = os.getenv("THUMBNAILS_ENABLED", "true").lower() == "true"
+THUMBNAILS_DIR = BASE_DIR / "thumbnails"
+THUMBNAILS_DIR.mkdir(exist_ok=True)
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "256,512").split(",") if w.strip()]
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp")  # Options: "webp", "avif" (falls back to webp)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+# Media Serving (/images, /thumbs): generated files never change once written
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "31536000"))  # Seconds (1 year), versioned (?v=) URLs
+MEDIA_UNVERSIONED_MAX_AGE = int(os.getenv("MEDIA_UNVERSIONED_MAX_AGE", "60"))  # Seconds, then revalidate
+MEDIA_ACCEL = os.getenv("MEDIA_ACCEL", "none")  # Options: "none", "nginx" (X-Accel-Redirect), "sendfile" (X-Sendfile)
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/_media")  # nginx internal location
+
+# Private Media: files of private images live under {root}/_private/ and are only
+# reachable through HMAC-signed, expiring URLs (verified without a DB lookup)
+PRIVATE_MEDIA_PREFIX = "_private"
+MEDIA_URL_TTL = int(os.getenv("MEDIA_URL_TTL", "3600"))  # Seconds; signed URLs stay valid 1-2x this
+
+# Content-addressed storage: OUTPUT_FOLDER/_objects/ab/cd/<sha256>.png (not served directly)
+STORAGE_OBJECTS_PREFIX = "_objects"
+STORAGE_DEDUP = os.getenv("STORAGE_DEDUP", "true").lower() == "true"
+
+# Object Storage Backend (completed images/thumbnails are offloaded after generation)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # Options: "local", "s3" (any S3-compatible store)
+S3_BUCKET = os.getenv("S3_BUCKET", "mayagen")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO; unset for AWS
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+S3_PREFIX = os.getenv("S3_PREFIX", "")  # Key prefix inside the bucket, e.g. "mayagen/"
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")  # Bucket/CDN base URL for public objects; unset = presign everything
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))  # Files uploading at once
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+
+# Background Compactor (lossless re-encode of completed images, off by default)
+COMPACTOR_ENABLED = os.getenv("COMPACTOR_ENABLED", "false").lower() == "true"
+COMPACTOR_FORMAT = os.getenv("COMPACTOR_FORMAT", "webp")  # Options: "webp" (lossless), "png" (optimized)
+COMPACTOR_WORKERS = int(os.getenv("COMPACTOR_WORKERS", "1"))  # Processes; caps the CPU share
+COMPACTOR_NICE = int(os.getenv("COMPACTOR_NICE", "10"))  # Lower scheduling priority of compactor processes
+COMPACTOR_BATCH_SIZE = int(os.getenv("COMPACTOR_BATCH_SIZE", "20"))
+COMPACTOR_INTERVAL_SECONDS = float(os.getenv("COMPACTOR_INTERVAL_SECONDS", "30"))  # Idle wait between scans
+COMPACTOR_MIN_AGE_SECONDS = int(os.getenv("COMPACTOR_MIN_AGE_SECONDS", "120"))  # Let post-processing finish first
+
+# Near-Duplicate Detection (perceptual hash per completed image; needs Pillow, numpy speeds it up)
+PHASH_ENABLED = os.getenv("PHASH_ENABLED", "true").lower() == "true"
+PHASH_INDEX_PATH = Path(os.getenv("PHASH_INDEX_PATH", str(BASE_DIR / "phash_index.bin")))
+PHASH_INDEX_SAVE_EVERY = int(os.getenv("PHASH_INDEX_SAVE_EVERY", "500"))  # New hashes between saves
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))  # Differing bits (of 64) that still count as a duplicate
+PHASH_MAX_REQUEUES = int(os.getenv("PHASH_MAX_REQUEUES", "2"))  # Retries per image in batches with requeue_duplicates
+PHASH_WORKERS = int(os.getenv("PHASH_WORKERS", "1"))
+
+# Bulk Job Submission (POST /generate/bulk)
+BULK_MAX_JOBS = int(os.getenv("BULK_MAX_JOBS", "10000"))  # Jobs per request
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", str(16 * 1024 * 1024)))  # Request body cap
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))  # Rows per multi-row INSERT
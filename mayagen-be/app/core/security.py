@@ -1,8 +1,14 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import jwt
 # from passlib.context import CryptContext
-from .config import BASE_DIR
+from .config import BASE_DIR, BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, MEDIA_URL_TTL
 import os
 
 # Secrets (Should be Env Vars in prod)
@@ -20,7 +26,20 @@ def verify_password(plain_password, hashed_password):
 
 def get_password_hash(password):
     # return pwd_context.hash(password)
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+# bcrypt takes ~100-300ms of CPU per call. Run it in a small dedicated pool
+# (bcrypt releases the GIL) so it never blocks the event loop, and so at most
+# PASSWORD_HASH_WORKERS hashes run at once no matter how many logins arrive.
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -31,3 +50,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+# --- Signed media URLs (private images) ---
+# Separate key derived from SECRET_KEY: rotating the secret also revokes every URL
+_MEDIA_SIGNING_KEY = hmac.new(SECRET_KEY.encode("utf-8"), b"mayagen-media-url", hashlib.sha256).digest()
+
+def media_url_expiry(now: Optional[float] = None) -> int:
+    """
+    Expiry shared by all URLs signed within the same MEDIA_URL_TTL window, so a
+    signed URL (and any response embedding it) is byte-identical for the whole
+    window and stays cacheable. A URL is valid for between 1 and 2 windows.
+    """
+    now = time.time() if now is None else now
+    return (int(now) // MEDIA_URL_TTL + 2) * MEDIA_URL_TTL
+
+def sign_media_path(path: str, expires: int) -> str:
+    mac = hmac.new(_MEDIA_SIGNING_KEY, f"{path}|{expires}".encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac[:18]).decode("ascii")
+
+def verify_media_signature(path: str, expires: int, signature: str) -> bool:
+    """Stateless check of a signed media URL: no DB lookup needed."""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_media_path(path, expires), signature)
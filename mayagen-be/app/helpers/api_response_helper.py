@@ -1,10 +1,42 @@
-from typing import Any, Optional
+import dataclasses
+import json
+from typing import Any, Dict, Optional
 from fastapi.responses import JSONResponse
 
+try:
+    import orjson
+except ImportError:  # Optional dependency (pip install orjson)
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    # Fallback encoder for what orjson handles natively
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def json_dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON. Uses orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered through `json_dumps`: orjson speed, and slotted
+    dataclasses (app.schemas) serialize without building intermediate dicts.
+    """
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
 def api_success(
     status_code: int = 200,
     message: str = "Success",
-    data: Any = None
+    data: Any = None,
+    headers: Optional[Dict[str, str]] = None
 ) -> JSONResponse:
     """
     Standard Success Response
@@ -19,12 +51,13 @@ def api_success(
         "message": message,
         "data": data
     }
-    return JSONResponse(status_code=status_code, content=content)
+    return FastJSONResponse(status_code=status_code, content=content, headers=headers)
 
 def api_error(
     status_code: int = 400,
     message: str = "Error",
-    error: Any = None
+    error: Any = None,
+    headers: Optional[Dict[str, str]] = None
 ) -> JSONResponse:
     """
     Standard Error Response
@@ -39,4 +72,4 @@ def api_error(
         "message": message,
         "error": error
     }
-    return JSONResponse(status_code=status_code, content=content)
+    return FastJSONResponse(status_code=status_code, content=content, headers=headers)
@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from the values that identify a response version
+    (row id, updated_at, status, feed generation, pagination...).
+    Cheap to compute: no response body is needed.
+    """
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def _opaque(tag: str) -> str:
+    # Weak comparison (RFC 9110 8.8.3.2): ignore the W/ prefix
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already matches `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _opaque(etag)
+    return any(_opaque(candidate) == current for candidate in header.split(","))
+
+def etag_headers(etag: str, private: bool = False) -> dict:
+    """Headers sent with both 200 and 304: clients may store but must revalidate."""
+    return {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache" if private else "no-cache"
+    }
+
+def not_modified(etag: str, private: bool = False) -> Response:
+    """Empty 304 response."""
+    return Response(status_code=304, headers=etag_headers(etag, private))
@@ -43,6 +43,25 @@ class Image(SQLModel, table=True):
     settings: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSONB))
     is_public: bool = Field(default=True)
     
+    # sha256 of the file; canonical copy at OUTPUT_FOLDER/_objects/ab/cd/<hash>.png
+    content_hash: Optional[str] = Field(default=None, index=True)
+    
+    # Where the file is served from: "local" (media router) or "s3" (bucket URL / presigned)
+    storage_backend: str = Field(default="local")
+    
+    # Set by the compactor: bytes saved by lossless re-encoding (0 = tried, no gain)
+    bytes_saved: Optional[int] = Field(default=None)
+    
+    # 64-bit perceptual hash (16 hex digits) for near-duplicate search
+    phash: Optional[str] = Field(default=None)
+    
+    # Batch images: value picked per template field, e.g. {"color": "red", "action": "sitting"}
+    variation_values: Optional[Dict[str, str]] = Field(default=None, sa_column=Column(JSONB))
+    
+    # Derivatives: {"256": "cats/img_1_256.webp", ...} relative to THUMBNAILS_DIR
+    # none_as_null: "no thumbnails" is SQL NULL, never the JSON 'null' the backfill wouldn't find
+    thumbnails: Optional[Dict[str, str]] = Field(default=None, sa_column=Column(JSONB(none_as_null=True)))
+    
     # Status Tracking
     status: JobStatus = Field(default=JobStatus.QUEUED, index=True)
     error_message: Optional[str] = None
@@ -73,10 +92,26 @@ class BatchJob(SQLModel, table=True):
     # Example: {"colors": ["orange", "black"], "environments": ["indoor", "outdoor"]}
     variations: Dict[str, List[str]] = Field(default={}, sa_column=Column(JSONB))
     
+    # Optional constraints: share per value {"environments": {"outdoor": 0.7}} and
+    # excluded combinations [{"environment": "underwater", "action": "running"}]
+    weights: Optional[Dict[str, Dict[str, float]]] = Field(default=None, sa_column=Column(JSONB))
+    exclusions: Optional[List[Dict[str, str]]] = Field(default=None, sa_column=Column(JSONB))
+    
     # Base prompt template (optional)
     base_prompt_template: Optional[str] = None
     # e.g., "A {color} {target} {action} in {environment}, {style}, highly detailed"
     
+    # Prompt sampler seed: same seed + settings -> same prompts
+    seed: Optional[int] = None
+    
+    # Where prompts come from: "template" (variations above), "file" (uploaded
+    # prompt list at prompt_file, deleted once expanded) or "bulk" (/generate/bulk)
+    source: str = Field(default="template")
+    prompt_file: Optional[str] = None
+    
+    # Regenerate (new seed) images that come out near-identical to earlier ones in the batch
+    requeue_duplicates: bool = Field(default=False)
+    
     # Progress
     status: BatchJobStatus = Field(default=BatchJobStatus.QUEUED, index=True)
     generated_count: int = Field(default=0)
@@ -0,0 +1,235 @@
+"""
+Lean read models for list endpoints.
+
+List queries select only the columns below (never the JSONB `settings` or the
+full ORM entity) and map each row into a slotted dataclass. The response class
+in `api_response_helper` serializes these dataclasses directly.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from .core import config
+from .core.security import media_url_expiry, sign_media_path
+from .models import Image, User, JobStatus
+from .services.object_storage import image_ext, image_key, object_storage, thumbnail_key
+
+
+def media_url(root: str, relative_path: str, is_public: bool = True, version: Optional[str] = None) -> str:
+    """
+    URL of a file under a media root ("images" / "thumbs").
+    Public images are versioned with `?v=<content hash>` when known (the media
+    router caches them as immutable once the hash matches the file). Private
+    files get a signed, expiring URL under /{root}/_private/.
+    """
+    if is_public:
+        url = f"{config.API_BASE_URL}/{root}/{relative_path}"
+        return f"{url}?v={version}" if version else url
+    path = f"{config.PRIVATE_MEDIA_PREFIX}/{relative_path}"
+    expires = media_url_expiry()
+    signature = sign_media_path(f"{root}/{path}", expires)
+    return f"{config.API_BASE_URL}/{root}/{path}?exp={expires}&sig={signature}"
+
+
+def _remote_url(key: str, is_public: bool, storage_backend: Optional[str]) -> Optional[str]:
+    # Rows offloaded to the configured object store are served straight from it
+    if storage_backend and storage_backend != "local" and storage_backend == object_storage.name:
+        return object_storage.url(key, is_public)
+    return None
+
+
+def public_url_expiry() -> Optional[int]:
+    """
+    Expiry baked into the URLs of public images (presigned bucket URLs), or None
+    if they never expire. Part of the ETag of every response that embeds them.
+    """
+    return media_url_expiry() if object_storage.public_urls_expire else None
+
+
+def image_url(
+    category: Optional[str],
+    filename: Optional[str],
+    is_public: bool = True,
+    content_hash: Optional[str] = None,
+    storage_backend: Optional[str] = "local"
+) -> str:
+    """URL of a generated file: /images/{category}/{filename} (signed if private), or the bucket's."""
+    if content_hash:
+        remote = _remote_url(image_key(content_hash, is_public, image_ext(filename)), is_public, storage_backend)
+        if remote:
+            return remote
+    safe_category = category.replace("\\", "/") if category else "uncategorized"
+    return media_url("images", f"{safe_category}/{filename}", is_public, content_hash)
+
+
+def thumbnail_urls(
+    thumbnails: Optional[Dict[str, str]],
+    is_public: bool = True,
+    storage_backend: Optional[str] = "local"
+) -> Tuple[Optional[str], Optional[str]]:
+    """(thumb_url, srcset) for an `Image.thumbnails` mapping; smallest width is the thumb."""
+    if not thumbnails:
+        return None, None
+    ordered = sorted(thumbnails.items(), key=lambda item: int(item[0]))
+    urls = [
+        (width, _remote_url(thumbnail_key(path, is_public), is_public, storage_backend)
+         or media_url("thumbs", path, is_public))
+        for width, path in ordered
+    ]
+    return urls[0][1], ", ".join(f"{url} {width}w" for width, url in urls)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+# --- Gallery / collection items (/images, /images/me) ---
+
+IMAGE_LIST_COLUMNS = (
+    Image.id,
+    Image.filename,
+    Image.category,
+    Image.prompt,
+    Image.model,
+    Image.width,
+    Image.height,
+    Image.created_at,
+    Image.is_public,
+    Image.status,
+    Image.thumbnails,
+    Image.content_hash,
+    Image.storage_backend,
+)
+
+
+@dataclass(slots=True)
+class ImageListItem:
+    id: int
+    filename: Optional[str]
+    category: str
+    url: Optional[str]
+    thumb_url: Optional[str]
+    srcset: Optional[str]
+    prompt: str
+    model: str
+    width: int
+    height: int
+    created_at: Optional[str]
+    created_by: str
+    is_public: bool
+    status: JobStatus
+
+    @classmethod
+    def from_row(cls, row, created_by: Optional[str]) -> "ImageListItem":
+        thumb_url, srcset = thumbnail_urls(row.thumbnails, row.is_public, row.storage_backend)
+        return cls(
+            id=row.id,
+            filename=row.filename,
+            category=row.category,
+            url=image_url(row.category, row.filename, row.is_public, row.content_hash, row.storage_backend) if row.status == JobStatus.COMPLETED else None,
+            thumb_url=thumb_url,
+            srcset=srcset,
+            prompt=row.prompt,
+            model=row.model,
+            width=row.width,
+            height=row.height,
+            created_at=_iso(row.created_at),
+            created_by=created_by or "Anonymous",
+            is_public=row.is_public,
+            status=row.status,
+        )
+
+
+# --- Home page strip (/images/recent) ---
+
+RECENT_IMAGE_COLUMNS = (
+    Image.id,
+    Image.filename,
+    Image.category,
+    Image.prompt,
+    Image.model,
+    Image.status,
+    Image.thumbnails,
+    Image.content_hash,
+    Image.storage_backend,
+    User.username,
+)
+
+
+@dataclass(slots=True)
+class RecentImageItem:
+    id: int
+    filename: Optional[str]
+    url: Optional[str]
+    thumb_url: Optional[str]
+    srcset: Optional[str]
+    prompt: str
+    category: str
+    model: str
+    created_by: str
+
+    @classmethod
+    def from_row(cls, row) -> "RecentImageItem":
+        thumb_url, srcset = thumbnail_urls(row.thumbnails, True, row.storage_backend)
+        return cls(
+            id=row.id,
+            filename=row.filename,
+            url=image_url(row.category, row.filename, True, row.content_hash, row.storage_backend),
+            thumb_url=thumb_url,
+            srcset=srcset,
+            prompt=row.prompt,
+            category=row.category,
+            model=row.model,
+            created_by=row.username or "Anonymous",
+        )
+
+
+# --- Batch view (/batch/{id}/images) ---
+
+BATCH_IMAGE_COLUMNS = (
+    Image.id,
+    Image.filename,
+    Image.category,
+    Image.prompt,
+    Image.model,
+    Image.status,
+    Image.created_at,
+    Image.thumbnails,
+    Image.content_hash,
+    Image.storage_backend,
+    Image.is_public,
+    Image.variation_values,
+)
+
+
+@dataclass(slots=True)
+class BatchImageItem:
+    id: int
+    filename: Optional[str]
+    category: str
+    url: Optional[str]
+    thumb_url: Optional[str]
+    srcset: Optional[str]
+    prompt: str
+    model: str
+    status: JobStatus
+    variations: Optional[Dict[str, str]]
+    created_at: Optional[str]
+
+    @classmethod
+    def from_row(cls, row) -> "BatchImageItem":
+        thumb_url, srcset = thumbnail_urls(row.thumbnails, row.is_public, row.storage_backend)
+        return cls(
+            id=row.id,
+            filename=row.filename,
+            category=row.category,
+            url=image_url(row.category, row.filename, row.is_public, row.content_hash, row.storage_backend) if row.status == JobStatus.COMPLETED else None,
+            thumb_url=thumb_url,
+            srcset=srcset,
+            prompt=row.prompt,
+            model=row.model,
+            status=row.status,
+            variations=row.variation_values,
+            created_at=_iso(row.created_at),
+        )
@@ -0,0 +1,304 @@
+"""
+Streaming ZIP Archives.
+
+Builds a ZIP archive on the fly while the response is being sent: entries are
+STORED (PNGs are already compressed, deflating them again only burns CPU),
+files are read in chunks off the event loop, and each chunk is yielded as soon
+as `zipfile` has framed it. Memory use is one chunk, regardless of batch size.
+
+The output stream is not seekable, so `zipfile` writes sizes/CRCs in data
+descriptors after each entry, and switches to ZIP64 records automatically for
+archives over 4 GB.
+
+Finished batches are also kept as prebuilt archives (`batch_archives`), so
+repeated or resumed downloads are served straight from disk.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core import config
+
+logger = logging.getLogger("archive")
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# ZipInfo fields kept in the member log, enough to rebuild the central directory
+MEMBER_FIELDS = (
+    "filename", "date_time", "header_offset", "CRC", "compress_size", "file_size",
+    "flag_bits", "external_attr", "extract_version", "create_version", "create_system"
+)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that hands out what has been written so far."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile needs offsets for the central directory; seek() stays unsupported
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def pending(self) -> int:
+        # Not __len__: zipfile tests `if not self.fp`, an empty sink must stay truthy
+        return len(self._buffer)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _unique_name(arcname: str, seen_names: Set[str]) -> str:
+    """`arcname`, or `root_<n>.ext` if already taken. Records the name in `seen_names`."""
+    name = arcname
+    suffix = 1
+    while name in seen_names:
+        root, ext = os.path.splitext(arcname)
+        name = f"{root}_{suffix}{ext}"
+        suffix += 1
+    seen_names.add(name)
+    return name
+
+
+def _open_entry(path: str):
+    """stat + open in one thread hop. None if the file has disappeared."""
+    try:
+        f = open(path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return f, os.fstat(f.fileno())
+
+
+async def stream_zip(files: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP archive of `files` ((arcname, absolute path) pairs) chunk by chunk.
+    Missing files are skipped; duplicate arcnames get a numeric suffix.
+    """
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True)
+    seen_names = set()
+
+    for arcname, path in files:
+        opened = await asyncio.to_thread(_open_entry, path)
+        if opened is None:
+            continue
+        src, stat = opened
+
+        info = zipfile.ZipInfo(_unique_name(arcname, seen_names), date_time=time.localtime(max(stat.st_mtime, 315532800))[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        try:
+            with archive.open(info, mode="w", force_zip64=stat.st_size >= zipfile.ZIP64_LIMIT) as dest:
+                while True:
+                    chunk = await asyncio.to_thread(src.read, chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    if sink.pending >= chunk_size:
+                        yield sink.drain()
+        finally:
+            src.close()
+
+        if sink.pending >= chunk_size:
+            yield sink.drain()
+
+    archive.close()  # Central directory (+ ZIP64 end records if needed)
+    yield sink.drain()
+
+
+class _MemberLog:
+    """What a partial archive holds: entry names, image ids and where its data ends."""
+
+    def __init__(self):
+        self.names: Set[str] = set()
+        self.image_ids: Set[int] = set()
+        # Source paths of entries logged before image ids were recorded
+        self.paths: Set[str] = set()
+        self.end = 0
+
+
+class BatchArchiveStore:
+    """
+    Prebuilt per-batch archives kept in BATCH_ARCHIVE_DIR.
+
+    The worker appends every completed image to `batch_<id>.zip.partial`,
+    which holds only local entries: each append writes one entry at the end
+    of the file and records it in `batch_<id>.zip.members` (one JSON line per
+    entry). `finalize` writes the central directory once, from that log, and
+    renames the file to `batch_<id>.zip` when the batch is COMPLETED.
+    Downloads of finalized batches are then a plain file response with Range
+    support.
+
+    Entries are keyed by image id: an image whose file moved (visibility
+    change under `_private/`) before the batch finished is not added twice.
+    `finalize` also adds anything the appends missed (crash, archive created
+    after the batch started), so the final file always matches the database.
+    Data past the last logged entry (an append interrupted by a crash) is
+    truncated away before writing. Duplicate names are renamed the same way
+    `stream_zip` does. A batch that won't complete (cancelled or failed) has
+    its leftovers removed with `discard`.
+    """
+
+    def __init__(self, folder: str, enabled: bool = True):
+        self.folder = folder
+        self.enabled = enabled
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._logs: Dict[int, _MemberLog] = {}
+
+    def final_path(self, batch_id: int) -> str:
+        return os.path.join(self.folder, f"batch_{batch_id}.zip")
+
+    def partial_path(self, batch_id: int) -> str:
+        return self.final_path(batch_id) + ".partial"
+
+    def log_path(self, batch_id: int) -> str:
+        return self.final_path(batch_id) + ".members"
+
+    def get(self, batch_id: int) -> Optional[str]:
+        """Path of the finalized archive, or None if there isn't one."""
+        path = self.final_path(batch_id)
+        return path if self.enabled and os.path.isfile(path) else None
+
+    def _read_log(self, batch_id: int) -> List[Dict[str, Any]]:
+        """Logged entries in write order; a torn last line (crash mid-write) is ignored."""
+        entries = []
+        try:
+            with open(self.log_path(batch_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _load_log(self, batch_id: int) -> _MemberLog:
+        log = self._logs.get(batch_id)
+        if log is None:
+            log = _MemberLog()
+            for entry in self._read_log(batch_id):
+                log.names.add(entry["filename"])
+                if entry.get("image_id") is not None:
+                    log.image_ids.add(entry["image_id"])
+                else:
+                    log.paths.add(entry["path"])
+                log.end = entry["end"]
+            self._logs[batch_id] = log
+        return log
+
+    def _write_entries(self, batch_id: int, files: Iterable[Tuple[int, str, str]]) -> int:
+        """
+        Append local entries for `files` ((image id, arcname, path) triples) not yet
+        in the archive and log them. Returns how many.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        log = self._load_log(batch_id)
+        pending = {}
+        for image_id, arcname, path in files:
+            path = os.path.abspath(path)
+            if image_id not in log.image_ids and image_id not in pending and path not in log.paths and os.path.isfile(path):
+                pending[image_id] = (arcname, path)
+        if not pending:
+            return 0
+
+        partial = self.partial_path(batch_id)
+        with open(partial, "r+b" if os.path.exists(partial) else "w+b") as f:
+            f.truncate(log.end)
+            f.seek(log.end)
+            # A throwaway writer: its central directory (this append's entries
+            # only) lands past `end` and is cut off by the next append/finalize
+            archive = zipfile.ZipFile(f, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+            with archive, open(self.log_path(batch_id), "a", encoding="utf-8") as log_file:
+                for image_id, (arcname, path) in pending.items():
+                    archive.write(path, _unique_name(arcname, log.names))
+                    info = archive.filelist[-1]
+                    log.image_ids.add(image_id)
+                    log.end = f.tell()
+                    entry = {field: getattr(info, field) for field in MEMBER_FIELDS}
+                    log_file.write(json.dumps({**entry, "image_id": image_id, "path": path, "end": log.end}) + "\n")
+                log_file.flush()
+        return len(pending)
+
+    def _finalize_sync(self, batch_id: int, files: List[Tuple[int, str, str]]) -> int:
+        added = self._write_entries(batch_id, files)
+        log = self._load_log(batch_id)
+        partial = self.partial_path(batch_id)
+
+        with open(partial, "r+b" if os.path.exists(partial) else "w+b") as f:
+            f.truncate(log.end)
+            f.seek(log.end)
+            archive = zipfile.ZipFile(f, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+            for entry in self._read_log(batch_id):
+                info = zipfile.ZipInfo(entry["filename"], tuple(entry["date_time"]))
+                for field in MEMBER_FIELDS[2:]:
+                    setattr(info, field, entry[field])
+                archive.filelist.append(info)
+                archive.NameToInfo[info.filename] = info
+            archive.close()  # The one and only central directory
+
+        os.replace(partial, self.final_path(batch_id))
+        os.remove(self.log_path(batch_id))
+        self._logs.pop(batch_id, None)
+        return added
+
+    async def append(self, batch_id: int, image_id: int, arcname: str, path: str) -> None:
+        if not self.enabled:
+            return
+        async with self._locks.setdefault(batch_id, asyncio.Lock()):
+            await asyncio.to_thread(self._write_entries, batch_id, [(image_id, arcname, path)])
+
+    async def finalize(self, batch_id: int, files: Iterable[Tuple[int, str, str]]) -> Optional[str]:
+        """
+        Bring the archive in line with `files` ((image id, arcname, path) triples)
+        and publish it under its final name.
+        """
+        if not self.enabled:
+            return None
+        async with self._locks.setdefault(batch_id, asyncio.Lock()):
+            added = await asyncio.to_thread(self._finalize_sync, batch_id, list(files))
+        self._locks.pop(batch_id, None)
+        logger.info(f"Batch {batch_id} archive finalized ({added} late entries)")
+        return self.final_path(batch_id)
+
+    def _discard_sync(self, batch_id: int) -> None:
+        self._logs.pop(batch_id, None)
+        for path in (self.partial_path(batch_id), self.log_path(batch_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+
+    async def discard(self, batch_id: int) -> None:
+        """Drop the unfinished archive of a batch that will never be finalized."""
+        if not self.enabled:
+            return
+        async with self._locks.setdefault(batch_id, asyncio.Lock()):
+            await asyncio.to_thread(self._discard_sync, batch_id)
+        self._locks.pop(batch_id, None)
+
+
+# Shared instance used by the worker and the batch download endpoint
+batch_archives = BatchArchiveStore(str(config.BATCH_ARCHIVE_DIR), enabled=config.BATCH_ARCHIVES)
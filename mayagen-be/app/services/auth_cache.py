@@ -0,0 +1,70 @@
+"""
+Verified-token Cache.
+
+Maps a bearer token to a snapshot of its user so hot authenticated endpoints
+(polling, feeds carrying a token) skip both the JWT decode and the
+`SELECT ... FROM user` round trip.
+
+Entries live for AUTH_CACHE_TTL seconds at most and never past the token's own
+`exp`. Only successful lookups are cached.
+
+There is no explicit invalidation: the API has no endpoint that changes or
+removes a user, and the maintenance scripts that do (reset_db.py) run in
+another process, out of reach of this per-process map. A changed or deleted
+user can therefore be served from its snapshot for up to AUTH_CACHE_TTL
+seconds; set AUTH_CACHE_TTL=0 to disable the cache where that matters.
+"""
+
+import hashlib
+import time
+from typing import Optional
+
+from ..core import config
+from ..models import User
+from .cache import TTLCache
+
+
+class AuthCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.ttl = ttl
+        self.enabled = ttl > 0
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # Don't keep raw bearer tokens around as dict keys
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, token: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        snapshot = self._entries.get(self._key(token))
+        if snapshot is None:
+            return None
+        # Fresh detached instance per request, so no handler can mutate a shared one
+        return User(**snapshot)
+
+    def put(self, token: str, user: User, expires_at: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+
+        snapshot = {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "hashed_password": "",  # Never needed past authentication
+            "created_at": user.created_at
+        }
+        self._entries.set(self._key(token), snapshot, ttl)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Shared instance used by app.api.deps
+auth_cache = AuthCache(max_entries=config.AUTH_CACHE_MAX_ENTRIES, ttl=config.AUTH_CACHE_TTL)
@@ -0,0 +1,210 @@
+"""
+Response Cache Service.
+
+TTL + LRU cache for hot, user-independent API responses (public feed, recent images).
+
+Entries are keyed on a namespace, the request parameters and the current feed
+*generation*. Bumping the generation (worker completes a public image, owner
+changes visibility) invalidates every cached page at once without scanning keys.
+
+Backends:
+- "memory": per-process OrderedDict (default)
+- "redis":  shared between API replicas (requires the `redis` package)
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from ..core import config
+from ..helpers.api_response_helper import json_dumps
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency
+    aioredis = None
+
+logger = logging.getLogger("cache")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process map with per-entry expiry and LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryCacheBackend:
+    """
+    Per-process backend. Generation lives in a plain counter.
+
+    The counter starts from a random per-boot value: feed ETags are built from the
+    generation, so two processes (or one process before and after a restart) must
+    never hand out the same generation for different feed contents.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._store = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._generation = secrets.randbits(63)
+
+    async def get(self, key: str) -> Any:
+        return self._store.get(key, _MISSING)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._store.set(key, value, ttl)
+
+    async def get_generation(self) -> int:
+        return self._generation
+
+    async def bump_generation(self) -> int:
+        self._generation += 1
+        return self._generation
+
+
+class RedisCacheBackend:
+    """
+    Shared backend for multi-replica deployments.
+    Values are stored as JSON (list DTOs come back as plain dicts);
+    the generation is a single INCR counter, seeded with a random value
+    (SET NX) whenever the key is missing, e.g. after a flush or eviction.
+    """
+
+    GENERATION_KEY = "mayagen:cache:generation"
+
+    def __init__(self, url: str, prefix: str = "mayagen:cache:"):
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self._client = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(self._prefix + key)
+        if raw is None:
+            return _MISSING
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._client.set(self._prefix + key, json_dumps(value), px=int(ttl * 1000))
+
+    async def _seed_generation(self) -> None:
+        # Same reason as MemoryCacheBackend: a restarted counter must not reuse
+        # generations (and so feed ETags) handed out before the key went away.
+        # 62 bits leaves INCR plenty of room below the int64 limit.
+        await self._client.set(self.GENERATION_KEY, secrets.randbits(62), nx=True)
+
+    async def get_generation(self) -> int:
+        raw = await self._client.get(self.GENERATION_KEY)
+        if raw is None:
+            await self._seed_generation()
+            raw = await self._client.get(self.GENERATION_KEY)
+        return int(raw)
+
+    async def bump_generation(self) -> int:
+        await self._seed_generation()
+        return await self._client.incr(self.GENERATION_KEY)
+
+
+class ResponseCache:
+    """
+    Generation-versioned response cache with per-key stampede protection.
+
+    Concurrent misses for the same key wait on a single lock, so only the first
+    request runs the query; the rest re-check the cache once the lock is released.
+    Locks live as long as some request holds or waits on them (weak values).
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _make_key(namespace: str, generation: int, params: Tuple) -> str:
+        return f"{namespace}:{generation}:" + ":".join(str(p) for p in params)
+
+    async def generation(self) -> int:
+        return await self.backend.get_generation()
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        params: Tuple,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value for (namespace, params) or compute and store it."""
+        generation = await self.backend.get_generation()
+        key = self._make_key(namespace, generation, params)
+
+        value = await self.backend.get(key)
+        if value is not _MISSING:
+            return value
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        async with lock:
+            # Another request may have filled it while we waited
+            value = await self.backend.get(key)
+            if value is not _MISSING:
+                return value
+
+            value = await compute()
+            await self.backend.set(key, value, self.ttl)
+            return value
+
+    async def invalidate(self) -> int:
+        """Bump the generation; every previously cached entry becomes unreachable."""
+        generation = await self.backend.bump_generation()
+        logger.debug(f"Feed cache invalidated (generation {generation})")
+        return generation
+
+
+def _create_backend():
+    if config.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(config.REDIS_URL)
+    return MemoryCacheBackend(max_entries=config.FEED_CACHE_MAX_ENTRIES, ttl=config.FEED_CACHE_TTL)
+
+
+# Shared instance used by the public feed endpoints and the worker
+feed_cache = ResponseCache(_create_backend(), ttl=config.FEED_CACHE_TTL)
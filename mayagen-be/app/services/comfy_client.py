@@ -5,9 +5,15 @@ import urllib.request
 import urllib.parse
 import time
 import os
+import struct
 from pathlib import Path
+from typing import Callable, Optional
 from ..core import config
 
+# Binary websocket frames: 4-byte event type, then for previews a 4-byte image type
+BINARY_EVENT_PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_TYPES = {1: "image/jpeg", 2: "image/png"}
+
 class ComfyUIProvider:
     def __init__(self, server_address):
         self.server_address = server_address
@@ -34,9 +40,25 @@ class ComfyUIProvider:
         with urllib.request.urlopen(f"http://{self.server_address}/history/{prompt_id}") as response:
             return json.loads(response.read())
 
-    def generate(self, prompt_text: str, output_path: str, width: int = 512, height: int = 512, workflow_path: Path = None):
+    def generate(
+        self,
+        prompt_text: str,
+        output_path: str,
+        width: int = 512,
+        height: int = 512,
+        workflow_path: Path = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        on_preview: Optional[Callable[[bytes, str], None]] = None,
+        negative_prompt: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
         """
         Main function to generate an image from text.
+
+        on_progress(step, max_steps) is called for every sampler step and
+        on_preview(image_bytes, media_type) for every preview frame ComfyUI sends.
+        Both run on the calling (worker) thread. negative_prompt/seed override
+        the workflow's defaults when given.
         """
         # 1. Connect first
         print(f"[ComfyUI] Connecting to {self.server_address}...")
@@ -50,6 +72,18 @@ class ComfyUIProvider:
            workflow["6"]["inputs"]["text"] = prompt_text
            print("[ComfyUI] Updated prompt.")
 
+        # 3b. Negative prompt and seed live on the sampler (negative is a link to its text node)
+        if negative_prompt is not None or seed is not None:
+            for node_id, node in workflow.items():
+                if node.get("class_type") in ("KSampler", "KSamplerAdvanced"):
+                    inputs = node["inputs"]
+                    if seed is not None:
+                        inputs["noise_seed" if "noise_seed" in inputs else "seed"] = seed
+                    negative = inputs.get("negative")
+                    if negative_prompt is not None and isinstance(negative, list) and negative[0] in workflow:
+                        workflow[negative[0]]["inputs"]["text"] = negative_prompt
+                    break
+
         # 4. Inject Resolution (Scanning for EmptyLatentImage)
         # We look for the node that creates the blank canvas
         found_latent = False
@@ -73,7 +107,7 @@ class ComfyUIProvider:
         prompt_id = prompt_response['prompt_id']
         print(f"[ComfyUI] Prompt queued: {prompt_id}")
 
-        # 6. Listen for Result
+        # 6. Listen for Result (forwarding progress and previews)
         while True:
             out = self.ws.recv()
             if isinstance(out, str):
@@ -83,8 +117,15 @@ class ComfyUIProvider:
                     if data['node'] is None and data['prompt_id'] == prompt_id:
                         print("[ComfyUI] Generation finished.")
                         break # Execution is done
-            else:
-                continue # Binary data (previews), ignore
+                elif message['type'] == 'progress' and on_progress:
+                    data = message['data']
+                    # Older ComfyUI builds omit prompt_id on progress events
+                    if data.get('prompt_id', prompt_id) == prompt_id:
+                        on_progress(data['value'], data['max'])
+            elif on_preview and len(out) > 8:
+                event_type, image_type = struct.unpack(">II", out[:8])
+                if event_type == BINARY_EVENT_PREVIEW_IMAGE:
+                    on_preview(out[8:], PREVIEW_IMAGE_TYPES.get(image_type, "image/jpeg"))
 
         # 7. Retrieve Image History
         history = self.get_history(prompt_id)[prompt_id]
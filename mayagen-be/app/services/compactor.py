@@ -0,0 +1,327 @@
+"""
+Background Compactor.
+
+ComfyUI writes PNGs verbatim. This re-encodes completed images losslessly
+(WebP lossless, or optimized PNG) to cut disk and egress cost. The PNG text
+chunks (ComfyUI's prompt/workflow) are kept: as text chunks in PNG mode, and
+as an XMP packet in WebP mode (one mayagen:PNGText entry per chunk, read back
+with `png_text`).
+
+1. encode to a temp file in a low-priority process pool (COMPACTOR_WORKERS)
+2. decode the result and require pixel equality with the original, and the
+   same text metadata; an image whose metadata can't be carried over is
+   left as it is
+3. keep it only if it is smaller
+4. re-store it in the content-addressed store (and the bucket, for S3 rows),
+   commit the row only if it wasn't moved/changed meanwhile, and only then
+   rename the result into place; a lost race discards the result and its objects
+
+`Image.bytes_saved` records the gain (0 = tried, nothing to gain), so
+savings can be reported per category (see compaction_report.py).
+"""
+
+import asyncio
+import logging
+import os
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func, or_, update
+from sqlmodel import select
+
+from ..core import config
+from ..database import get_session_context
+from ..models import BatchJob, BatchJobStatus, Image, JobStatus
+from .cache import feed_cache
+from .object_storage import IMAGE_MEDIA_TYPES, image_key, object_storage
+from .storage import hash_file, release_object, store_file
+
+try:
+    from PIL import Image as PILImage, ImageChops
+except ImportError:  # Optional dependency
+    PILImage = None
+
+logger = logging.getLogger("compactor")
+
+_XMP_NS = "urn:mayagen:xmp:1.0:"
+_RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+
+def _text_xmp(text: Dict[str, str]) -> bytes:
+    """XMP packet holding PNG text chunks (keys may contain spaces, so they are values too)."""
+    entries = "".join(
+        f'<rdf:li rdf:parseType="Resource"><mayagen:key>{escape(key, {chr(13): "&#13;"})}</mayagen:key>'
+        f'<mayagen:value>{escape(value, {chr(13): "&#13;"})}</mayagen:value></rdf:li>'
+        for key, value in text.items()
+    )
+    return (
+        '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+        f'<rdf:RDF xmlns:rdf="{_RDF_NS}"><rdf:Description rdf:about="" xmlns:mayagen="{_XMP_NS}">'
+        f'<mayagen:PNGText><rdf:Bag>{entries}</rdf:Bag></mayagen:PNGText>'
+        '</rdf:Description></rdf:RDF></x:xmpmeta><?xpacket end="w"?>'
+    ).encode("utf-8")
+
+
+def png_text(img) -> Dict[str, str]:
+    """
+    Text metadata of an opened image: the PNG text chunks, or for a compacted
+    WebP the chunks stored in its XMP packet.
+    """
+    if getattr(img, "text", None):
+        return dict(img.text)
+    xmp = img.info.get("xmp")
+    if not xmp:
+        return {}
+    try:
+        root = ElementTree.fromstring(xmp)
+    except ElementTree.ParseError:
+        return {}
+    text = {}
+    for entry in root.iter(f"{{{_RDF_NS}}}li"):
+        key = entry.find(f"{{{_XMP_NS}}}key")
+        value = entry.find(f"{{{_XMP_NS}}}value")
+        if key is not None and value is not None:
+            text[key.text or ""] = value.text or ""
+    return text
+
+
+def _lower_priority(niceness: int) -> None:
+    # Runs in each pool process: generation and the API keep their CPU
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):  # Not available on Windows
+        pass
+
+
+def compact_file(source_path: str, tmp_path: str, fmt: str) -> Optional[Tuple[int, int]]:
+    """
+    Re-encode `source_path` losslessly into `tmp_path`. Runs in a pool process.
+    Returns (old size, new size) if the result is pixel-identical and smaller
+    (the caller then owns `tmp_path`); otherwise removes the attempt and returns None.
+    """
+    try:
+        with PILImage.open(source_path) as src:
+            src.load()
+            text = png_text(src)
+            if fmt == "webp":
+                extra = {"xmp": _text_xmp(text)} if text else {}
+                src.save(tmp_path, format="WEBP", lossless=True, quality=100, method=6, exact=True, **extra)
+            else:
+                # Keep text chunks: ComfyUI stores the prompt/workflow there
+                from PIL.PngImagePlugin import PngInfo
+                info = PngInfo()
+                for key, value in text.items():
+                    info.add_text(key, value)
+                src.save(tmp_path, format="PNG", optimize=True, pnginfo=info)
+
+            with PILImage.open(tmp_path) as out:
+                out.load()
+                identical = (
+                    out.size == src.size
+                    and ImageChops.difference(out.convert("RGBA"), src.convert("RGBA")).getbbox() is None
+                    # Metadata that didn't survive the round trip would be lost
+                    and png_text(out) == text
+                )
+
+        old_size = os.path.getsize(source_path)
+        new_size = os.path.getsize(tmp_path)
+        if not identical or new_size >= old_size:
+            os.remove(tmp_path)
+            return None
+        return old_size, new_size
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Compactor:
+    def __init__(self, fmt: str, workers: int, niceness: int):
+        self.format = fmt if fmt in ("webp", "png") else "webp"
+        self.workers = workers
+        self.niceness = niceness
+        self.enabled = PILImage is not None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_lower_priority, initargs=(self.niceness,)
+            )
+        return self._executor
+
+    async def pending(self, limit: int):
+        """Completed, not yet compacted images whose post-processing and batch are done."""
+        cutoff = datetime.utcnow() - timedelta(seconds=config.COMPACTOR_MIN_AGE_SECONDS)
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(
+                    Image.id, Image.filename, Image.category, Image.file_path, Image.is_public,
+                    Image.content_hash, Image.storage_backend
+                )
+                .select_from(Image)
+                .join(BatchJob, Image.batch_job_id == BatchJob.id, isouter=True)
+                .where(
+                    Image.status == JobStatus.COMPLETED,
+                    Image.bytes_saved.is_(None),
+                    Image.updated_at < cutoff,
+                    Image.file_path.is_not(None),
+                    # Running batches append PNGs to their archive; wait until they finish
+                    or_(
+                        Image.batch_job_id.is_(None),
+                        BatchJob.status.notin_([BatchJobStatus.QUEUED, BatchJobStatus.GENERATING])
+                    )
+                )
+                .order_by(Image.id)
+                .limit(limit)
+            )
+            return result.all()
+
+    async def _mark(self, image_id: int, saved: int) -> None:
+        async with get_session_context() as session:
+            await session.execute(update(Image).where(Image.id == image_id).values(bytes_saved=saved))
+            await session.commit()
+
+    async def compact_image(self, row) -> int:
+        """Compact one image; returns bytes saved (0 if nothing was gained)."""
+        source = row.file_path
+        if not os.path.isabs(source) or not os.path.isfile(source):
+            await self._mark(row.id, 0)
+            return 0
+
+        ext = ".webp" if self.format == "webp" else ".png"
+        stem, old_ext = os.path.splitext(row.filename)
+        new_filename = stem + ext
+        dest = os.path.join(os.path.dirname(source), new_filename)
+        # Kept beside the view until the row is committed; same extension so
+        # store_file files the object under the right name
+        tmp = os.path.join(os.path.dirname(source), f"{stem}.compact{ext}")
+
+        loop = asyncio.get_running_loop()
+        sizes = await loop.run_in_executor(self._pool(), compact_file, source, tmp, self.format)
+        if sizes is None:
+            await self._mark(row.id, 0)
+            return 0
+        old_size, new_size = sizes
+
+        new_hash = row.content_hash
+        uploaded = False
+        try:
+            if row.content_hash:
+                if config.STORAGE_DEDUP:
+                    new_hash, _ = await asyncio.to_thread(store_file, tmp)
+                else:
+                    new_hash = await asyncio.to_thread(hash_file, tmp)
+            if row.storage_backend != "local" and new_hash:
+                await object_storage.upload(image_key(new_hash, row.is_public, ext), tmp, IMAGE_MEDIA_TYPES[ext])
+                uploaded = True
+
+            # Optimistic swap: only if the row still points where we read from
+            async with get_session_context() as session:
+                result = await session.execute(
+                    update(Image)
+                    .where(Image.id == row.id, Image.file_path == source, Image.is_public == row.is_public)
+                    .values(
+                        filename=new_filename,
+                        file_path=dest,
+                        content_hash=new_hash,
+                        bytes_saved=old_size - new_size,
+                        updated_at=datetime.utcnow()
+                    )
+                )
+                await session.commit()
+        except Exception:
+            await self._discard(row, tmp, new_hash, ext, uploaded)
+            raise
+
+        if result.rowcount == 0:
+            # Moved (visibility change) while compacting: the files were never
+            # swapped in, drop the result and its objects and retry next scan
+            await self._discard(row, tmp, new_hash, ext, uploaded)
+            return 0
+
+        await asyncio.to_thread(os.replace, tmp, dest)
+        if dest != source:
+            await asyncio.to_thread(os.remove, source)
+        if row.content_hash and (row.content_hash != new_hash or ext != old_ext):
+            await asyncio.to_thread(release_object, row.content_hash, old_ext)
+            if row.storage_backend != "local":
+                await self._release_remote(row.content_hash, row.is_public, row.storage_backend, old_ext)
+        return old_size - new_size
+
+    async def _discard(self, row, tmp: str, new_hash: Optional[str], ext: str, uploaded: bool) -> None:
+        """Undo an attempt whose row update didn't happen: temp file, stored object, uploaded object."""
+        if os.path.exists(tmp):
+            await asyncio.to_thread(os.remove, tmp)
+        if not new_hash or new_hash == row.content_hash:
+            return  # The row's own object: still in use
+        if config.STORAGE_DEDUP:
+            await asyncio.to_thread(release_object, new_hash, ext)
+        if uploaded:
+            await self._release_remote(new_hash, row.is_public, row.storage_backend, ext)
+
+    async def _release_remote(self, content_hash: str, is_public: bool, storage_backend: str, ext: str) -> None:
+        """Delete a bucket object unless a row still references it."""
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(func.count()).where(
+                    Image.content_hash == content_hash,
+                    Image.is_public == is_public,
+                    Image.storage_backend == storage_backend
+                )
+            )
+            if result.scalar_one() == 0:
+                await object_storage.delete([image_key(content_hash, is_public, ext)])
+
+    async def run_once(self, limit: int) -> Dict[str, int]:
+        """Compact up to `limit` images; returns bytes saved per category."""
+        saved_by_category: Dict[str, int] = {}
+        public_changed = False
+        for row in await self.pending(limit):
+            try:
+                saved = await self.compact_image(row)
+            except Exception as e:
+                logger.warning(f"Compaction of image {row.id} failed: {e}")
+                await self._mark(row.id, 0)
+                continue
+            if saved:
+                saved_by_category[row.category] = saved_by_category.get(row.category, 0) + saved
+                public_changed = public_changed or (row.is_public and self.format == "webp")
+
+        # Filenames (and so URLs) changed for WebP
+        if public_changed:
+            await feed_cache.invalidate()
+        return saved_by_category
+
+    async def loop(self):
+        if not self.enabled:
+            logger.warning("Compactor disabled: Pillow is not installed (pip install pillow)")
+            return
+        logger.info(f"Compactor started ({self.format}, {self.workers} worker(s), nice {self.niceness})")
+        while True:
+            try:
+                saved = await self.run_once(config.COMPACTOR_BATCH_SIZE)
+                if saved:
+                    summary = ", ".join(f"{cat}: {size / 1024:.0f} KB" for cat, size in sorted(saved.items()))
+                    logger.info(f"Compacted images, saved {sum(saved.values()) / 1024 / 1024:.2f} MB ({summary})")
+                    continue
+            except Exception as e:
+                logger.error(f"Compactor error: {e}")
+            await asyncio.sleep(config.COMPACTOR_INTERVAL_SECONDS)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared instance started by the server when COMPACTOR_ENABLED
+compactor = Compactor(
+    fmt=config.COMPACTOR_FORMAT,
+    workers=config.COMPACTOR_WORKERS,
+    niceness=config.COMPACTOR_NICE
+)
@@ -0,0 +1,341 @@
+"""
+Dataset Export.
+
+Writes completed images as WebDataset-style tar shards for training:
+
+    <out>/shard-000000.tar   0000000123.png   the image
+                             0000000123.txt   caption (the prompt)
+                             0000000123.json  metadata (model, size, variations, ...)
+    <out>/manifest.jsonl     one line per sample with its key and shard (or manifest.parquet)
+    <out>/dataset.json       selection, and per shard: samples, bytes, sha256
+
+Samples are read from the DB in id order and cut into shards by size/count
+in that single pass, so the same rows always give the same shard layout.
+Tar headers carry fixed owners/modes and the image's own timestamp, which
+makes shards byte-identical across runs (compare the sha256 in dataset.json).
+
+Shards are written in a process pool while the DB is still being read, to
+`.part` files renamed once complete; the manifest is appended in shard
+order as they finish. With `resume`, shards already on disk are kept.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlmodel import select
+
+from ..database import get_session_context
+from ..models import Image, JobStatus
+from .storage import resolve_image_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency (parquet manifests)
+    pa = None
+
+logger = logging.getLogger("dataset_export")
+
+PAGE_SIZE = 1000
+TAR_BLOCK = 512
+MANIFEST_FORMATS = ("jsonl", "parquet")
+
+
+@dataclass(slots=True)
+class Sample:
+    key: str  # WebDataset key: zero-padded image id (no dots)
+    path: str
+    ext: str
+    size: int
+    mtime: int
+    metadata: Dict[str, Any]
+
+    @property
+    def caption(self) -> bytes:
+        return self.metadata["prompt"].encode("utf-8")
+
+    @property
+    def metadata_json(self) -> bytes:
+        return json.dumps(self.metadata, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+    @property
+    def tar_bytes(self) -> int:
+        """Space taken in the tar: three headers plus block-padded members."""
+        members = (self.size, len(self.caption), len(self.metadata_json))
+        return sum(TAR_BLOCK + -(-length // TAR_BLOCK) * TAR_BLOCK for length in members)
+
+
+class _HashingWriter(io.RawIOBase):
+    """Write-through file wrapper that hashes what passes, so shards are never re-read."""
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha256()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        self.file.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+
+def _tar_info(name: str, size: int, mtime: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o644
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_shard(path: str, samples: List[Sample], resume: bool) -> Tuple[int, str]:
+    """Build one shard (runs in a pool process). Returns (bytes, sha256)."""
+    if resume and os.path.isfile(path):
+        return os.path.getsize(path), _hash_file(path)
+
+    part_path = path + ".part"
+    try:
+        with open(part_path, "wb") as f:
+            sink = _HashingWriter(f)
+            with tarfile.open(fileobj=sink, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+                for sample in samples:
+                    with open(sample.path, "rb") as image:
+                        tar.addfile(_tar_info(sample.key + sample.ext, sample.size, sample.mtime), image)
+                    caption = sample.caption
+                    tar.addfile(_tar_info(sample.key + ".txt", len(caption), sample.mtime), io.BytesIO(caption))
+                    metadata = sample.metadata_json
+                    tar.addfile(_tar_info(sample.key + ".json", len(metadata), sample.mtime), io.BytesIO(metadata))
+        os.replace(part_path, path)
+        return sink.position, sink.digest.hexdigest()
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+def _metadata(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "prompt": row.prompt,
+        "negative_prompt": row.negative_prompt,
+        "model": row.model,
+        "provider": row.provider,
+        "width": row.width,
+        "height": row.height,
+        "category": row.category,
+        "batch_id": row.batch_job_id,
+        "variations": row.variation_values,
+        "seed": (row.settings or {}).get("seed"),
+        "content_hash": row.content_hash,
+        "created_at": row.created_at.isoformat()
+    }
+
+
+def _plan_page(rows) -> Tuple[List[Sample], int]:
+    """Samples for a page of rows (stat'ing files, off the event loop); rows without a file are skipped."""
+    samples = []
+    missing = 0
+    for row in rows:
+        path = resolve_image_path(row.file_path, row.category, row.filename)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            logger.warning(f"Image {row.id}: file missing ({path}), not exported")
+            missing += 1
+            continue
+        samples.append(Sample(
+            key=f"{row.id:010d}",
+            path=path,
+            ext=os.path.splitext(path)[1].lower() or ".png",
+            size=size,
+            # The row's timestamp, not the file's: compaction rewrites files
+            mtime=int(row.created_at.replace(tzinfo=timezone.utc).timestamp()),
+            metadata=_metadata(row)
+        ))
+    return samples, missing
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("key", pa.string()), ("shard", pa.string()), ("file", pa.string()), ("bytes", pa.int64()),
+        ("id", pa.int64()), ("prompt", pa.string()), ("negative_prompt", pa.string()),
+        ("model", pa.string()), ("provider", pa.string()), ("width", pa.int32()), ("height", pa.int32()),
+        ("category", pa.string()), ("batch_id", pa.int64()),
+        # Free-form per batch: kept as JSON text
+        ("variations", pa.string()),
+        ("seed", pa.int64()), ("content_hash", pa.string()), ("created_at", pa.string())
+    ])
+
+
+class _Manifest:
+    """Per-sample index, appended shard by shard."""
+
+    def __init__(self, path: str, fmt: str):
+        self.format = fmt
+        self.path = path
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(path, _parquet_schema())
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, shard: str, samples: List[Sample]):
+        records = [
+            {"key": sample.key, "shard": shard, "file": sample.key + sample.ext, "bytes": sample.size, **sample.metadata}
+            for sample in samples
+        ]
+        if self.format == "parquet":
+            for record in records:
+                record["variations"] = json.dumps(record["variations"], sort_keys=True) if record["variations"] else None
+            self.writer.write_table(pa.Table.from_pylist(records, schema=self.writer.schema))
+        else:
+            for record in records:
+                self.file.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.format == "parquet":
+            self.writer.close()
+        else:
+            self.file.close()
+
+
+async def export_dataset(
+    output_dir: str,
+    batch_id: Optional[int] = None,
+    category: Optional[str] = None,
+    public_only: bool = False,
+    shard_size_mb: int = 512,
+    shard_max_samples: int = 10000,
+    workers: int = 4,
+    manifest_format: str = "jsonl",
+    resume: bool = False,
+    on_shard: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Export completed images (optionally of one batch and/or category,
+    including its subcategories) to `output_dir`. Returns the dataset.json
+    summary; `on_shard(info)` is called as each shard completes.
+    """
+    if manifest_format not in MANIFEST_FORMATS:
+        raise ValueError(f"Unknown manifest format '{manifest_format}' (use {' or '.join(MANIFEST_FORMATS)})")
+    if manifest_format == "parquet" and pa is None:
+        raise RuntimeError("Parquet manifests require pyarrow (pip install pyarrow)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    filters = [Image.status == JobStatus.COMPLETED, Image.file_path.is_not(None)]
+    if batch_id is not None:
+        filters.append(Image.batch_job_id == batch_id)
+    if category:
+        category = category.strip("/")
+        filters.append(or_(Image.category == category, Image.category.startswith(category + "/", autoescape=True)))
+    if public_only:
+        filters.append(Image.is_public == True)
+
+    shard_bytes = shard_size_mb * 1024 * 1024
+    manifest = _Manifest(os.path.join(output_dir, f"manifest.{manifest_format}"), manifest_format)
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=max(1, workers))
+    in_flight = deque()  # (name, samples, future) in shard order
+    shards = []
+    exported = missing = 0
+
+    async def finish_oldest():
+        name, samples, future = in_flight.popleft()
+        size, sha256 = await future
+        manifest.write(name, samples)
+        info = {"name": name, "samples": len(samples), "bytes": size, "sha256": sha256}
+        shards.append(info)
+        if on_shard:
+            on_shard(info)
+
+    async def submit(samples: List[Sample]):
+        name = f"shard-{len(shards) + len(in_flight):06d}.tar"
+        future = loop.run_in_executor(executor, write_shard, os.path.join(output_dir, name), samples, resume)
+        in_flight.append((name, samples, future))
+        # Bounded: shards (and their sample lists) don't pile up faster than they are written
+        if len(in_flight) > max(1, workers) * 2:
+            await finish_oldest()
+
+    try:
+        current: List[Sample] = []
+        current_bytes = 0
+        last_id = 0
+        while True:
+            async with get_session_context() as session:
+                result = await session.execute(
+                    select(
+                        Image.id, Image.filename, Image.file_path, Image.category, Image.prompt,
+                        Image.negative_prompt, Image.model, Image.provider, Image.width, Image.height,
+                        Image.batch_job_id, Image.variation_values, Image.settings, Image.content_hash,
+                        Image.created_at
+                    )
+                    .where(Image.id > last_id, *filters)
+                    .order_by(Image.id)
+                    .limit(PAGE_SIZE)
+                )
+                rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            samples, page_missing = await asyncio.to_thread(_plan_page, rows)
+            missing += page_missing
+            for sample in samples:
+                if current and (current_bytes + sample.tar_bytes > shard_bytes or len(current) >= shard_max_samples):
+                    await submit(current)
+                    current, current_bytes = [], 0
+                current.append(sample)
+                current_bytes += sample.tar_bytes
+                exported += 1
+
+        if current:
+            await submit(current)
+        while in_flight:
+            await finish_oldest()
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        manifest.close()
+
+    summary = {
+        "selection": {"batch_id": batch_id, "category": category, "public_only": public_only},
+        "samples": exported,
+        "missing_files": missing,
+        "shard_size_mb": shard_size_mb,
+        "shard_max_samples": shard_max_samples,
+        "manifest": os.path.basename(manifest.path),
+        "shards": shards
+    }
+    summary_path = os.path.join(output_dir, "dataset.json")
+    with open(summary_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(summary_path + ".part", summary_path)
+    return summary
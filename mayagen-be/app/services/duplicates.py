@@ -0,0 +1,374 @@
+"""
+Near-Duplicate Index.
+
+Every completed image gets a 64-bit perceptual hash (pHash: DCT of a 32x32
+grayscale copy, low frequencies against their median), stored on
+`Image.phash` as 16 hex digits. Visually near-identical images differ in a
+few bits, so the Hamming distance between hashes finds them.
+
+The index keeps (image id, batch id, hash) for all hashed images in three
+packed 64-bit columns (24 bytes per image) and compares one hash against
+all of them at once with numpy (XOR + popcount). It is saved to
+PHASH_INDEX_PATH and, on startup, loaded and caught up with the rows hashed
+since it was saved; the `phash` column stays the source of truth.
+
+Hashing needs Pillow. numpy is optional: without it the DCT and the search
+fall back to plain Python (fine for small batches).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlmodel import select
+
+from ..core import config
+from ..database import get_session_context
+from ..models import Image
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # Optional dependency
+    PILImage = None
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency (pip install "syth-data[bulk]")
+    np = None
+
+logger = logging.getLogger("duplicates")
+
+DCT_SIZE = 32
+HASH_BITS = 8  # Low frequencies kept per axis: 8 x 8 = 64 bits
+FILE_MAGIC = b"PHASHIX1"
+FILE_HEADER = struct.Struct("<8sQd")  # magic, count, synced_at (epoch seconds)
+CLUSTER_BLOCK = 512  # Rows per block of the pairwise distance matrix
+
+
+def _dct_rows() -> List[List[float]]:
+    """First HASH_BITS rows of the DCT-II basis for DCT_SIZE samples."""
+    return [
+        [math.cos(math.pi * (2 * x + 1) * u / (2 * DCT_SIZE)) for x in range(DCT_SIZE)]
+        for u in range(HASH_BITS)
+    ]
+
+
+_DCT = _dct_rows()
+
+
+def perceptual_hash(path: str) -> int:
+    """64-bit pHash of an image file. Runs in a pool process."""
+    with PILImage.open(path) as src:
+        gray = src.convert("L").resize((DCT_SIZE, DCT_SIZE), PILImage.LANCZOS)
+        pixels = list(gray.getdata())
+
+    if np is not None:
+        basis = np.asarray(_DCT)
+        low = (basis @ np.asarray(pixels, dtype=np.float64).reshape(DCT_SIZE, DCT_SIZE) @ basis.T).ravel().tolist()
+    else:
+        rows = [pixels[i * DCT_SIZE:(i + 1) * DCT_SIZE] for i in range(DCT_SIZE)]
+        # basis @ rows, then @ basis.T
+        partial = [[sum(b[x] * rows[x][y] for x in range(DCT_SIZE)) for y in range(DCT_SIZE)] for b in _DCT]
+        low = [sum(p[y] * b[y] for y in range(DCT_SIZE)) for p in partial for b in _DCT]
+
+    # The DC term only reflects overall brightness: keep it out of the median
+    median = sorted(low[1:])[len(low[1:]) // 2]
+    value = 0
+    for bit, coefficient in enumerate(low):
+        if coefficient > median:
+            value |= 1 << bit
+    return value
+
+
+def format_hash(value: int) -> str:
+    return f"{value:016x}"
+
+
+def parse_hash(text: str) -> int:
+    return int(text, 16)
+
+
+class DuplicateIndex:
+    def __init__(self, path: str, max_distance: int, workers: int, enabled: bool = True):
+        self.path = path
+        self.max_distance = max_distance
+        self.workers = workers
+        self.enabled = enabled and PILImage is not None
+        self.ready = False
+        self.synced_at: Optional[datetime] = None
+        self._unsaved = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._reset()
+
+        if enabled and PILImage is None:
+            logger.warning("Near-duplicate detection disabled: Pillow is not installed (pip install pillow)")
+
+    # --- Storage: numpy columns with spare capacity, or typed arrays ---
+
+    def _reset(self):
+        self.count = 0
+        if np is not None:
+            self.ids = np.zeros(1024, dtype=np.int64)  # 0 = removed slot
+            self.batches = np.zeros(1024, dtype=np.int64)  # 0 = not in a batch
+            self.hashes = np.zeros(1024, dtype=np.uint64)
+        else:
+            self.ids, self.batches, self.hashes = array('q'), array('q'), array('Q')
+
+    def _append(self, ids: List[int], batches: List[int], hashes: List[int]):
+        if np is None:
+            self.ids.extend(ids)
+            self.batches.extend(batches)
+            self.hashes.extend(hashes)
+            self.count += len(ids)
+            return
+        end = self.count + len(ids)
+        if end > len(self.ids):
+            capacity = max(end, len(self.ids) * 2)
+            for name in ("ids", "batches", "hashes"):
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self.count] = column[:self.count]
+                setattr(self, name, grown)
+        self.ids[self.count:end] = ids
+        self.batches[self.count:end] = batches
+        self.hashes[self.count:end] = np.asarray(hashes, dtype=np.uint64)
+        self.count = end
+
+    def add_many(self, entries: Iterable[Tuple[int, Optional[int], int]]):
+        """Index (image id, batch id, hash) entries, replacing earlier hashes of the same images."""
+        entries = list(entries)
+        if not entries:
+            return
+        ids = [image_id for image_id, _, _ in entries]
+        self.discard(ids)
+        self._append(ids, [batch_id or 0 for _, batch_id, _ in entries], [value for _, _, value in entries])
+        self._unsaved += len(entries)
+
+    def add(self, image_id: int, batch_id: Optional[int], value: int):
+        self.add_many([(image_id, batch_id, value)])
+
+    def discard(self, image_ids: List[int]):
+        """Forget images (e.g. requeued for a new attempt)."""
+        if np is not None:
+            removed = np.isin(self.ids[:self.count], image_ids)
+            if removed.any():
+                self.ids[:self.count][removed] = 0
+                self._unsaved += 1
+            return
+        wanted = set(image_ids)
+        for position in range(self.count):
+            if self.ids[position] in wanted:
+                self.ids[position] = 0
+                self._unsaved += 1
+
+    # --- Queries ---
+
+    def matches(
+        self,
+        value: int,
+        batch_id: Optional[int] = None,
+        max_distance: Optional[int] = None,
+        exclude: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """(image id, distance) of indexed images within `max_distance` bits, closest first."""
+        limit = self.max_distance if max_distance is None else max_distance
+        if np is not None:
+            ids = self.ids[:self.count]
+            distances = np.bitwise_count(self.hashes[:self.count] ^ np.uint64(value))
+            mask = (distances <= limit) & (ids != 0)
+            if batch_id is not None:
+                mask &= self.batches[:self.count] == batch_id
+            if exclude is not None:
+                mask &= ids != exclude
+            found = sorted(zip(distances[mask].tolist(), ids[mask].tolist()))
+        else:
+            found = sorted(
+                ((self.hashes[i] ^ value).bit_count(), self.ids[i])
+                for i in range(self.count)
+                if self.ids[i] and self.ids[i] != exclude
+                and (batch_id is None or self.batches[i] == batch_id)
+                and (self.hashes[i] ^ value).bit_count() <= limit
+            )
+        return [(image_id, distance) for distance, image_id in found]
+
+    def hashed_count(self, batch_id: int) -> int:
+        if np is not None:
+            return int(((self.batches[:self.count] == batch_id) & (self.ids[:self.count] != 0)).sum())
+        return sum(1 for i in range(self.count) if self.ids[i] and self.batches[i] == batch_id)
+
+    def clusters(self, batch_id: int, max_distance: Optional[int] = None) -> List[List[int]]:
+        """
+        Groups of a batch's images linked by distances within `max_distance`
+        (transitively), largest first; images without near-duplicates are left out.
+        """
+        limit = self.max_distance if max_distance is None else max_distance
+        if np is not None:
+            members = (self.batches[:self.count] == batch_id) & (self.ids[:self.count] != 0)
+            ids = self.ids[:self.count][members].tolist()
+            hashes = self.hashes[:self.count][members]
+            pairs = []
+            # Block by block: the full n x n matrix wouldn't fit for big batches
+            for start in range(0, len(ids), CLUSTER_BLOCK):
+                block = np.bitwise_count(hashes[start:start + CLUSTER_BLOCK, None] ^ hashes[None, :])
+                rows, cols = np.nonzero(block <= limit)
+                keep = cols > rows + start
+                pairs.extend(zip((rows[keep] + start).tolist(), cols[keep].tolist()))
+        else:
+            positions = [i for i in range(self.count) if self.ids[i] and self.batches[i] == batch_id]
+            ids = [self.ids[i] for i in positions]
+            hashes = [self.hashes[i] for i in positions]
+            pairs = [
+                (a, b) for a in range(len(ids)) for b in range(a + 1, len(ids))
+                if (hashes[a] ^ hashes[b]).bit_count() <= limit
+            ]
+
+        parent = list(range(len(ids)))
+
+        def root(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for a, b in pairs:
+            parent[root(a)] = root(b)
+        groups = {}
+        for position, image_id in enumerate(ids):
+            groups.setdefault(root(position), []).append(image_id)
+        return sorted(
+            (sorted(group) for group in groups.values() if len(group) > 1),
+            key=lambda group: (-len(group), group[0])
+        )
+
+    # --- Hashing ---
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the app doesn't fork processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def compute(self, path: str) -> Optional[int]:
+        if not self.enabled or not os.path.isfile(path):
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), perceptual_hash, path)
+
+    # --- Persistence ---
+
+    def _snapshot(self) -> Tuple[bytes, int]:
+        """Live entries as bytes (taken on the event loop; written out on a thread)."""
+        if np is not None:
+            live = self.ids[:self.count] != 0
+            columns = (self.ids[:self.count][live], self.batches[:self.count][live], self.hashes[:self.count][live])
+            return b"".join(column.astype(column.dtype.newbyteorder("<")).tobytes() for column in columns), int(live.sum())
+        live = [i for i in range(self.count) if self.ids[i]]
+        columns = [array(code, (column[i] for i in live)) for code, column in (("q", self.ids), ("q", self.batches), ("Q", self.hashes))]
+        return b"".join(column.tobytes() for column in columns), len(live)
+
+    def _write(self, data: bytes, count: int, synced_at: datetime):
+        tmp_path = self.path + ".tmp"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(FILE_HEADER.pack(FILE_MAGIC, count, synced_at.replace(tzinfo=timezone.utc).timestamp()))
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        if self.synced_at is None:
+            return
+        data, count = self._snapshot()
+        self._unsaved = 0
+        await asyncio.to_thread(self._write, data, count, self.synced_at)
+
+    async def maybe_save(self):
+        if self._unsaved >= config.PHASH_INDEX_SAVE_EVERY:
+            await self.save()
+
+    def _read(self) -> Optional[Tuple[List[int], List[int], List[int], datetime]]:
+        try:
+            with open(self.path, "rb") as f:
+                magic, count, synced_at = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+                if magic != FILE_MAGIC:
+                    raise ValueError("not a near-duplicate index file")
+                columns = []
+                for code in ("q", "q", "Q"):
+                    column = array(code)
+                    column.frombytes(f.read(count * 8))
+                    if sys.byteorder == "big":
+                        column.byteswap()
+                    columns.append(column)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Ignoring near-duplicate index {self.path} ({e}), rebuilding from the database")
+            return None
+        return columns[0], columns[1], columns[2], datetime.fromtimestamp(synced_at, timezone.utc).replace(tzinfo=None)
+
+    async def start(self):
+        """Load the saved index, then add rows hashed since (all of them without a file)."""
+        try:
+            # Reset before the first await: the worker may add() while the file loads.
+            # Everything below goes through add_many, so an image it indexed
+            # meanwhile is replaced, never stored twice.
+            self._reset()
+            saved = await asyncio.to_thread(self._read)
+            if saved:
+                ids, batches, hashes, self.synced_at = saved
+                self.add_many(zip(ids, batches, hashes))
+            await self.sync()
+            self.ready = True
+            logger.info(f"Near-duplicate index ready: {self.count} images")
+        except Exception as e:
+            logger.error(f"Near-duplicate index failed to load: {e}")
+
+    async def sync(self):
+        started = datetime.utcnow()
+        # Some slack for rows committed with a timestamp taken just before the last sync
+        since = self.synced_at - timedelta(minutes=1) if self.synced_at else None
+        last_id = 0
+        added = 0
+        while True:
+            async with get_session_context() as session:
+                stmt = (
+                    select(Image.id, Image.batch_job_id, Image.phash)
+                    .where(Image.phash.is_not(None), Image.id > last_id)
+                    .order_by(Image.id)
+                    .limit(5000)
+                )
+                if since is not None:
+                    stmt = stmt.where(Image.updated_at >= since)
+                rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            # Replaces entries the worker added between two pages
+            self.add_many([(row.id, row.batch_job_id or 0, parse_hash(row.phash)) for row in rows])
+            added += len(rows)
+        self.synced_at = started
+        if added:
+            await self.save()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.ready and self._unsaved:
+            data, count = self._snapshot()
+            self._write(data, count, datetime.utcnow())
+
+
+# Shared instance used by the worker and the duplicates API
+duplicate_index = DuplicateIndex(
+    path=str(config.PHASH_INDEX_PATH),
+    max_distance=config.PHASH_MAX_DISTANCE,
+    workers=config.PHASH_WORKERS,
+    enabled=config.PHASH_ENABLED
+)
@@ -0,0 +1,200 @@
+"""
+Job/Batch Event Bus.
+
+Pub/sub for status transitions produced by the worker, consumed by the
+SSE / WebSocket endpoints in `app.api.events`.
+
+Every event is a small JSON-able dict published to one or more topics:
+- "image:{id}"  status (and progress) of a single job
+- "batch:{id}"  batch progress plus the status of every image in the batch
+
+Bridges (EVENTS_BRIDGE):
+- "local":    fan-out inside this process only (default; the worker runs in the API process)
+- "postgres": events go through pg_notify and every process LISTENs on the channel,
+              so subscribers connected to any replica see events from any worker
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+
+from ..core import config
+from ..database import engine
+from ..models import BatchJob, Image
+
+logger = logging.getLogger("events")
+
+PG_CHANNEL = "mayagen_events"
+
+
+class Subscription:
+    """A bounded queue of events for one connected client (a single consumer)."""
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics: Set[str] = set(topics)
+        # Slow consumer: a full deque drops its oldest event rather than blocking the publisher
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_queue)
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]) -> None:
+        self._events.append(event)
+        self._ready.set()
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Events queued but not yet consumed, oldest first."""
+        return list(self._events)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None on timeout (used for heartbeats)."""
+        if not self._events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._events.popleft()
+
+
+class EventBroker:
+    def __init__(self, bridge: str = "local", max_queue: int = 256):
+        self.bridge = bridge
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # --- Subscriptions ---
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        sub = Subscription(topics, self.max_queue)
+        for topic in sub.topics:
+            self._subscribers.setdefault(topic, set()).add(sub)
+        return sub
+
+    def extend(self, sub: Subscription, topics: Iterable[str]) -> None:
+        """Add topics to an existing subscription (WebSocket clients subscribe incrementally)."""
+        for topic in topics:
+            if topic not in sub.topics:
+                sub.topics.add(topic)
+                self._subscribers.setdefault(topic, set()).add(sub)
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for topic in sub.topics:
+            subs = self._subscribers.get(topic)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[topic]
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        """Deliver to local subscribers (each subscriber receives an event once)."""
+        delivered = set()
+        for topic in event.get("topics", []):
+            for sub in self._subscribers.get(topic, ()):
+                if sub not in delivered:
+                    delivered.add(sub)
+                    sub.push(event)
+
+    # --- Publishing ---
+
+    async def publish(self, event_type: str, data: Dict[str, Any], topics: List[str]) -> None:
+        event = {"event": event_type, "data": data, "topics": topics}
+        if self.bridge == "postgres":
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": PG_CHANNEL, "payload": json.dumps(event, default=str)}
+                    )
+                return
+            except Exception as e:
+                # Never fail a job because of a notification; at least serve local clients
+                logger.error(f"pg_notify failed, delivering locally: {e}")
+        self._dispatch(event)
+
+    def publish_threadsafe(self, event_type: str, data: Dict[str, Any], topics: List[str]) -> None:
+        """Publish from a worker thread (e.g. a blocking provider callback)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(event_type, data, topics), self._loop)
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self.bridge == "postgres" and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen_postgres())
+
+    async def _listen_postgres(self) -> None:
+        """LISTEN on the notification channel and fan events out locally. Reconnects on failure."""
+        import asyncpg
+
+        dsn = config.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+        def on_notify(connection, pid, channel, payload):
+            try:
+                self._dispatch(json.loads(payload))
+            except Exception as e:
+                logger.error(f"Bad event payload: {e}")
+
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                await conn.add_listener(PG_CHANNEL, on_notify)
+                logger.info(f"Listening for events on '{PG_CHANNEL}'")
+                while not conn.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event listener error: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(2)
+
+
+def image_topics(image_id: int, batch_job_id: Optional[int] = None) -> List[str]:
+    topics = [f"image:{image_id}"]
+    if batch_job_id:
+        topics.append(f"batch:{batch_job_id}")
+    return topics
+
+
+def image_event(img: Image) -> Dict[str, Any]:
+    return {
+        "id": img.id,
+        "status": img.status,
+        "batch_job_id": img.batch_job_id,
+        "error_message": img.error_message,
+        "updated_at": img.updated_at.isoformat() if img.updated_at else None
+    }
+
+
+def batch_event(batch: BatchJob) -> Dict[str, Any]:
+    return {
+        "id": batch.id,
+        "status": batch.status,
+        "total_images": batch.total_images,
+        "generated_count": batch.generated_count,
+        "failed_count": batch.failed_count,
+        "progress": round((batch.generated_count / batch.total_images) * 100, 1) if batch.total_images > 0 else 0,
+        "updated_at": batch.updated_at.isoformat() if batch.updated_at else None
+    }
+
+
+async def publish_image(img: Image) -> None:
+    await event_broker.publish("image", image_event(img), image_topics(img.id, img.batch_job_id))
+
+
+async def publish_batch(batch: BatchJob) -> None:
+    await event_broker.publish("batch", batch_event(batch), [f"batch:{batch.id}"])
+
+
+# Shared instance: the worker publishes, the streaming endpoints subscribe
+event_broker = EventBroker(bridge=config.EVENTS_BRIDGE)
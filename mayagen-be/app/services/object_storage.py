@@ -0,0 +1,222 @@
+"""
+Object Storage Backends.
+
+Where completed images and thumbnails live once generation is done:
+- "local": the API host's disk (OUTPUT_FOLDER / THUMBNAILS_DIR, served by the
+  media router). Nothing to upload.
+- "s3": any S3-compatible store (AWS S3, MinIO, R2...). The worker uploads in
+  the background after the job is COMPLETED; URLs then point at the bucket
+  (S3_PUBLIC_URL) or are presigned, so API replicas don't need the files.
+
+Keys are content-addressed and split by visibility so a bucket policy can
+grant public read on `public/` only:
+    {S3_PREFIX}public/objects/ab/cd/<sha256>.png
+    {S3_PREFIX}private/thumbs/<category>/<stem>_256.webp
+
+Requires boto3 for "s3" (pip install "syth-data[s3]").
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core import config
+from ..core.security import media_url_expiry
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # Optional dependency
+    boto3 = None
+
+logger = logging.getLogger("object_storage")
+
+MB = 1024 * 1024
+
+# Originals are PNGs, or WebP once the compactor re-encoded them
+IMAGE_MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp"}
+
+
+def image_ext(filename: Optional[str]) -> str:
+    """Object extension for an original, from its filename/path (".png" if unknown)."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in IMAGE_MEDIA_TYPES else ".png"
+
+
+def image_key(content_hash: str, is_public: bool, ext: str = ".png") -> str:
+    visibility = "public" if is_public else "private"
+    return f"{visibility}/objects/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{ext}"
+
+
+def thumbnail_key(relative_path: str, is_public: bool) -> str:
+    visibility = "public" if is_public else "private"
+    return f"{visibility}/thumbs/{relative_path}"
+
+
+def visibility_moves(
+    content_hash: Optional[str],
+    thumbnails: Optional[Dict[str, str]],
+    to_public: bool,
+    ext: str = ".png"
+) -> List[Tuple[str, str]]:
+    """(old key, new key) pairs for every object of an image changing visibility."""
+    pairs = []
+    if content_hash:
+        pairs.append((image_key(content_hash, not to_public, ext), image_key(content_hash, to_public, ext)))
+    for relative in (thumbnails or {}).values():
+        pairs.append((thumbnail_key(relative, not to_public), thumbnail_key(relative, to_public)))
+    return pairs
+
+
+class StorageBackend(ABC):
+    """
+    Interface implemented by every backend. `upload`/`move` are async and may
+    be slow; `url` must be cheap and synchronous (it runs per row in list views).
+    """
+    name = "base"
+    # True if `url` returns expiring (presigned) URLs for public objects too
+    public_urls_expire = False
+
+    @abstractmethod
+    async def upload(self, key: str, path: str, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    async def move(self, pairs: Iterable[Tuple[str, str]], keep: Iterable[str] = ()) -> None:
+        """
+        Rename objects (visibility changes): [(old key, new key), ...].
+        Old keys listed in `keep` are copied but not deleted (still referenced elsewhere).
+        """
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def url(self, key: str, is_public: bool) -> Optional[str]:
+        """Direct URL for a stored object, or None to use the API's media URLs."""
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files stay where the worker wrote them; app.services.storage owns the layout."""
+    name = "local"
+
+    async def upload(self, key: str, path: str, content_type: str) -> None:
+        return None
+
+    async def move(self, pairs: Iterable[Tuple[str, str]], keep: Iterable[str] = ()) -> None:
+        return None  # Local visibility moves are done by storage.relocate_image_files
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        return None
+
+    def url(self, key: str, is_public: bool) -> Optional[str]:
+        return None
+
+
+class S3StorageBackend(StorageBackend):
+    name = "s3"
+
+    def __init__(self):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the 'boto3' package (pip install boto3)")
+
+        self.bucket = config.S3_BUCKET
+        self.prefix = config.S3_PREFIX
+        self.public_url = config.S3_PUBLIC_URL.rstrip("/") if config.S3_PUBLIC_URL else None
+        # Without a public base URL every object is served through a presigned URL
+        self.public_urls_expire = self.public_url is None
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=config.S3_ENDPOINT_URL,
+            region_name=config.S3_REGION,
+            aws_access_key_id=config.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=config.S3_SECRET_ACCESS_KEY,
+            config=BotoConfig(
+                signature_version="s3v4",
+                # One connection per concurrent part upload
+                max_pool_connections=config.S3_UPLOAD_CONCURRENCY * 4,
+                s3={"addressing_style": "path" if config.S3_ENDPOINT_URL else "auto"}
+            )
+        )
+        # Large files go up as parallel multipart uploads
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=config.S3_MULTIPART_CHUNK_MB * MB,
+            max_concurrency=4,
+            use_threads=True
+        )
+        # Bounds how many files upload at once (boto3 calls are blocking, run in threads)
+        self._semaphore = asyncio.Semaphore(config.S3_UPLOAD_CONCURRENCY)
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _upload_sync(self, key: str, path: str, content_type: str) -> None:
+        # Content-addressed keys: an existing object already has these bytes
+        if self._exists(key):
+            return
+        self.client.upload_file(
+            path, self.bucket, key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": "public, max-age=31536000, immutable"},
+            Config=self.transfer_config
+        )
+
+    async def upload(self, key: str, path: str, content_type: str) -> None:
+        async with self._semaphore:
+            await asyncio.to_thread(self._upload_sync, self.prefix + key, path, content_type)
+
+    def _move_sync(self, old_key: str, new_key: str, delete_source: bool) -> None:
+        # Server-side copy: bytes never pass through this process
+        if not self._exists(new_key):
+            self.client.copy({"Bucket": self.bucket, "Key": old_key}, self.bucket, new_key, Config=self.transfer_config)
+        if delete_source:
+            self.client.delete_object(Bucket=self.bucket, Key=old_key)
+
+    async def move(self, pairs: Iterable[Tuple[str, str]], keep: Iterable[str] = ()) -> None:
+        keep = set(keep)
+
+        async def move_one(old_key: str, new_key: str):
+            async with self._semaphore:
+                await asyncio.to_thread(
+                    self._move_sync, self.prefix + old_key, self.prefix + new_key, old_key not in keep
+                )
+        await asyncio.gather(*(move_one(old, new) for old, new in pairs))
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = [{"Key": self.prefix + key} for key in keys]
+        if keys:
+            await asyncio.to_thread(self.client.delete_objects, Bucket=self.bucket, Delete={"Objects": keys})
+
+    def url(self, key: str, is_public: bool) -> Optional[str]:
+        if is_public and self.public_url:
+            return f"{self.public_url}/{self.prefix}{key}"
+        # Presigning is local (no request). Every URL signed within one window
+        # expires with the API's own signed URLs (ETags include that expiry), but
+        # X-Amz-Date is the signing time, so the URLs are not byte-identical.
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.prefix + key},
+            ExpiresIn=max(1, media_url_expiry() - int(time.time()))
+        )
+
+
+def _create_backend() -> StorageBackend:
+    if config.STORAGE_BACKEND == "s3":
+        return S3StorageBackend()
+    return LocalStorageBackend()
+
+
+# Backend new uploads go to; rows record theirs in Image.storage_backend
+object_storage = _create_backend()
@@ -0,0 +1,106 @@
+"""
+Generation Progress Table.
+
+Lightweight in-memory record of step-level progress for jobs that are running
+right now, fed by provider callbacks (ComfyUI websocket `progress` events and
+binary preview frames). Entries are dropped when the job finishes, so the table
+never holds more than the number of concurrently running jobs.
+
+Updates arrive from the provider thread (`asyncio.to_thread`), reads from the
+event loop, hence the lock.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from ..core import config
+
+
+@dataclass
+class JobProgress:
+    step: int = 0
+    max_steps: int = 0
+    started_at: float = 0.0       # Wall clock, for the API
+    sampling_since: float = 0.0   # Monotonic, start of the current sampling pass
+    updated_at: float = 0.0
+    preview: Optional[bytes] = None
+    preview_type: str = "image/jpeg"
+    preview_seq: int = 0
+
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time extrapolated from the average step duration of this pass."""
+        if self.step <= 0 or self.max_steps <= 0:
+            return None
+        elapsed = time.monotonic() - self.sampling_since
+        per_step = elapsed / self.step
+        return round(per_step * max(self.max_steps - self.step, 0), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "step": self.step,
+            "max_steps": self.max_steps,
+            "percent": round(self.step / self.max_steps * 100, 1) if self.max_steps else 0,
+            "eta_seconds": self.eta_seconds(),
+            "started_at": self.started_at,
+            "has_preview": self.preview is not None,
+            "preview_seq": self.preview_seq
+        }
+
+
+class ProgressTable:
+    def __init__(self, keep_previews: bool = True):
+        self.keep_previews = keep_previews
+        self._jobs: Dict[int, JobProgress] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._jobs[job_id] = JobProgress(started_at=time.time(), sampling_since=now, updated_at=now)
+
+    def update(self, job_id: int, step: int, max_steps: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return
+            # A new sampling pass (e.g. hires fix) restarts the step counter
+            if step < entry.step or max_steps != entry.max_steps:
+                entry.sampling_since = now
+            entry.step = step
+            entry.max_steps = max_steps
+            entry.updated_at = now
+
+    def set_preview(self, job_id: int, data: bytes, media_type: str) -> None:
+        if not self.keep_previews:
+            return
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return
+            entry.preview = data
+            entry.preview_type = media_type
+            entry.preview_seq += 1
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return entry.to_dict() if entry else None
+
+    def get_preview(self, job_id: int) -> Optional[tuple]:
+        """(bytes, media_type) of the latest preview frame, if any."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry.preview is None:
+                return None
+            return entry.preview, entry.preview_type
+
+    def finish(self, job_id: int) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+# Shared instance: the worker writes, the image endpoints read
+progress_table = ProgressTable(keep_previews=config.PROGRESS_KEEP_PREVIEWS)
@@ -0,0 +1,237 @@
+"""
+Prompt Files.
+
+Streaming readers for offline prompt lists (used by the CLI and by batches
+created from an uploaded prompt file). Rows are read one at a time, so
+multi-GB files run in constant memory. Formats by suffix
+(optionally gzipped, e.g. prompts.jsonl.gz):
+
+- .txt          one prompt per line, '#' starts a comment
+- .jsonl/.ndjson {"prompt": "...", "negative_prompt": "...", "model": "sd15",
+                  "width": 768, "height": 512, "seed": 42, "category": "cats",
+                  "filename": "cat_001.png"}
+- .csv/.tsv     header row with the same column names
+
+Only `prompt` is required; other fields fall back to the CLI defaults.
+
+`iter_grouped_rows` reorders rows by (model, width, height) so ComfyUI
+swaps checkpoints/latent sizes once per group instead of per row, without
+buffering rows in memory:
+- up to GROUP_PASS_LIMIT groups: one streaming pass over the file per group
+- up to GROUP_SPILL_LIMIT groups: one pass that spills each group's rows to
+  its own temp file, then replays the temp files group by group
+- more groups: file order (grouping would gain little)
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger("prompt_files")
+
+Group = Tuple[str, int, int]
+
+SUFFIXES = (".txt", ".jsonl", ".ndjson", ".csv", ".tsv")
+
+# Grouping strategy thresholds (number of distinct groups), see iter_grouped_rows
+GROUP_PASS_LIMIT = 8
+GROUP_SPILL_LIMIT = 256
+
+
+@dataclass(slots=True)
+class PromptRow:
+    index: int  # Data row number in the file (0-based): stable across reruns
+    prompt: str
+    model: str
+    width: int
+    height: int
+    negative_prompt: Optional[str] = None
+    seed: Optional[int] = None
+    category: Optional[str] = None
+    filename: Optional[str] = None
+
+    @property
+    def group(self) -> Group:
+        return (self.model, self.width, self.height)
+
+
+def prompt_file_suffix(filename: str) -> Optional[str]:
+    """Normalized suffix of a supported prompt file (e.g. ".jsonl.gz"), else None."""
+    name = filename.lower()
+    gz = name.endswith(".gz")
+    ext = os.path.splitext(name[:-3] if gz else name)[1]
+    if ext not in SUFFIXES:
+        return None
+    return ext + ".gz" if gz else ext
+
+
+def safe_category(category: str) -> str:
+    """Relative category path with no way out of the output folder."""
+    parts = [part for part in category.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts) or "uncategorized"
+
+
+def _format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext in (".csv", ".tsv"):
+        return ext[1:]
+    return "txt"
+
+
+def _open(path: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _records(path: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """(row number, raw fields) per data row; None for rows that can't be parsed."""
+    fmt = _format(path)
+    with _open(path) as f:
+        if fmt == "jsonl":
+            index = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                yield index, record if isinstance(record, dict) else None
+                index += 1
+        elif fmt in ("csv", "tsv"):
+            reader = csv.DictReader(f, delimiter="\t" if fmt == "tsv" else ",")
+            for index, record in enumerate(reader):
+                yield index, record
+        else:
+            index = 0
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                yield index, {"prompt": line}
+                index += 1
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def iter_prompt_rows(
+    path: str,
+    defaults: Dict[str, Any],
+    warn: bool = True,
+    on_error: Optional[Callable[[int, str], None]] = None
+) -> Iterator[PromptRow]:
+    """
+    Stream rows from a prompt file. `defaults` supplies model/width/height
+    (and optionally negative_prompt/category) for fields a row leaves empty.
+    Invalid rows are skipped (they keep their row number) and reported to
+    `on_error(row, reason)` if given, else logged.
+    """
+    for index, record in _records(path):
+        try:
+            if record is None:
+                raise ValueError("not a JSON object")
+            prompt = str(record.get("prompt") or "").strip()
+            if not prompt:
+                raise ValueError("missing prompt")
+            yield PromptRow(
+                index=index,
+                prompt=prompt,
+                model=record.get("model") or defaults["model"],
+                width=_optional_int(record.get("width")) or defaults["width"],
+                height=_optional_int(record.get("height")) or defaults["height"],
+                negative_prompt=record.get("negative_prompt") or defaults.get("negative_prompt"),
+                seed=_optional_int(record.get("seed")),
+                category=record.get("category") or defaults.get("category"),
+                filename=record.get("filename") or None
+            )
+        except (TypeError, ValueError) as e:
+            if on_error is not None:
+                on_error(index, str(e))
+            elif warn:
+                logger.warning(f"{os.path.basename(path)}: skipping row {index + 1} ({e})")
+
+
+def count_groups(path: str, defaults: Dict[str, Any]) -> Dict[Group, int]:
+    """Rows per (model, width, height), in order of first appearance."""
+    counts: Dict[Group, int] = {}
+    for row in iter_prompt_rows(path, defaults):
+        counts[row.group] = counts.get(row.group, 0) + 1
+    return counts
+
+
+def _spilled_rows(path: str, defaults: Dict[str, Any], groups: Dict[Group, int]) -> Iterator[PromptRow]:
+    """One pass partitioning rows into a temp file per group, then the groups in order."""
+    with tempfile.TemporaryDirectory(prefix="mayagen_groups_") as folder:
+        spill_paths = {group: os.path.join(folder, f"{n}.jsonl") for n, group in enumerate(groups)}
+        spills: Dict[Group, io.TextIOBase] = {}
+        try:
+            for row in iter_prompt_rows(path, defaults, warn=False):
+                spill_path = spill_paths.get(row.group)
+                if spill_path is None:
+                    continue
+                spill = spills.get(row.group)
+                if spill is None:
+                    spill = spills[row.group] = open(spill_path, "w", encoding="utf-8")
+                spill.write(json.dumps(asdict(row)) + "\n")
+        finally:
+            for spill in spills.values():
+                spill.close()
+
+        for group in groups:
+            if group not in spills:
+                continue
+            with open(spill_paths[group], "r", encoding="utf-8") as f:
+                for line in f:
+                    yield PromptRow(**json.loads(line))
+
+
+def iter_grouped_rows(path: str, defaults: Dict[str, Any], groups: Optional[Dict[Group, int]] = None) -> Iterator[PromptRow]:
+    """
+    Rows of `groups` (default: every group in the file), group by group.
+    The strategy depends on how many groups there are (see the module docstring).
+    """
+    if groups is None:
+        groups = count_groups(path, defaults)
+    name = os.path.basename(path)
+
+    # count_groups (or the caller's own pass) already warned about invalid rows
+    if len(groups) <= GROUP_PASS_LIMIT:
+        logger.info(f"{name}: grouping {len(groups)} model/size groups, one pass per group")
+        for group in groups:
+            for row in iter_prompt_rows(path, defaults, warn=False):
+                if row.group == group:
+                    yield row
+    elif len(groups) <= GROUP_SPILL_LIMIT:
+        logger.warning(f"{name}: {len(groups)} model/size groups, grouping through temp files in one pass")
+        yield from _spilled_rows(path, defaults, groups)
+    else:
+        logger.warning(f"{name}: {len(groups)} model/size groups (over {GROUP_SPILL_LIMIT}), keeping file order")
+        for row in iter_prompt_rows(path, defaults, warn=False):
+            if row.group in groups:
+                yield row
+
+
+def discard_prompt_file(path: Optional[str]):
+    """Delete an uploaded prompt file once its batch no longer needs it."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not delete prompt file {path}: {e}")
@@ -3,11 +3,44 @@ Prompt Generator Service for Bulk/Batch Image Generation.
 
 Generates unique prompts by combining variations from a BatchJob configuration.
 Uses template-based generation for predictable, fast prompt creation.
+
+Sampling is index-based: every combination of the template's variation axes
+has an index in [0, N) (mixed-radix, one digit per axis). A batch walks a
+seeded pseudo-random permutation of that index space, so the first N prompts
+are guaranteed unique, generation is O(total_images), and the same seed
+always yields the same prompts. Only past N do duplicates become unavoidable.
+
+Templates are compiled once (literals + field slots). Bulk generation picks
+all indices and mixed-radix digits in one vectorized pass when numpy is
+installed (pip install "syth-data[bulk]"); output is identical either way.
+See benchmarks/bench_prompts.py.
+
+`iter_prompts` streams the same sequence from any start index, with the
+variation values chosen for each prompt (stored on Image.variation_values).
+
+Batches may weight values and exclude combinations (see PromptSpace): the
+feasible space is counted exactly and sampled without rejection. Weighted
+batches are still sampled without replacement until every feasible
+combination was used.
 """
 
+import logging
+import math
 import random
-from typing import List, Dict, Any, Optional
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate, repeat
+from math import prod
+from string import Formatter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
 
+try:
+    import numpy as np
+except ImportError:  # Optional dependency: bulk paths fall back to pure Python
+    np = None
+
+logger = logging.getLogger("prompt_generator")
 
 # Default variation presets
 DEFAULT_VARIATIONS = {
@@ -22,6 +55,569 @@ DEFAULT_VARIATIONS = {
 # Default prompt template
 DEFAULT_TEMPLATE = "A {color} {target} {action} in a {environment}, {style}, {lighting}, 8k, highly detailed"
 
+# Used when a custom template references a variable nothing provides values for
+FALLBACK_TEMPLATE = "A {color} {target} {action} in {environment}, {style}, highly detailed"
+
+# Feasible value tuples of the axes named in exclusion rules are enumerated
+MAX_CONSTRAINED_COMBINATIONS = 1_000_000
+
+# Weighted batches rank every feasible combination up front up to this size;
+# larger spaces skip draws that repeat an earlier combination instead
+WEIGHTED_ORDER_LIMIT = 1_000_000
+
+# Consecutive repeated draws after which a large weighted space accepts a repeat
+MAX_REDRAWS = 100
+
+Axes = List[Tuple[str, List[str]]]
+
+
+class CompiledTemplate:
+    """
+    A prompt template parsed once: literal text between `{field}` slots.
+    Rendering is a single join, with whitespace already normalized in the
+    literals (values are normalized by `_clean`), so prompts come out as
+    `' '.join(template.format(...).split())` would.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.literals: List[str] = []
+        self.slots: List[str] = []
+        # Conversions/format specs ({x!r}, {x:>8}) take the str.format path
+        self.simple = True
+
+        literal = ""
+        for text, field, spec, conversion in Formatter().parse(template):
+            literal += text
+            if field is None:
+                continue
+            if spec or conversion:
+                self.simple = False
+            self.literals.append(literal)
+            self.slots.append(field)
+            literal = ""
+        self.literals.append(literal)
+
+        self.literals = [re.sub(r"\s+", " ", text) for text in self.literals]
+        self.literals[0] = self.literals[0].lstrip()
+        self.literals[-1] = self.literals[-1].rstrip()
+        self.fields = list(dict.fromkeys(self.slots))
+
+    def render(self, values: Dict[str, str]) -> str:
+        if not self.simple:
+            return ' '.join(self.template.format(**values).split())
+        parts = [self.literals[0]]
+        for field, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+def _clean(values: List[str]) -> List[str]:
+    """Normalize whitespace and drop empty/duplicate values (keeps order)."""
+    seen = {}
+    for value in values:
+        value = ' '.join(str(value).split())
+        if value:
+            seen.setdefault(value, None)
+    return list(seen)
+
+
+def _axis_values(field: str, variations: Dict[str, List[str]]) -> List[str]:
+    # Variations are keyed in plural ("colors") or as in the template ("color")
+    for key in (field, field + 's'):
+        values = _clean(variations.get(key) or [])
+        if values:
+            return values
+    return _clean(DEFAULT_VARIATIONS.get(field + 's', DEFAULT_VARIATIONS.get(field, [])))
+
+
+def prompt_axes(variations: Dict[str, List[str]], template: Optional[str] = None) -> Tuple[str, Axes]:
+    """
+    The template actually used and its variation axes [(field, values), ...].
+    Variations the template doesn't reference are ignored (they can't make
+    prompts differ); referenced fields without values fall back to defaults.
+    """
+    template = template or DEFAULT_TEMPLATE
+    variations = variations or {}
+    axes = []
+    for field in compile_template(template).fields:
+        if field == "target":
+            continue
+        values = _axis_values(field, variations)
+        if not values:
+            return prompt_axes(variations, FALLBACK_TEMPLATE)
+        axes.append((field, values))
+    return template, axes
+
+
+def value_columns(axes: Axes, indices: Sequence[int]) -> Dict[str, List[str]]:
+    """
+    Chosen value of every axis for each index, as one column per field. The
+    mixed-radix digits come from one vectorized pass when numpy is available.
+    """
+    columns: Dict[str, List[str]] = {}
+    if np is not None and isinstance(indices, np.ndarray):
+        remaining = indices.astype(np.int64, copy=True)
+        for field, values in reversed(axes):
+            remaining, digits = np.divmod(remaining, len(values))
+            columns[field] = np.array(values, dtype=object)[digits].tolist()
+    else:
+        remaining = list(indices)
+        for field, values in reversed(axes):
+            radix = len(values)
+            columns[field] = [values[i % radix] for i in remaining]
+            remaining = [i // radix for i in remaining]
+    return {field: columns[field] for field, _ in axes}
+
+
+def _render_columns(compiled: CompiledTemplate, target_subject: str, columns: Dict[str, List[str]], size: int) -> List[str]:
+    if not columns:
+        return [compiled.render({"target": target_subject})] * size
+    bound: Dict[str, Iterable[str]] = {"target": repeat(target_subject), **columns}
+
+    if not compiled.simple:
+        return [compiled.render(dict(zip(bound, row))) for row in zip(*bound.values())]
+
+    # Interleave literal and value columns: lit0, field0, lit1, field1, ..., litN
+    parts: List[Iterable[str]] = []
+    for literal, field in zip(compiled.literals, compiled.slots):
+        if literal:
+            parts.append(repeat(literal))
+        parts.append(bound[field])
+    if compiled.literals[-1]:
+        parts.append(repeat(compiled.literals[-1]))
+    return ["".join(row) for row in zip(*parts)]
+
+
+class IndexPermutation:
+    """
+    Seeded bijection on [0, n): a 4-round (unbalanced) Feistel network over
+    the bit width of n, cycle-walked back into range (the domain is < 2n, so
+    under 2 steps per index on average). O(1) memory regardless of n.
+    """
+    ROUNDS = 4
+
+    def __init__(self, n: int, seed: int):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        rng = random.Random(seed)
+        # Odd widths split unevenly; the halves swap roles every round
+        wide, narrow = bits - bits // 2, bits // 2
+        self.rounds = [
+            (key, low, (1 << low) - 1, high, (1 << high) - 1)
+            for key, (high, low) in zip(
+                (rng.getrandbits(32) for _ in range(self.ROUNDS)),
+                [(wide, narrow), (narrow, wide)] * (self.ROUNDS // 2)
+            )
+        ]
+
+    def _encrypt(self, value: int) -> int:
+        for key, low, low_mask, high, high_mask in self.rounds:
+            left, right = value >> low, value & low_mask
+            x = ((right ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+            x ^= x >> 15
+            x = (x * 0x85EBCA77) & 0xFFFFFFFF
+            x ^= x >> 13
+            value = (right << high) | (left ^ (x & high_mask))
+        return value
+
+    def __getitem__(self, index: int) -> int:
+        value = self._encrypt(index)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def _encrypt_array(self, values):
+        # Same rounds as _encrypt on uint64 lanes (products wrap mod 2**64,
+        # the low 32 bits kept are identical), so both paths agree
+        for key, low, low_mask, high, high_mask in self.rounds:
+            left, right = values >> np.uint64(low), values & np.uint64(low_mask)
+            x = ((right ^ np.uint64(key)) * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)
+            x ^= x >> np.uint64(15)
+            x = (x * np.uint64(0x85EBCA77)) & np.uint64(0xFFFFFFFF)
+            x ^= x >> np.uint64(13)
+            values = (right << np.uint64(high)) | (left ^ (x & np.uint64(high_mask)))
+        return values
+
+    def take(self, start: int, count: int) -> Sequence[int]:
+        """Images of indices [start, start + count), vectorized when numpy is available."""
+        if np is None or self.n >= 2 ** 62:
+            return [self[i] for i in range(start, start + count)]
+        values = self._encrypt_array(np.arange(start, start + count, dtype=np.uint64))
+        outside = values >= self.n
+        while outside.any():
+            values[outside] = self._encrypt_array(values[outside])
+            outside = values >= self.n
+        return values.astype(np.int64)
+
+
+def sample_indices(n: int, count: int, seed: int) -> Sequence[int]:
+    """
+    `count` combination indices: a permutation of [0, n), so all distinct
+    while count <= n. Beyond n, further passes use fresh permutations.
+    """
+    blocks = []
+    produced = 0
+    cycle = 0
+    while produced < count:
+        size = min(n, count - produced)
+        blocks.append(IndexPermutation(n, seed + cycle).take(0, size))
+        produced += size
+        cycle += 1
+    if np is not None and blocks and all(isinstance(block, np.ndarray) for block in blocks):
+        return np.concatenate(blocks)
+    return [int(i) for block in blocks for i in block]
+
+
+def _field_key(key: str, fields: Sequence[str]) -> Optional[str]:
+    """Template field a variations/weights/exclusions key refers to ("colors" -> "color")."""
+    if key in fields:
+        return key
+    if key.endswith('s') and key[:-1] in fields:
+        return key[:-1]
+    return None
+
+
+def _shares(values: List[str], weights: Dict[str, float]) -> List[float]:
+    """
+    Per-value probability: listed values get their share, the others split
+    what is left of 1.0 equally. Shares summing past 1 are normalized.
+    """
+    listed = {' '.join(str(value).split()): max(0.0, float(weight)) for value, weight in weights.items()}
+    total = sum(listed.get(value, 0.0) for value in values)
+    unlisted = [value for value in values if value not in listed]
+    rest = max(0.0, 1.0 - total) / len(unlisted) if unlisted else 0.0
+    shares = [listed.get(value, rest) for value in values]
+    scale = sum(shares)
+    return [share / scale for share in shares] if scale else shares
+
+
+def _uniform(seed: int, position: int, stream: int) -> float:
+    """Counter-based uniform in [0, 1): draw `stream` of prompt `position`, no RNG state to replay."""
+    x = (seed * 0x9E3779B97F4A7C15 + position * 0xD1B54A32D192ED03 + stream * 0x8CB92BA72F3D8DD7) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 31
+    return (x >> 11) * (1.0 / (1 << 53))
+
+
+def _uniform_array(seed: int, positions, stream: int):
+    # Same arithmetic as _uniform on uint64 lanes (products wrap mod 2**64)
+    base = (seed * 0x9E3779B97F4A7C15 + stream * 0x8CB92BA72F3D8DD7) & 0xFFFFFFFFFFFFFFFF
+    x = positions.astype(np.uint64) * np.uint64(0xD1B54A32D192ED03) + np.uint64(base)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+class _Draws:
+    """Distinct weighted draws taken so far for one seed (large weighted spaces)."""
+
+    def __init__(self):
+        self.indices: List[int] = []
+        self.seen: Set[int] = set()
+        self.next = 0  # Next draw counter
+        self.misses = 0  # Consecutive repeated draws
+        self.warned = False
+
+
+class PromptSpace:
+    """
+    The feasible combinations of a template's variation axes.
+
+    Axes named in exclusion rules are "constrained": their feasible value
+    tuples (the core) are enumerated once with a pruned depth-first walk. The
+    other axes are free, so the exact feasible count is len(core) * product of
+    free axis sizes, and combination index i unranks without rejection to
+    core[i // F] plus mixed-radix digits of i % F over the free axes.
+
+    With weights, a combination's weight is the product of its value shares.
+    `weighted_take` samples without replacement: spaces up to
+    WEIGHTED_ORDER_LIMIT are ranked once per cycle by Efraimidis-Spirakis
+    keys (-ln(u) / weight, ascending); larger ones draw independently (core
+    by cumulative weight, free axes one by one) and skip combinations already
+    drawn. `draw` keeps independent draws (repeats possible). None of them
+    ever produces an excluded combination.
+    """
+
+    def __init__(
+        self,
+        variations: Dict[str, List[str]],
+        template: Optional[str] = None,
+        weights: Optional[Dict[str, Dict[str, float]]] = None,
+        exclusions: Optional[List[Dict[str, str]]] = None
+    ):
+        self.template, axes = prompt_axes(variations, template)
+        self.compiled = compile_template(self.template)
+        fields = [field for field, _ in axes]
+
+        shares: Dict[str, Dict[str, float]] = {}
+        for key, listed in (weights or {}).items():
+            field = _field_key(key, fields)
+            if field and listed:
+                values = dict(axes)[field]
+                shares[field] = dict(zip(values, _shares(values, listed)))
+        # Zero-share values can never be drawn: drop them from the space
+        self.axes: Axes = [
+            (field, [value for value in values if shares.get(field, {}).get(value, 1.0) > 0])
+            for field, values in axes
+        ]
+        for field, values in self.axes:
+            if not values:
+                raise ValueError(f"Every value of '{field}' has a zero weight")
+        self.weighted = bool(shares)
+        self.fields = [field for field, _ in self.axes]
+
+        # Rules that can match at all, as {field: value}
+        available = {field: set(values) for field, values in self.axes}
+        rules = []
+        for exclusion in exclusions or []:
+            rule = {}
+            for key, value in exclusion.items():
+                field = _field_key(key, self.fields)
+                value = ' '.join(str(value).split())
+                if field is None or value not in available[field] or rule.get(field, value) != value:
+                    rule = None
+                    break
+                rule[field] = value
+            if rule:
+                rules.append(rule)
+
+        constrained = [field for field in self.fields if any(field in rule for rule in rules)]
+        self.core_axes: Axes = [(field, values) for field, values in self.axes if field in constrained]
+        self.free_axes: Axes = [(field, values) for field, values in self.axes if field not in constrained]
+        self.core: List[Tuple[str, ...]] = self._enumerate_core(rules) if rules else [()]
+
+        self.free_size = 1
+        for _, values in self.free_axes:
+            self.free_size *= len(values)
+        self.size = len(self.core) * self.free_size
+        if self.size == 0:
+            raise ValueError("No prompt combination satisfies the exclusions")
+
+        if self.weighted:
+            def share(field: str, value: str) -> float:
+                return shares.get(field, {}).get(value, 1.0 / len(dict(self.axes)[field]))
+            self.core_weights = [
+                prod(share(field, value) for (field, _), value in zip(self.core_axes, combo))
+                for combo in self.core
+            ]
+            self.core_cumulative = list(accumulate(self.core_weights))
+            self.free_shares = [[share(field, value) for value in values] for field, values in self.free_axes]
+            self.free_cumulative = [list(accumulate(shares)) for shares in self.free_shares]
+            self._order: Tuple[Optional[int], Sequence[int]] = (None, [])
+            self._draws: Dict[int, _Draws] = {}
+
+    def _enumerate_core(self, rules: List[Dict[str, str]]) -> List[Tuple[str, ...]]:
+        position = {field: depth for depth, (field, _) in enumerate(self.core_axes)}
+        # Each rule is checked once, at the depth of its last field
+        checks: List[List[Dict[str, str]]] = [[] for _ in self.core_axes]
+        for rule in rules:
+            checks[max(position[field] for field in rule)].append(rule)
+
+        core = []
+        chosen: Dict[str, str] = {}
+
+        def walk(depth: int):
+            if depth == len(self.core_axes):
+                core.append(tuple(chosen[field] for field, _ in self.core_axes))
+                if len(core) > MAX_CONSTRAINED_COMBINATIONS:
+                    raise ValueError(
+                        f"Exclusions constrain more than {MAX_CONSTRAINED_COMBINATIONS} combinations; "
+                        "use fewer or narrower rules"
+                    )
+                return
+            field, values = self.core_axes[depth]
+            for value in values:
+                chosen[field] = value
+                if any(all(chosen[f] == v for f, v in rule.items()) for rule in checks[depth]):
+                    continue  # Pruned: every completion would be excluded
+                walk(depth + 1)
+            del chosen[field]
+
+        walk(0)
+        return core
+
+    def _columns(self, core_rows: Sequence[Tuple[str, ...]], free: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        core = {field: [row[j] for row in core_rows] for j, (field, _) in enumerate(self.core_axes)}
+        return {field: core[field] if field in core else free[field] for field in self.fields}
+
+    def unrank(self, indices: Sequence[int]) -> Dict[str, List[str]]:
+        """Value columns for combination indices in [0, size)."""
+        if not self.core_axes:
+            return value_columns(self.free_axes, indices)
+        if np is not None and isinstance(indices, np.ndarray):
+            core_indices, free_indices = np.divmod(indices, self.free_size)
+            core_rows = [self.core[i] for i in core_indices.tolist()]
+        else:
+            core_indices, free_indices = [i // self.free_size for i in indices], [i % self.free_size for i in indices]
+            core_rows = [self.core[i] for i in core_indices]
+        return self._columns(core_rows, value_columns(self.free_axes, free_indices))
+
+    def _draw_indices(self, seed: int, positions: Iterable[int]) -> List[int]:
+        """Independent weighted draws as combination indices (core row, then free digits)."""
+        last = len(self.core) - 1
+        total = self.core_cumulative[-1]
+        indices = []
+        for i in positions:
+            index = min(last, bisect_right(self.core_cumulative, _uniform(seed, i, 0) * total))
+            for stream, ((_, values), cumulative) in enumerate(zip(self.free_axes, self.free_cumulative), start=1):
+                digit = min(len(values) - 1, bisect_right(cumulative, _uniform(seed, i, stream) * cumulative[-1]))
+                index = index * len(values) + digit
+            indices.append(index)
+        return indices
+
+    def draw(self, seed: int, positions: Sequence[int]) -> Dict[str, List[str]]:
+        """
+        Independent draws for batch positions (weighted when weights are set,
+        uniform otherwise). Draw i depends only on (seed, i).
+        """
+        if not self.weighted:
+            return self.unrank([int(_uniform(seed, i, 0) * self.size) for i in positions])
+        return self.unrank(self._draw_indices(seed, positions))
+
+    def _index_weights(self, indices: Sequence[int]) -> List[float]:
+        """Weight of each combination index (same multiplication order on both paths)."""
+        if np is not None and isinstance(indices, np.ndarray):
+            remaining, free = np.divmod(indices, self.free_size)
+            weights = np.array(self.core_weights)[remaining]
+            for (_, values), shares in zip(reversed(self.free_axes), reversed(self.free_shares)):
+                free, digits = np.divmod(free, len(values))
+                weights = weights * np.array(shares)[digits]
+            return weights.tolist()
+        weights = []
+        for index in indices:
+            free = index % self.free_size
+            weight = self.core_weights[index // self.free_size]
+            for (_, values), shares in zip(reversed(self.free_axes), reversed(self.free_shares)):
+                free, digit = divmod(free, len(values))
+                weight *= shares[digit]
+            weights.append(weight)
+        return weights
+
+    def _weighted_order(self, seed: int) -> Sequence[int]:
+        """Every feasible index, ordered by Efraimidis-Spirakis keys for `seed` (one cycle)."""
+        cached_seed, order = self._order
+        if cached_seed == seed:
+            return order
+        if np is not None:
+            indices = np.arange(self.size, dtype=np.int64)
+            uniforms = _uniform_array(seed, indices, 0).tolist()
+        else:
+            indices = range(self.size)
+            uniforms = [_uniform(seed, i, 0) for i in indices]
+        # math.log on both paths keeps the keys (and so the order) identical
+        keys = [
+            -math.log(u) / weight if u > 0 and weight > 0 else math.inf
+            for u, weight in zip(uniforms, self._index_weights(indices))
+        ]
+        if np is not None:
+            order = np.argsort(np.array(keys), kind="stable")
+        else:
+            order = sorted(indices, key=keys.__getitem__)
+        self._order = (seed, order)
+        return order
+
+    def _distinct_draws(self, seed: int, end: int) -> List[int]:
+        """The first `end` weighted draws that don't repeat an earlier one."""
+        state = self._draws.setdefault(seed, _Draws())
+        while len(state.indices) < end:
+            for index in self._draw_indices(seed, range(state.next, state.next + 1000)):
+                state.next += 1
+                if index in state.seen and state.misses < MAX_REDRAWS:
+                    state.misses += 1
+                    continue
+                if state.misses == MAX_REDRAWS and not state.warned:
+                    logger.warning(f"Weights too skewed to avoid repeats: accepting one after {MAX_REDRAWS} redraws")
+                    state.warned = True
+                state.misses = 0
+                state.seen.add(index)
+                state.indices.append(index)
+                if len(state.indices) == end:
+                    break
+        return state.indices
+
+    def weighted_take(self, seed: int, start: int, count: int) -> Sequence[int]:
+        """
+        Combination indices for batch positions [start, start + count), weighted
+        and without replacement: all distinct while start + count <= size.
+        Past size, further cycles use fresh seeds (like the unweighted path).
+        """
+        if self.size > WEIGHTED_ORDER_LIMIT:
+            return self._distinct_draws(seed, start + count)[start:start + count]
+        blocks = []
+        position, end = start, start + count
+        while position < end:
+            cycle, offset = divmod(position, self.size)
+            size = min(self.size - offset, end - position)
+            blocks.append(self._weighted_order(seed + cycle)[offset:offset + size])
+            position += size
+        if np is not None and blocks and all(isinstance(block, np.ndarray) for block in blocks):
+            return np.concatenate(blocks)
+        return [int(i) for block in blocks for i in block]
+
+    def render(self, target_subject: str, columns: Dict[str, List[str]], size: int) -> List[str]:
+        return _render_columns(self.compiled, target_subject, columns, size)
+
+
+class PromptChoice(NamedTuple):
+    index: int  # Position in the batch (0-based)
+    prompt: str
+    variations: Dict[str, str]  # Value chosen per template field
+
+
+def iter_prompts(
+    target_subject: str,
+    variations: Dict[str, List[str]],
+    template: Optional[str] = None,
+    seed: int = 0,
+    start: int = 0,
+    count: Optional[int] = None,
+    chunk_size: int = 1000,
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+    exclusions: Optional[List[Dict[str, str]]] = None
+) -> Iterator[PromptChoice]:
+    """
+    Lazily yield prompts from position `start` on (forever if `count` is None).
+
+    Position i is combination `IndexPermutation(n, seed + i // n)[i % n]`
+    (or `space.weighted_take(seed, i, 1)`), so resuming at any index replays
+    nothing and memory stays O(chunk_size) (weighted spaces above
+    WEIGHTED_ORDER_LIMIT replay their draws, O(start + count)). Yields the same sequence as
+    `generate_prompts(..., seed=seed)`, minus its repair of prompts that
+    render alike from different combinations.
+    """
+    space = PromptSpace(variations, template, weights, exclusions)
+    n = space.size
+    position = start
+    end = None if count is None else start + count
+    warned = False
+
+    while end is None or position < end:
+        cycle, offset = divmod(position, n)
+        size = min(chunk_size, n - offset)
+        if end is not None:
+            size = min(size, end - position)
+        if cycle and not warned:
+            logger.warning(f"All {n} unique combinations used; prompts repeat from index {max(n, start)}")
+            warned = True
+        if space.weighted:
+            columns = space.unrank(space.weighted_take(seed, position, size))
+        else:
+            columns = space.unrank(IndexPermutation(n, seed + cycle).take(offset, size))
+
+        prompts = space.render(target_subject, columns, size)
+        for i, prompt in enumerate(prompts):
+            yield PromptChoice(position + i, prompt, {field: column[i] for field, column in columns.items()})
+        position += size
+
 
 def generate_single_prompt(
     target_subject: str,
@@ -39,35 +635,8 @@ def generate_single_prompt(
     Returns:
         A formatted prompt string
     """
-    template = template or DEFAULT_TEMPLATE
-    
-    # Build replacements dict
-    replacements = {"target": target_subject}
-    
-    # Pick random values from each variation category
-    for key, values in variations.items():
-        if values:
-            # Remove 's' suffix for template matching (colors -> color)
-            template_key = key.rstrip('s') if key.endswith('s') else key
-            replacements[template_key] = random.choice(values)
-    
-    # Fill in defaults for any missing template variables
-    for key in ["color", "environment", "action", "style", "lighting", "camera"]:
-        if key not in replacements:
-            default_values = DEFAULT_VARIATIONS.get(key + 's', DEFAULT_VARIATIONS.get(key, [""]))
-            replacements[key] = random.choice(default_values) if default_values else ""
-    
-    # Format the template
-    try:
-        prompt = template.format(**replacements)
-    except KeyError as e:
-        # Fallback: use simple concatenation if template has unknown keys
-        prompt = f"A {replacements.get('color', '')} {target_subject} {replacements.get('action', '')} in {replacements.get('environment', '')}, {replacements.get('style', 'photorealistic')}, highly detailed"
-    
-    # Clean up extra spaces
-    prompt = ' '.join(prompt.split())
-    
-    return prompt
+    space = PromptSpace(variations, template)
+    return space.render(target_subject, space.draw(random.randrange(2 ** 31), [0]), 1)[0]
 
 
 def generate_prompts(
@@ -75,7 +644,10 @@ def generate_prompts(
     total_images: int,
     variations: Dict[str, List[str]],
     template: Optional[str] = None,
-    unique: bool = True
+    unique: bool = True,
+    seed: Optional[int] = None,
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+    exclusions: Optional[List[Dict[str, str]]] = None
 ) -> List[str]:
     """
     Generate multiple prompts for batch image generation.
@@ -85,61 +657,74 @@ def generate_prompts(
         total_images: Number of prompts to generate
         variations: Dict of variation categories
         template: Optional custom template
-        unique: If True, try to avoid duplicate prompts
+        unique: If True, no prompt repeats until every combination was used
+        seed: Makes the output reproducible (random if omitted)
+        weights: Share per value, e.g. {"environments": {"outdoor": 0.7}};
+            with unique, weighted prompts still don't repeat until every
+            combination was used
+        exclusions: Value combinations never to generate,
+            e.g. [{"environment": "underwater", "action": "running"}]
     
     Returns:
         List of prompt strings
     """
-    prompts = []
-    seen = set()
-    max_attempts = total_images * 3  # Prevent infinite loops
-    attempts = 0
-    
-    while len(prompts) < total_images and attempts < max_attempts:
-        prompt = generate_single_prompt(target_subject, variations, template)
-        
-        if unique and prompt in seen:
-            attempts += 1
-            continue
-        
-        seen.add(prompt)
-        prompts.append(prompt)
-        attempts += 1
-    
-    # If we couldn't generate enough unique prompts, fill with duplicates
-    while len(prompts) < total_images:
-        prompt = generate_single_prompt(target_subject, variations, template)
-        prompts.append(prompt)
-    
+    space = PromptSpace(variations, template, weights, exclusions)
+    n = space.size
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+
+    if not unique:
+        return space.render(target_subject, space.draw(seed, range(total_images)), total_images)
+
+    if total_images > n:
+        logger.warning(f"Only {n} unique combinations for {total_images} prompts; {total_images - n} will repeat")
+    if space.weighted:
+        return space.render(target_subject, space.unrank(space.weighted_take(seed, 0, total_images)), total_images)
+
+    prompts = space.render(target_subject, space.unrank(sample_indices(n, total_images, seed)), total_images)
+    head = min(n, total_images)
+    if len(set(prompts[:head])) == head:
+        return prompts
+
+    # Distinct indices can still render alike if values overlap across fields
+    # (e.g. "a b" + "c" vs "a" + "b c"): walk the permutation, skipping repeats
+    seen = dict.fromkeys(space.render(target_subject, space.unrank(sample_indices(n, n, seed)), n))
+    prompts = list(seen)[:total_images]
+    if len(prompts) < total_images:
+        missing = total_images - len(prompts)
+        prompts += space.render(target_subject, space.unrank(sample_indices(n, missing, seed + 1)), missing)
     return prompts
 
 
-def estimate_unique_combinations(variations: Dict[str, List[str]]) -> int:
+def estimate_unique_combinations(
+    variations: Dict[str, List[str]],
+    template: Optional[str] = None,
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+    exclusions: Optional[List[Dict[str, str]]] = None
+) -> int:
     """
-    Calculate the maximum number of unique prompt combinations possible.
+    Calculate the exact number of unique prompt combinations possible.
     
     Args:
         variations: Dict of variation categories
+        template: Optional custom template (only its fields count)
+        weights: Values with a zero share don't count
+        exclusions: Excluded combinations don't count
     
     Returns:
-        Number of possible unique combinations
+        Number of feasible unique combinations
     """
-    if not variations:
-        return 1
-    
-    total = 1
-    for values in variations.values():
-        if values:
-            total *= len(values)
-    
-    return total
+    return PromptSpace(variations, template, weights, exclusions).size
 
 
 def get_sample_prompts(
     target_subject: str,
     variations: Dict[str, List[str]],
     template: Optional[str] = None,
-    count: int = 5
+    count: int = 5,
+    seed: Optional[int] = None,
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+    exclusions: Optional[List[Dict[str, str]]] = None
 ) -> List[str]:
     """
     Generate sample prompts for preview purposes.
@@ -149,8 +734,11 @@ def get_sample_prompts(
         variations: Dict of variation categories
         template: Optional custom template
         count: Number of samples to generate
+        seed: Pass the batch seed to preview its first prompts
+        weights: Share per value (see generate_prompts)
+        exclusions: Value combinations never to generate
     
     Returns:
         List of sample prompt strings
     """
-    return generate_prompts(target_subject, count, variations, template, unique=True)
+    return generate_prompts(target_subject, count, variations, template, unique=True, seed=seed, weights=weights, exclusions=exclusions)
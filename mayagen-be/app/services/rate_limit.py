@@ -0,0 +1,66 @@
+"""
+Login Throttling.
+
+In-memory sliding-window counters used by the auth endpoints so that a
+credential-stuffing burst is rejected with 429 *before* any bcrypt work is
+queued. Two limiters:
+- per client IP: every attempt counts (bounds CPU spent on one source)
+- per username:  only failed attempts count (bounds guessing on one account)
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+from fastapi import Request
+
+from ..core import config
+
+
+class SlidingWindowLimiter:
+    def __init__(self, max_hits: int, window_seconds: float, max_keys: int = 100_000):
+        self.max_hits = max_hits
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def _window_for(self, key: str, now: float) -> Deque[float]:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = deque()
+            self._hits[key] = hits
+            # Bound memory under key-spraying: forget the least recently seen keys
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key: str) -> Optional[int]:
+        """Seconds until `key` may try again, or None if it is under the limit."""
+        now = time.monotonic()
+        hits = self._window_for(key, now)
+        if len(hits) < self.max_hits:
+            return None
+        return max(1, int(hits[0] + self.window - now) + 1)
+
+    def hit(self, key: str) -> None:
+        now = time.monotonic()
+        self._window_for(key, now).append(now)
+
+    def reset(self, key: str) -> None:
+        self._hits.pop(key, None)
+
+
+def client_ip(request: Request) -> str:
+    if config.TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+ip_limiter = SlidingWindowLimiter(config.LOGIN_MAX_ATTEMPTS_PER_IP, config.LOGIN_THROTTLE_WINDOW_SECONDS)
+username_limiter = SlidingWindowLimiter(config.LOGIN_MAX_FAILURES_PER_USER, config.LOGIN_THROTTLE_WINDOW_SECONDS)
@@ -0,0 +1,181 @@
+"""
+Image Storage Layout.
+
+All path logic for generated files lives here.
+
+Content-addressed object store (canonical copy, never served directly):
+    OUTPUT_FOLDER/_objects/{h[0:2]}/{h[2:4]}/{sha256}.png
+Sharding by hash prefix keeps every directory small (65k shards), identical
+outputs are stored once, and backups only need `_objects/`.
+
+Category views (what URLs and `Image.file_path` point at) are hardlinks to
+the object, split into two trees by visibility:
+- public:  OUTPUT_FOLDER/{category}/{filename}           (plain /images URLs)
+- private: OUTPUT_FOLDER/_private/{category}/{filename}  (signed /images URLs only)
+Thumbnails use the same public/private split under THUMBNAILS_DIR. Changing
+an image's visibility moves its views between the trees, so the media router
+can decide access from the path alone.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+from typing import Dict, Optional, Tuple
+
+from ..core import config
+
+logger = logging.getLogger("storage")
+
+
+def safe_category_name(category: str) -> str:
+    """
+    Flat folder name for a user-supplied category (letters, digits, '_', '-').
+    Never one of the reserved top-level folders (private tree, object store).
+    """
+    name = "".join([c for c in category if c.isalnum() or c in (' ', '_', '-')]).strip().replace(" ", "_")
+    if name in (config.PRIVATE_MEDIA_PREFIX, config.STORAGE_OBJECTS_PREFIX):
+        name = name.lstrip("_")
+    return name or "uncategorized"
+
+
+def _tree(root: str, category: Optional[str], is_public: bool) -> str:
+    safe_category = (category or "uncategorized").replace("\\", "/")
+    if is_public:
+        return os.path.join(root, safe_category)
+    return os.path.join(root, config.PRIVATE_MEDIA_PREFIX, safe_category)
+
+
+def image_dir(category: Optional[str], is_public: bool = True) -> str:
+    return _tree(config.OUTPUT_FOLDER, category, is_public)
+
+
+def image_view_path(category: Optional[str], filename: str, is_public: bool = True) -> str:
+    """Where an image's category view lives for the given visibility."""
+    return os.path.join(image_dir(category, is_public), filename)
+
+
+def thumbnail_dir(category: Optional[str], is_public: bool = True) -> str:
+    return _tree(str(config.THUMBNAILS_DIR), category, is_public)
+
+
+def resolve_image_path(file_path: Optional[str], category: Optional[str], filename: Optional[str]) -> str:
+    """Absolute path of a generated file (worker stores absolute paths once COMPLETED)."""
+    if file_path and os.path.isabs(file_path):
+        return file_path
+    return os.path.join(image_dir(category), filename or "")
+
+
+# --- Content-addressed objects ---
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(content_hash: str, ext: str = ".png") -> str:
+    return os.path.join(
+        config.OUTPUT_FOLDER, config.STORAGE_OBJECTS_PREFIX,
+        content_hash[:2], content_hash[2:4], content_hash + ext
+    )
+
+
+def _link_view(obj: str, view: str) -> None:
+    """Atomically point `view` at `obj` (hardlink; copy if the filesystem can't link)."""
+    os.makedirs(os.path.dirname(view), exist_ok=True)
+    tmp = view + ".link"
+    try:
+        os.link(obj, tmp)
+    except OSError as e:
+        logger.warning(f"Hardlink unavailable ({e}); copying {obj} -> {view}")
+        shutil.copy2(obj, tmp)
+    os.replace(tmp, view)
+
+
+def store_file(path: str) -> Tuple[str, bool]:
+    """
+    Move a freshly written file into the object store and leave a hardlink at
+    `path`. Identical content is stored once. Blocking; run via asyncio.to_thread.
+    Returns (content hash, whether an identical object already existed).
+    """
+    content_hash = hash_file(path)
+    obj = object_path(content_hash, os.path.splitext(path)[1] or ".png")
+
+    if not os.path.exists(obj):
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        try:
+            os.link(path, obj)
+            return content_hash, False
+        except FileExistsError:
+            pass  # Same content stored concurrently: dedup against it below
+        except OSError:
+            shutil.copy2(path, obj)
+            return content_hash, False
+
+    if os.path.samefile(obj, path):
+        return content_hash, False  # Already stored (re-run)
+    _link_view(obj, path)  # Duplicate output: drop our copy, share the object
+    return content_hash, True
+
+
+def restore_view(file_path: str, content_hash: str) -> bool:
+    """Recreate a missing/broken category view from its object."""
+    obj = object_path(content_hash, os.path.splitext(file_path)[1] or ".png")
+    if not os.path.isfile(obj):
+        return False
+    _link_view(obj, file_path)
+    return True
+
+
+def release_object(content_hash: str, ext: str = ".png") -> bool:
+    """Delete an object no view links to anymore (after its content was replaced)."""
+    obj = object_path(content_hash, ext)
+    try:
+        if os.stat(obj).st_nlink > 1:
+            return False  # Still the content of some view
+        os.remove(obj)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# --- Visibility moves ---
+
+def _move(src: str, dest: str) -> bool:
+    if not os.path.isfile(src):
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.replace(src, dest)
+    return True
+
+
+def relocate_image_files(
+    file_path: Optional[str],
+    category: Optional[str],
+    filename: Optional[str],
+    thumbnails: Optional[Dict[str, str]],
+    to_public: bool
+) -> Optional[str]:
+    """
+    Move an image's view (and its thumbnails) into the public or private tree.
+    Blocking; run via asyncio.to_thread. Returns the new `file_path`
+    (unchanged if the file isn't where it was expected).
+    """
+    new_file_path = file_path
+    if filename:
+        source = file_path if file_path and os.path.isabs(file_path) else image_view_path(category, filename, not to_public)
+        target = image_view_path(category, filename, to_public)
+        if os.path.abspath(source) != os.path.abspath(target) and _move(source, target):
+            new_file_path = target
+
+    for relative in (thumbnails or {}).values():
+        name = os.path.basename(relative)
+        _move(
+            os.path.join(thumbnail_dir(category, not to_public), name),
+            os.path.join(thumbnail_dir(category, to_public), name)
+        )
+
+    return new_file_path
@@ -0,0 +1,136 @@
+"""
+Thumbnail Service.
+
+Renders small WebP/AVIF derivatives of generated images so grid views don't
+download full-resolution PNGs. Decoding and resizing is CPU-bound, so it runs
+in a ProcessPoolExecutor and never blocks the event loop or the worker.
+
+Derivatives live in THUMBNAILS_DIR (served at /thumbs), mirroring the
+category layout: `{category}/{stem}_{width}.{ext}` (under `_private/` for
+private images). The relative paths are stored on `Image.thumbnails` keyed
+by width.
+
+Requires Pillow (pip install "syth-data[thumbnails]"); without it the service
+is disabled and responses simply carry no thumbnail fields.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from ..core import config
+from .storage import thumbnail_dir
+
+try:
+    from PIL import Image as PILImage, features as pil_features
+except ImportError:  # Optional dependency
+    PILImage = None
+    pil_features = None
+
+logger = logging.getLogger("thumbnails")
+
+
+def _resolve_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    if fmt == "avif" and not (pil_features and pil_features.check("avif")):
+        return "webp"
+    return fmt
+
+
+def render_thumbnails(
+    source_path: str,
+    dest_dir: str,
+    stem: str,
+    widths: List[int],
+    fmt: str,
+    quality: int
+) -> Dict[str, str]:
+    """
+    Render one derivative per width (never upscaled) into `dest_dir`.
+    Runs in a worker process; returns {rendered width: filename}.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    rendered = {}
+    save_options = {"quality": quality}
+    if fmt == "webp":
+        save_options["method"] = 4  # Good size/speed balance for small images
+
+    with PILImage.open(source_path) as src:
+        src.load()
+        if src.mode not in ("RGB", "RGBA"):
+            src = src.convert("RGBA" if "A" in src.getbands() else "RGB")
+
+        for width in sorted(set(widths)):
+            target = min(width, src.width)
+            height = max(1, round(src.height * target / src.width))
+            thumb = src if target == src.width else src.resize((target, height), PILImage.LANCZOS)
+
+            filename = f"{stem}_{target}.{fmt}"
+            final_path = os.path.join(dest_dir, filename)
+            tmp_path = final_path + ".tmp"
+            thumb.save(tmp_path, format=fmt.upper(), **save_options)
+            os.replace(tmp_path, final_path)
+            rendered[str(target)] = filename  # Actual width, used as the srcset descriptor
+
+            if target == src.width:
+                break  # Larger widths would be identical copies
+
+    return rendered
+
+
+class ThumbnailService:
+    def __init__(self, widths: List[int], fmt: str, quality: int, workers: int, enabled: bool = True):
+        self.widths = widths
+        self.format = _resolve_format(fmt)
+        self.quality = quality
+        self.workers = workers
+        self.enabled = enabled and PILImage is not None and bool(widths)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        if enabled and PILImage is None:
+            logger.warning("Thumbnails disabled: Pillow is not installed (pip install pillow)")
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the app doesn't fork processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def render(
+        self,
+        category: str,
+        filename: str,
+        source_path: str,
+        is_public: bool = True
+    ) -> Optional[Dict[str, str]]:
+        """Render derivatives for one image; returns the mapping to store on the row."""
+        if not self.enabled or not filename or not os.path.isfile(source_path):
+            return None
+
+        safe_category = (category or "uncategorized").replace("\\", "/")
+        stem = os.path.splitext(filename)[0]
+        dest_dir = thumbnail_dir(category, is_public)
+
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(
+            self._pool(), render_thumbnails,
+            source_path, dest_dir, stem, self.widths, self.format, self.quality
+        )
+        return {width: f"{safe_category}/{name}" for width, name in rendered.items()}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared instance used by the worker and the backfill script
+thumbnail_service = ThumbnailService(
+    widths=config.THUMBNAIL_WIDTHS,
+    fmt=config.THUMBNAIL_FORMAT,
+    quality=config.THUMBNAIL_QUALITY,
+    workers=config.THUMBNAIL_WORKERS,
+    enabled=config.THUMBNAILS_ENABLED
+)
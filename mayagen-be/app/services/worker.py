@@ -1,20 +1,59 @@
 import asyncio
+import itertools
+import mimetypes
 import os
 import logging
+import random
 from datetime import datetime
+from typing import Dict, Iterator, Optional
 from sqlmodel import select
-from sqlalchemy import text
+from sqlalchemy import func, text, update
 from app.database import get_session_context
 from app.models import Image, JobStatus, BatchJob, BatchJobStatus
 from app.core import config
 from app.services.comfy_client import ComfyUIProvider
-from app.services.prompt_generator import generate_prompts
+from app.services.prompt_generator import iter_prompts
+from app.services.prompt_files import discard_prompt_file, iter_prompt_rows
+from app.services.cache import feed_cache
+from app.services.events import publish_image, publish_batch, event_broker, image_topics
+from app.services.progress import progress_table
+from app.services.archive import batch_archives
+from app.services.storage import (
+    hash_file, image_dir, relocate_image_files, resolve_image_path, safe_category_name, store_file, thumbnail_dir
+)
+from app.services.object_storage import IMAGE_MEDIA_TYPES, image_ext, image_key, object_storage, thumbnail_key, visibility_moves
+from app.services.thumbnails import thumbnail_service
+from app.services.duplicates import duplicate_index, format_hash
 
 # Setup Logging
 logger = logging.getLogger("worker")
 
 provider = ComfyUIProvider(config.COMFYUI["server_address"])
 
+# Image rows inserted per transaction when expanding a batch
+EXPAND_CHUNK_SIZE = 500
+
+# Strong references to fire-and-forget tasks (the loop only keeps weak ones)
+_background_tasks = set()
+
+
+def make_progress_callbacks(job: Image):
+    """
+    Provider callbacks (run on the generation thread) that record progress in the
+    in-memory table and push it to stream subscribers. Preview bytes stay in the
+    table; subscribers only get a sequence number to fetch /images/{id}/preview.
+    """
+    topics = image_topics(job.id, job.batch_job_id)
+
+    def on_progress(step: int, max_steps: int):
+        progress_table.update(job.id, step, max_steps)
+        event_broker.publish_threadsafe("progress", {"id": job.id, **(progress_table.get(job.id) or {})}, topics)
+
+    def on_preview(data: bytes, media_type: str):
+        progress_table.set_preview(job.id, data, media_type)
+
+    return on_progress, on_preview
+
 async def process_job(image_id: int):
     """
     Processes a single image job.
@@ -29,11 +68,13 @@ async def process_job(image_id: int):
             return
 
         logger.info(f"Starting Job {job.id} | Prompt: {job.prompt[:30]}...")
+        progress_table.start(job.id)
+        await publish_image(job)
         
         try:
-            # 1. Prepare Paths
-            safe_category = job.category
-            category_dir = os.path.join(config.OUTPUT_FOLDER, safe_category)
+            # 1. Prepare Paths (private images go to the signed-URL-only tree)
+            generated_public = job.is_public
+            category_dir = image_dir(job.category, generated_public)
             os.makedirs(category_dir, exist_ok=True)
             
             # Construct full absolute path
@@ -42,6 +83,7 @@ async def process_job(image_id: int):
             # 2. Check Provider
             if job.provider == "comfyui":
                 workflow_path = config.WORKFLOWS.get(job.model, config.WORKFLOWS["sd15"])
+                on_progress, on_preview = make_progress_callbacks(job)
                 
                 # EXECUTE GENERATION
                 # We pass the full path so ComfyClient saves it in the right folder
@@ -51,7 +93,11 @@ async def process_job(image_id: int):
                     full_output_path, 
                     job.width, 
                     job.height, 
-                    workflow_path
+                    workflow_path,
+                    on_progress,
+                    on_preview,
+                    negative_prompt=job.negative_prompt,
+                    seed=(job.settings or {}).get("seed")
                 )
                 
             else:
@@ -59,30 +105,218 @@ async def process_job(image_id: int):
                 await asyncio.sleep(2)
                 logger.info("Mock generation complete")
 
+            # Visibility may have been changed while generating
+            await session.refresh(job, attribute_names=["is_public"])
+            if job.is_public != generated_public:
+                full_output_path = await asyncio.to_thread(
+                    relocate_image_files, full_output_path, job.category, job.filename, None, job.is_public
+                )
+
+            # Perceptual hash before the image counts as done: a batch may retry a near-duplicate
+            phash = None
+            try:
+                phash = await duplicate_index.compute(full_output_path)
+            except Exception as e:
+                logger.warning(f"Perceptual hash failed for image {job.id}: {e}")
+            if phash is not None and job.batch_job_id and await requeue_if_duplicate(session, job, phash, full_output_path):
+                return
+
+            # Canonical copy goes to the content-addressed store; the view stays at full_output_path
+            if config.STORAGE_DEDUP and os.path.isfile(full_output_path):
+                job.content_hash, duplicate = await asyncio.to_thread(store_file, full_output_path)
+                if duplicate:
+                    logger.info(f"Job {job.id} output is identical to a stored image ({job.content_hash[:12]}), deduplicated")
+
             # 3. Update Success
             job.status = JobStatus.COMPLETED
             job.file_path = full_output_path # Save the absolute path
+            job.phash = format_hash(phash) if phash is not None else None
             job.updated_at = datetime.utcnow()
             session.add(job)
             await session.commit()
+            progress_table.finish(job.id)
+            if phash is not None:
+                duplicate_index.add(job.id, job.batch_job_id, phash)
+                await duplicate_index.maybe_save()
             logger.info(f"Job {job.id} COMPLETED.")
+            await publish_image(job)
+
+            # New public image: cached feed pages are stale
+            if job.is_public:
+                await feed_cache.invalidate()
+
+            # Thumbnails / object-store upload run while the next job starts
+            schedule_post_processing(job)
             
             # 4. Update batch job progress if applicable
             if job.batch_job_id:
+                await append_to_batch_archive(job)
                 await update_batch_progress(job.batch_job_id, success=True)
 
         except Exception as e:
             logger.error(f"Job {job.id} FAILED: {e}")
             job.status = JobStatus.FAILED
             job.error_message = str(e)
+            job.updated_at = datetime.utcnow()
             session.add(job)
             await session.commit()
+            progress_table.finish(job.id)
+            await publish_image(job)
             
             # Update batch job progress
             if job.batch_job_id:
                 await update_batch_progress(job.batch_job_id, success=False)
 
 
+async def requeue_if_duplicate(session, job: Image, phash: int, output_path: str) -> bool:
+    """
+    Send a batch image back to the queue with a new seed if it is a
+    near-duplicate of an earlier image of its batch and the batch asked for
+    it (at most PHASH_MAX_REQUEUES times per image). Returns True if requeued.
+    """
+    settings = job.settings or {}
+    requeues = settings.get("requeues", 0)
+    if requeues >= config.PHASH_MAX_REQUEUES:
+        return False
+    if not duplicate_index.ready:
+        # A partly loaded index would miss most earlier images: don't pretend to check
+        logger.info(f"Near-duplicate index still loading, image {job.id} not checked for duplicates")
+        return False
+    matches = duplicate_index.matches(phash, batch_id=job.batch_job_id, exclude=job.id)
+    if not matches:
+        return False
+
+    result = await session.execute(
+        select(BatchJob.requeue_duplicates, BatchJob.status).where(BatchJob.id == job.batch_job_id)
+    )
+    batch = result.first()
+    if not batch or not batch.requeue_duplicates or batch.status != BatchJobStatus.GENERATING:
+        return False
+
+    try:
+        os.remove(output_path)
+    except OSError:
+        pass
+    duplicate_of, distance = matches[0]
+    job.settings = {**settings, "seed": random.randrange(2 ** 31), "requeues": requeues + 1, "duplicate_of": duplicate_of}
+    job.status = JobStatus.QUEUED
+    job.updated_at = datetime.utcnow()
+    session.add(job)
+    await session.commit()
+    progress_table.finish(job.id)
+    logger.info(f"Job {job.id} is a near-duplicate of image {duplicate_of} ({distance} bits apart), requeued with a new seed")
+    await publish_image(job)
+    return True
+
+
+async def upload_image_files(
+    source_path: str,
+    content_hash: str,
+    thumbnails: Optional[Dict[str, str]],
+    category: str,
+    is_public: bool
+):
+    """Push the original and its thumbnails to the object store (concurrency bounded by the backend)."""
+    ext = image_ext(source_path)
+    uploads = [object_storage.upload(image_key(content_hash, is_public, ext), source_path, IMAGE_MEDIA_TYPES[ext])]
+    for relative in (thumbnails or {}).values():
+        path = os.path.join(thumbnail_dir(category, is_public), os.path.basename(relative))
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        uploads.append(object_storage.upload(thumbnail_key(relative, is_public), path, content_type))
+    await asyncio.gather(*uploads)
+
+
+async def post_process_image(
+    image_id: int,
+    category: str,
+    filename: str,
+    source_path: str,
+    is_public: bool,
+    content_hash: Optional[str]
+):
+    """
+    Off the worker's critical path: render thumbnails, then offload the files to
+    the object store (if not local), then record both on the row.
+    """
+    values = {}
+    thumbnails = None
+    try:
+        thumbnails = await thumbnail_service.render(category, filename, source_path, is_public)
+        if thumbnails:
+            values["thumbnails"] = thumbnails
+    except Exception as e:
+        logger.warning(f"Thumbnail generation failed for image {image_id}: {e}")
+
+    if object_storage.name != "local" and os.path.isfile(source_path):
+        try:
+            if not content_hash:
+                content_hash = await asyncio.to_thread(hash_file, source_path)
+                values["content_hash"] = content_hash
+            await upload_image_files(source_path, content_hash, thumbnails, category, is_public)
+            values["storage_backend"] = object_storage.name
+        except Exception as e:
+            # Stays "local": still served by the media router
+            logger.warning(f"Upload to {object_storage.name} failed for image {image_id}: {e}")
+
+    if not values:
+        return
+
+    try:
+        async with get_session_context() as session:
+            result = await session.execute(select(Image.is_public).where(Image.id == image_id))
+            current_public = result.scalar_one_or_none()
+            if current_public is not None and current_public != is_public:
+                # Visibility changed meanwhile: follow the original's tree / prefix
+                await asyncio.to_thread(relocate_image_files, None, category, None, thumbnails, current_public)
+                if "storage_backend" in values:
+                    await object_storage.move(visibility_moves(content_hash, thumbnails, current_public, image_ext(filename)))
+
+            values["updated_at"] = datetime.utcnow()
+            await session.execute(update(Image).where(Image.id == image_id).values(**values))
+            await session.commit()
+
+        # Feed pages cached since completion have no thumb_url / still local URLs
+        if is_public:
+            await feed_cache.invalidate()
+    except Exception as e:
+        logger.warning(f"Post-processing update failed for image {image_id}: {e}")
+
+
+def schedule_post_processing(job: Image):
+    if not thumbnail_service.enabled and object_storage.name == "local":
+        return
+    task = asyncio.create_task(
+        post_process_image(job.id, job.category, job.filename, job.file_path, job.is_public, job.content_hash)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def append_to_batch_archive(job: Image):
+    """Add a finished image to its batch's prebuilt archive (best effort)."""
+    try:
+        await batch_archives.append(job.batch_job_id, job.id, job.filename, job.file_path)
+    except Exception as e:
+        # The download endpoint falls back to streaming; finalize() fills gaps
+        logger.warning(f"Could not append image {job.id} to batch archive {job.batch_job_id}: {e}")
+
+
+async def finalize_batch_archive(session, batch_id: int):
+    try:
+        result = await session.execute(
+            select(Image.id, Image.filename, Image.category, Image.file_path)
+            .where(Image.batch_job_id == batch_id, Image.status == JobStatus.COMPLETED)
+            .order_by(Image.id)
+        )
+        files = [
+            (row.id, row.filename, resolve_image_path(row.file_path, row.category, row.filename))
+            for row in result.all()
+        ]
+        await batch_archives.finalize(batch_id, files)
+    except Exception as e:
+        logger.warning(f"Could not finalize archive for batch {batch_id}: {e}")
+
+
 async def update_batch_progress(batch_id: int, success: bool):
     """Update batch job progress after an image completes."""
     async with get_session_context() as session:
@@ -95,20 +329,96 @@ async def update_batch_progress(batch_id: int, success: bool):
             else:
                 batch.failed_count += 1
             
-            # Check if batch is complete
+            # Check if batch is complete (a cancelled batch stays CANCELLED)
+            completed = False
+            # Images still running when the batch was cancelled may have
+            # appended to its archive after the cancel discarded it
+            abandoned = batch.status in (BatchJobStatus.CANCELLED, BatchJobStatus.FAILED)
             total_processed = batch.generated_count + batch.failed_count
-            if total_processed >= batch.total_images:
+            if total_processed >= batch.total_images and batch.status == BatchJobStatus.GENERATING:
                 batch.status = BatchJobStatus.COMPLETED
+                completed = True
                 logger.info(f"Batch {batch.id} COMPLETED: {batch.generated_count} success, {batch.failed_count} failed")
             
             batch.updated_at = datetime.utcnow()
             session.add(batch)
             await session.commit()
+            await publish_batch(batch)
+
+            if completed:
+                await finalize_batch_archive(session, batch.id)
+            elif abandoned:
+                await batch_archives.discard(batch.id)
+
+
+def template_images(batch: BatchJob, start: int) -> Iterator[Image]:
+    """Image rows of a template batch from index `start` on."""
+    # Batches created before seeds existed: the id is stable across resumes
+    seed = batch.seed if batch.seed is not None else batch.id
+    prefix = batch.category.replace('/', '_')
+    for choice in iter_prompts(
+        target_subject=batch.target_subject,
+        variations=batch.variations,
+        template=batch.base_prompt_template,
+        seed=seed,
+        start=start,
+        count=batch.total_images - start,
+        weights=batch.weights,
+        exclusions=batch.exclusions
+    ):
+        yield Image(
+            prompt=choice.prompt,
+            filename=f"{prefix}_{batch.id}_{choice.index + 1:04d}.png",
+            category=batch.category,
+            model=batch.model,
+            provider=batch.provider,
+            width=batch.width,
+            height=batch.height,
+            user_id=batch.user_id,
+            batch_job_id=batch.id,
+            status=JobStatus.QUEUED,
+            is_public=batch.is_public,
+            variation_values=choice.variations
+        )
+
+
+def file_images(batch: BatchJob, start: int) -> Iterator[Image]:
+    """
+    Image rows of a prompt-file batch from row `start` on. Every row was
+    validated on upload, so row i of the file is image i of the batch.
+    """
+    defaults = {"model": batch.model, "width": batch.width, "height": batch.height}
+    prefix = batch.category.replace('/', '_')
+    rows = iter_prompt_rows(batch.prompt_file, defaults)
+    for row in itertools.islice(rows, start, batch.total_images):
+        yield Image(
+            prompt=row.prompt,
+            negative_prompt=row.negative_prompt,
+            # Row file names aren't used: outputs of different users share category folders
+            filename=f"{prefix}_{batch.id}_{row.index + 1:04d}.png",
+            # Row categories get the same flat, non-reserved names as /generate jobs
+            category=safe_category_name(row.category) if row.category else batch.category,
+            model=row.model,
+            provider=batch.provider,
+            width=row.width,
+            height=row.height,
+            settings={"seed": row.seed} if row.seed is not None else None,
+            user_id=batch.user_id,
+            batch_job_id=batch.id,
+            status=JobStatus.QUEUED,
+            is_public=batch.is_public
+        )
 
 
 async def process_batch_jobs():
     """
     Poll for QUEUED batch jobs, generate prompts, and create Image records.
+
+    Prompts are streamed and inserted EXPAND_CHUNK_SIZE rows per commit while
+    the batch stays QUEUED; it turns GENERATING once fully expanded. If the
+    process dies halfway, the next poll resumes after the rows already there
+    (prompt i depends only on the seed and i, or is row i of the uploaded
+    prompt file; nothing is replayed).
     """
     async with get_session_context() as session:
         # Find next QUEUED batch job
@@ -123,52 +433,71 @@ async def process_batch_jobs():
         if not batch:
             return False  # No batch jobs to process
         
-        logger.info(f"Processing Batch Job {batch.id}: {batch.name} ({batch.total_images} images)")
-        
         try:
-            # Mark as generating
-            batch.status = BatchJobStatus.GENERATING
-            session.add(batch)
-            await session.commit()
+            start = (await session.execute(
+                select(func.count()).select_from(Image).where(Image.batch_job_id == batch.id)
+            )).scalar_one()
+            if start:
+                logger.info(f"Resuming Batch Job {batch.id}: {batch.name} at image {start + 1}/{batch.total_images}")
+            else:
+                logger.info(f"Processing Batch Job {batch.id}: {batch.name} ({batch.total_images} images)")
             
-            # Generate prompts
-            prompts = generate_prompts(
-                target_subject=batch.target_subject,
-                total_images=batch.total_images,
-                variations=batch.variations,
-                template=batch.base_prompt_template,
-                unique=True
-            )
+            # Read now: the update below clears it on the instance too
+            prompt_file = batch.prompt_file
+            chunk = []
             
-            # Create Image records for each prompt
-            for i, prompt in enumerate(prompts):
-                filename = f"{batch.category.replace('/', '_')}_{batch.id}_{i+1:04d}.png"
-                
-                image = Image(
-                    prompt=prompt,
-                    filename=filename,
-                    category=batch.category,
-                    model=batch.model,
-                    provider=batch.provider,
-                    width=batch.width,
-                    height=batch.height,
-                    user_id=batch.user_id,
-                    batch_job_id=batch.id,
-                    status=JobStatus.QUEUED,
-                    is_public=batch.is_public
-                )
-                session.add(image)
+            async def flush() -> bool:
+                # Cancelled meanwhile: stop expanding (queued rows were cancelled already)
+                status = (await session.execute(
+                    select(BatchJob.status).where(BatchJob.id == batch.id)
+                )).scalar_one()
+                if status != BatchJobStatus.QUEUED:
+                    return False
+                session.add_all(chunk)
+                await session.commit()
+                chunk.clear()
+                return True
             
+            images = file_images(batch, start) if batch.source == "file" else template_images(batch, start)
+            for image in images:
+                chunk.append(image)
+                if len(chunk) >= EXPAND_CHUNK_SIZE and not await flush():
+                    logger.info(f"Batch Job {batch.id} cancelled during expansion")
+                    discard_prompt_file(prompt_file)
+                    return True
+            
+            if chunk and not await flush():
+                logger.info(f"Batch Job {batch.id} cancelled during expansion")
+                discard_prompt_file(prompt_file)
+                return True
+            
+            # Fully expanded: mark as generating (unless cancelled since the last chunk)
+            result = await session.execute(
+                update(BatchJob)
+                .where(BatchJob.id == batch.id, BatchJob.status == BatchJobStatus.QUEUED)
+                .values(status=BatchJobStatus.GENERATING, prompt_file=None, updated_at=datetime.utcnow())
+            )
             await session.commit()
-            logger.info(f"Created {len(prompts)} image jobs for batch {batch.id}")
+            discard_prompt_file(prompt_file)
+            if result.rowcount:
+                await session.refresh(batch)
+                await publish_batch(batch)
+            logger.info(f"Created {batch.total_images - start} image jobs for batch {batch.id}")
             return True
             
         except Exception as e:
             logger.error(f"Batch Job {batch.id} FAILED: {e}")
+            await session.rollback()
+            await session.refresh(batch)
+            discard_prompt_file(batch.prompt_file)
+            batch.prompt_file = None
             batch.status = BatchJobStatus.FAILED
             batch.error_message = str(e)
+            batch.updated_at = datetime.utcnow()
             session.add(batch)
             await session.commit()
+            await publish_batch(batch)
+            await batch_archives.discard(batch.id)
             return False
 
 
@@ -188,7 +517,7 @@ async def worker_loop():
                 # ACID Transaction for Queue Popping
                 statement = text("""
                     UPDATE image
-                    SET status = 'PROCESSING'
+                    SET status = 'PROCESSING', updated_at = (NOW() AT TIME ZONE 'utc')
                     WHERE id = (
                         SELECT id
                         FROM image
@@ -0,0 +1,79 @@
+"""
+Compute perceptual hashes for images generated before near-duplicate
+detection existed, so they show up in /batch/{id}/duplicates.
+
+The server adds rows hashed here to its index on its next start.
+
+Usage:
+    python backfill_phash.py
+"""
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.duplicates import duplicate_index, format_hash
+from app.services.storage import resolve_image_path
+
+PAGE_SIZE = 200
+
+
+async def hash_one(row) -> bool:
+    source_path = resolve_image_path(row.file_path, row.category, row.filename)
+    phash = await duplicate_index.compute(source_path)
+    if phash is None:
+        print(f"⚠️  Skipped image {row.id}: source missing ({source_path})")
+        return False
+
+    async with get_session_context() as session:
+        await session.execute(
+            update(Image)
+            .where(Image.id == row.id)
+            .values(phash=format_hash(phash), updated_at=datetime.utcnow())
+        )
+        await session.commit()
+    return True
+
+
+async def main():
+    if not duplicate_index.enabled:
+        print("❌ Near-duplicate detection is disabled (PHASH_ENABLED=false or Pillow not installed).")
+        return
+
+    done = skipped = 0
+    last_id = 0
+    try:
+        while True:
+            # Keyset pagination: rows updated by this run never shift the pages
+            async with get_session_context() as session:
+                rows = (await session.execute(
+                    select(Image.id, Image.filename, Image.category, Image.file_path)
+                    .where(Image.status == JobStatus.COMPLETED, Image.phash.is_(None), Image.id > last_id)
+                    .order_by(Image.id)
+                    .limit(PAGE_SIZE)
+                )).all()
+
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            results = await asyncio.gather(*(hash_one(row) for row in rows), return_exceptions=True)
+            for row, result in zip(rows, results):
+                if result is True:
+                    done += 1
+                else:
+                    skipped += 1
+                    if isinstance(result, Exception):
+                        print(f"❌ Image {row.id}: {result}")
+            print(f"... {done} hashed, {skipped} skipped (up to id {last_id})")
+    finally:
+        duplicate_index.shutdown()
+
+    print(f"✅ Backfill complete: {done} hashed, {skipped} skipped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
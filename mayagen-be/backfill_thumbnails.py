@@ -0,0 +1,86 @@
+"""
+Render thumbnails for images generated before the thumbnail pipeline existed.
+
+Usage:
+    python backfill_thumbnails.py            # only images without thumbnails
+    python backfill_thumbnails.py --force    # re-render everything (e.g. new widths/format)
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import JSON, or_, update
+from sqlmodel import select
+
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.storage import resolve_image_path
+from app.services.thumbnails import thumbnail_service
+
+PAGE_SIZE = 200
+
+
+async def render_one(row) -> bool:
+    source_path = resolve_image_path(row.file_path, row.category, row.filename)
+    thumbnails = await thumbnail_service.render(row.category, row.filename, source_path, row.is_public)
+    if not thumbnails:
+        print(f"⚠️  Skipped image {row.id}: source missing ({source_path})")
+        return False
+
+    async with get_session_context() as session:
+        await session.execute(
+            update(Image)
+            .where(Image.id == row.id)
+            .values(thumbnails=thumbnails, updated_at=datetime.utcnow())
+        )
+        await session.commit()
+    return True
+
+
+async def main(force: bool):
+    if not thumbnail_service.enabled:
+        print("❌ Thumbnails are disabled (THUMBNAILS_ENABLED=false or Pillow not installed).")
+        return
+
+    done = skipped = 0
+    last_id = 0
+    try:
+        while True:
+            # Keyset pagination: rows updated by this run never shift the pages
+            async with get_session_context() as session:
+                stmt = (
+                    select(Image.id, Image.filename, Image.category, Image.file_path, Image.is_public)
+                    .where(Image.status == JobStatus.COMPLETED, Image.id > last_id)
+                    .order_by(Image.id)
+                    .limit(PAGE_SIZE)
+                )
+                if not force:
+                    # JSON 'null' too: rows written before the column stored None as SQL NULL
+                    stmt = stmt.where(or_(Image.thumbnails.is_(None), Image.thumbnails == JSON.NULL))
+                rows = (await session.execute(stmt)).all()
+
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            # One page in flight at a time; the process pool bounds CPU use
+            results = await asyncio.gather(*(render_one(row) for row in rows), return_exceptions=True)
+            for row, result in zip(rows, results):
+                if result is True:
+                    done += 1
+                else:
+                    skipped += 1
+                    if isinstance(result, Exception):
+                        print(f"❌ Image {row.id}: {result}")
+            print(f"... {done} rendered, {skipped} skipped (up to id {last_id})")
+    finally:
+        thumbnail_service.shutdown()
+
+    print(f"✅ Backfill complete: {done} rendered, {skipped} skipped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill image thumbnails")
+    parser.add_argument("--force", action="store_true", help="Re-render images that already have thumbnails")
+    args = parser.parse_args()
+    asyncio.run(main(args.force))
@@ -0,0 +1,83 @@
+"""
+Benchmark: auth dependency overhead per request, with and without the token cache.
+
+Measures `deps.get_current_user` end to end (JWT decode + user lookup) against
+a real database. Only the `user` table is touched; a throwaway user is created
+and removed again.
+
+Usage (from mayagen-be/):
+    python -m benchmarks.bench_auth                      # uses DATABASE_URL
+    python -m benchmarks.bench_auth --requests 5000
+    python -m benchmarks.bench_auth --database-url sqlite+aiosqlite:///bench.db
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import config, security
+from app.api import deps
+from app.models import User
+from app.services.auth_cache import auth_cache
+
+
+async def run(database_url: str, requests: int):
+    engine = create_async_engine(database_url)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: User.__table__.create(sync_conn, checkfirst=True))
+
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    async with session_factory() as session:
+        session.add(User(username=username, email=f"{username}@bench.local", hashed_password="x"))
+        await session.commit()
+
+    token = security.create_access_token({"sub": username}, expires_delta=timedelta(minutes=10))
+
+    async def measure(label: str, use_cache: bool) -> float:
+        auth_cache.clear()
+        auth_cache.enabled = use_cache
+        # Warm-up (connection pool, first cache fill)
+        async with session_factory() as session:
+            await deps.get_current_user(token=token, session=session)
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            # New session per request, exactly like the FastAPI dependency
+            async with session_factory() as session:
+                await deps.get_current_user(token=token, session=session)
+        elapsed = time.perf_counter() - start
+        per_request_us = elapsed / requests * 1e6
+        print(f"{label:<22} {per_request_us:10.1f} us/request   ({requests / elapsed:,.0f} req/s)")
+        return per_request_us
+
+    try:
+        print(f"Database: {database_url.split('@')[-1]}  |  {requests} requests\n")
+        uncached = await measure("no cache (before)", use_cache=False)
+        cached = await measure("token cache (after)", use_cache=True)
+        print(f"\nSpeedup: {uncached / cached:.1f}x")
+    finally:
+        auth_cache.enabled = config.AUTH_CACHE_TTL > 0
+        async with session_factory() as session:
+            await session.execute(delete(User).where(User.username == username))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth dependency overhead benchmark")
+    parser.add_argument("--database-url", type=str, default=config.DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://")
+    asyncio.run(run(url, args.requests))
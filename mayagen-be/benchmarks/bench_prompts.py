@@ -0,0 +1,89 @@
+"""
+Benchmark: bulk prompt generation, legacy per-prompt formatting vs compiled templates.
+
+"legacy" is the original generator (random draws, `str.format` per prompt,
+rejection of duplicates) kept here for comparison. "compiled" is the current
+`generate_prompts`, run with numpy (vectorized index pass) and without it.
+
+Usage (from mayagen-be/):
+    python -m benchmarks.bench_prompts
+    python -m benchmarks.bench_prompts --sizes 10000 100000 1000000 --legacy-max 100000
+"""
+
+import argparse
+import random
+import time
+
+from app.services import prompt_generator
+from app.services.prompt_generator import DEFAULT_TEMPLATE, DEFAULT_VARIATIONS, generate_prompts
+
+# Large enough that 1M prompts stay unique (10 * 10 * 10 * 6 * 7 * 400)
+VARIATIONS = {**DEFAULT_VARIATIONS, "lighting": [f"{light} {i}" for light in DEFAULT_VARIATIONS["lighting"] for i in range(400)]}
+
+
+def legacy_single_prompt(target_subject, variations, template=None):
+    template = template or DEFAULT_TEMPLATE
+    replacements = {"target": target_subject}
+    for key, values in variations.items():
+        if values:
+            template_key = key.rstrip('s') if key.endswith('s') else key
+            replacements[template_key] = random.choice(values)
+    for key in ["color", "environment", "action", "style", "lighting", "camera"]:
+        if key not in replacements:
+            default_values = DEFAULT_VARIATIONS.get(key + 's', DEFAULT_VARIATIONS.get(key, [""]))
+            replacements[key] = random.choice(default_values) if default_values else ""
+    return ' '.join(template.format(**replacements).split())
+
+
+def legacy_generate_prompts(target_subject, total_images, variations, template=None):
+    prompts = []
+    seen = set()
+    attempts = 0
+    while len(prompts) < total_images and attempts < total_images * 3:
+        prompt = legacy_single_prompt(target_subject, variations, template)
+        attempts += 1
+        if prompt in seen:
+            continue
+        seen.add(prompt)
+        prompts.append(prompt)
+    while len(prompts) < total_images:
+        prompts.append(legacy_single_prompt(target_subject, variations, template))
+    return prompts
+
+
+def measure(label: str, fn, size: int) -> float:
+    start = time.perf_counter()
+    prompts = fn()
+    elapsed = time.perf_counter() - start
+    unique = len(set(prompts))
+    print(f"  {label:<20} {elapsed * 1000:10.1f} ms   {elapsed / size * 1e6:6.2f} us/prompt   {unique:>9,} unique")
+    return elapsed
+
+
+def run(sizes, legacy_max: int, seed: int):
+    numpy = prompt_generator.np
+    for size in sizes:
+        print(f"\n{size:,} prompts")
+        legacy = None
+        if size <= legacy_max:
+            random.seed(seed)
+            legacy = measure("legacy", lambda: legacy_generate_prompts("cat", size, VARIATIONS), size)
+
+        prompt_generator.np = None
+        pure = measure("compiled (python)", lambda: generate_prompts("cat", size, VARIATIONS, seed=seed), size)
+        prompt_generator.np = numpy
+
+        fastest = pure
+        if numpy is not None:
+            fastest = measure("compiled (numpy)", lambda: generate_prompts("cat", size, VARIATIONS, seed=seed), size)
+        if legacy:
+            print(f"  Speedup vs legacy: {legacy / fastest:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk prompt generation benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="Skip the legacy generator above this size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max, args.seed)
@@ -0,0 +1,73 @@
+"""
+Report storage saved by the background compactor, per category.
+
+Usage:
+    python compaction_report.py          # print savings so far
+    python compaction_report.py --run    # compact all pending images now, then report
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.core import config
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.compactor import compactor
+
+
+async def report():
+    async with get_session_context() as session:
+        result = await session.execute(
+            select(
+                Image.category,
+                func.count().label("images"),
+                func.count(Image.bytes_saved).label("compacted"),
+                func.coalesce(func.sum(Image.bytes_saved), 0).label("saved")
+            )
+            .where(Image.status == JobStatus.COMPLETED)
+            .group_by(Image.category)
+            .order_by(func.coalesce(func.sum(Image.bytes_saved), 0).desc())
+        )
+        rows = result.all()
+
+    if not rows:
+        print("No completed images.")
+        return
+
+    print(f"{'category':<32} {'images':>8} {'compacted':>10} {'saved MB':>10}")
+    for row in rows:
+        print(f"{(row.category or 'uncategorized'):<32} {row.images:>8} {row.compacted:>10} {row.saved / 1024 / 1024:>10.2f}")
+    total = sum(row.saved for row in rows)
+    print(f"💾 Total saved: {total / 1024 / 1024:.2f} MB")
+
+
+async def run_all():
+    if not compactor.enabled:
+        print("❌ Compaction requires Pillow (pip install pillow).")
+        return
+    total = 0
+    try:
+        while True:
+            saved = await compactor.run_once(config.COMPACTOR_BATCH_SIZE)
+            if not saved and not await compactor.pending(1):
+                break
+            total += sum(saved.values())
+            print(f"... saved {total / 1024 / 1024:.2f} MB so far")
+    finally:
+        compactor.shutdown()
+    print(f"✅ Compaction complete ({compactor.format}).")
+
+
+async def main(run: bool):
+    if run:
+        await run_all()
+    await report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compaction savings report")
+    parser.add_argument("--run", action="store_true", help="Compact pending images before reporting")
+    args = parser.parse_args()
+    asyncio.run(main(args.run))
@@ -0,0 +1,65 @@
+"""
+Export completed images as WebDataset tar shards (image + .txt caption +
+.json metadata) with a JSONL or Parquet manifest, ready for training.
+
+The same selection always produces the same shards, so an export can be
+rebuilt from the DB at any time; --resume keeps shards already written.
+
+Usage:
+    python export_dataset.py --out exports/cats --batch 12
+    python export_dataset.py --out exports/animals --category animals --manifest parquet --shard-size-mb 1024
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.dataset_export import MANIFEST_FORMATS, export_dataset
+
+
+async def main(args):
+    if args.batch is None and not args.category:
+        print("❌ Pass --batch and/or --category (use --category / for everything).")
+        return
+
+    started = time.perf_counter()
+
+    def on_shard(info):
+        print(f"📦 {info['name']}: {info['samples']} samples, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+    try:
+        summary = await export_dataset(
+            args.out,
+            batch_id=args.batch,
+            category=None if args.category == "/" else args.category,
+            public_only=args.public_only,
+            shard_size_mb=args.shard_size_mb,
+            shard_max_samples=args.shard_max_samples,
+            workers=args.workers,
+            manifest_format=args.manifest,
+            resume=args.resume,
+            on_shard=on_shard
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return
+
+    if summary["missing_files"]:
+        print(f"⚠️  {summary['missing_files']} images skipped: file missing")
+    print(
+        f"✅ Exported {summary['samples']} samples in {len(summary['shards'])} shards "
+        f"to {args.out} ({time.perf_counter() - started:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export images as WebDataset tar shards")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--batch", type=int, default=None, help="Only images of this batch job")
+    parser.add_argument("--category", type=str, default=None, help="Only this category (and its subcategories)")
+    parser.add_argument("--public-only", action="store_true", help="Skip private images")
+    parser.add_argument("--shard-size-mb", type=int, default=512, help="Target shard size")
+    parser.add_argument("--shard-max-samples", type=int, default=10000, help="Max samples per shard")
+    parser.add_argument("--workers", type=int, default=4, help="Processes writing shards")
+    parser.add_argument("--manifest", choices=MANIFEST_FORMATS, default="jsonl", help="Manifest format (parquet needs pyarrow)")
+    parser.add_argument("--resume", action="store_true", help="Keep shards already in --out")
+    asyncio.run(main(parser.parse_args()))
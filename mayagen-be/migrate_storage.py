@@ -0,0 +1,109 @@
+"""
+Move existing generated files into the content-addressed object store.
+
+For every completed image without a `content_hash`, the file is hashed and
+stored under OUTPUT_FOLDER/_objects/ab/cd/<sha256>.png; the category path it
+was served from becomes a hardlink to that object (duplicates share one).
+
+Usage:
+    python migrate_storage.py                  # migrate + report bytes saved
+    python migrate_storage.py --dry-run        # only count what would be migrated
+    python migrate_storage.py --restore-views  # recreate missing category views from objects
+"""
+import argparse
+import asyncio
+import os
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.storage import resolve_image_path, restore_view, store_file
+
+PAGE_SIZE = 500
+
+
+async def migrate(dry_run: bool):
+    migrated = duplicates = missing = 0
+    saved_bytes = 0
+    last_id = 0
+    while True:
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(Image.id, Image.filename, Image.category, Image.file_path)
+                .where(
+                    Image.status == JobStatus.COMPLETED,
+                    Image.content_hash.is_(None),
+                    Image.id > last_id
+                )
+                .order_by(Image.id)
+                .limit(PAGE_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            for row in rows:
+                path = resolve_image_path(row.file_path, row.category, row.filename)
+                if not os.path.isfile(path):
+                    missing += 1
+                    continue
+                if dry_run:
+                    migrated += 1
+                    continue
+
+                size = os.path.getsize(path)
+                content_hash, duplicate = await asyncio.to_thread(store_file, path)
+                await session.execute(
+                    update(Image).where(Image.id == row.id).values(content_hash=content_hash, file_path=path)
+                )
+                migrated += 1
+                if duplicate:
+                    duplicates += 1
+                    saved_bytes += size
+            await session.commit()
+            print(f"... {migrated} migrated (up to id {last_id})")
+
+    if dry_run:
+        print(f"✅ Would migrate {migrated} images ({missing} files missing).")
+    else:
+        print(f"✅ Migrated {migrated} images: {duplicates} duplicates, "
+              f"{saved_bytes / 1024 / 1024:.1f} MB saved ({missing} files missing).")
+
+
+async def restore_views():
+    restored = lost = 0
+    last_id = 0
+    while True:
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(Image.id, Image.file_path, Image.content_hash)
+                .where(Image.content_hash.is_not(None), Image.id > last_id)
+                .order_by(Image.id)
+                .limit(PAGE_SIZE)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            if row.file_path and os.path.isfile(row.file_path):
+                continue
+            if row.file_path and await asyncio.to_thread(restore_view, row.file_path, row.content_hash):
+                restored += 1
+            else:
+                lost += 1
+                print(f"❌ Image {row.id}: object {row.content_hash} not found")
+
+    print(f"✅ Restored {restored} views ({lost} without an object).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate images to content-addressed storage")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be migrated")
+    parser.add_argument("--restore-views", action="store_true", help="Recreate missing category views")
+    args = parser.parse_args()
+    asyncio.run(restore_views() if args.restore_views else migrate(args.dry_run))
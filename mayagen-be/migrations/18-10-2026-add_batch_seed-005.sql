@@ -0,0 +1,4 @@
+-- Migration: Add seed column to BatchJob table (reproducible prompt sampling)
+-- Date: 18-10-2026
+
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS seed INTEGER;
@@ -0,0 +1,5 @@
+-- Migration: Add source and prompt_file columns to BatchJob table (batches from uploaded prompt files)
+-- Date: 18-10-2026
+
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS source VARCHAR DEFAULT 'template' NOT NULL;
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS prompt_file VARCHAR;
@@ -0,0 +1,5 @@
+-- Migration: Add weights and exclusions columns to BatchJob table (constrained prompt sampling)
+-- Date: 18-10-2026
+
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS weights JSONB;
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS exclusions JSONB;
@@ -0,0 +1,4 @@
+-- Migration: Add bytes_saved column to Image table (background compactor)
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS bytes_saved INTEGER;
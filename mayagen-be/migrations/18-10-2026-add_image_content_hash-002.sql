@@ -0,0 +1,5 @@
+-- Migration: Add content_hash column to Image table (content-addressed storage)
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS content_hash VARCHAR;
+CREATE INDEX IF NOT EXISTS ix_image_content_hash ON image (content_hash);
@@ -0,0 +1,4 @@
+-- Migration: Add storage_backend column to Image table (local disk / S3-compatible store)
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS storage_backend VARCHAR DEFAULT 'local' NOT NULL;
@@ -0,0 +1,4 @@
+-- Migration: Add thumbnails column to Image table
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS thumbnails JSONB;
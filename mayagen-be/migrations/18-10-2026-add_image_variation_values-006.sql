@@ -0,0 +1,4 @@
+-- Migration: Add variation_values column to Image table (structured batch prompt metadata)
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS variation_values JSONB;
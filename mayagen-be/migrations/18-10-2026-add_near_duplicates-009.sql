@@ -0,0 +1,5 @@
+-- Migration: Add phash column to Image table and requeue_duplicates to BatchJob table (near-duplicate detection)
+-- Date: 18-10-2026
+
+ALTER TABLE image ADD COLUMN IF NOT EXISTS phash VARCHAR;
+ALTER TABLE batchjob ADD COLUMN IF NOT EXISTS requeue_duplicates BOOLEAN DEFAULT FALSE NOT NULL;
@@ -0,0 +1,4 @@
+-- Migration: Store missing Image thumbnails as SQL NULL instead of JSON 'null'
+-- Date: 18-10-2026
+
+UPDATE image SET thumbnails = NULL WHERE thumbnails = 'null'::jsonb;
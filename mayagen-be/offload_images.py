@@ -0,0 +1,87 @@
+"""
+Upload existing images (and thumbnails) to the configured object store.
+
+New images are offloaded by the worker; this covers everything generated
+before STORAGE_BACKEND=s3 was enabled. Rows are switched to the new backend
+only after their upload succeeded, so it is safe to interrupt and re-run.
+
+Usage:
+    STORAGE_BACKEND=s3 python offload_images.py
+"""
+import asyncio
+import os
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.object_storage import object_storage
+from app.services.storage import hash_file, resolve_image_path
+from app.services.worker import upload_image_files
+
+PAGE_SIZE = 200
+
+
+async def offload_one(row) -> bool:
+    path = resolve_image_path(row.file_path, row.category, row.filename)
+    if not os.path.isfile(path):
+        print(f"⚠️  Skipped image {row.id}: file missing ({path})")
+        return False
+
+    content_hash = row.content_hash or await asyncio.to_thread(hash_file, path)
+    await upload_image_files(path, content_hash, row.thumbnails, row.category, row.is_public)
+
+    async with get_session_context() as session:
+        await session.execute(
+            update(Image)
+            .where(Image.id == row.id)
+            .values(content_hash=content_hash, storage_backend=object_storage.name)
+        )
+        await session.commit()
+    return True
+
+
+async def main():
+    if object_storage.name == "local":
+        print("❌ STORAGE_BACKEND is 'local': nothing to offload to.")
+        return
+
+    done = skipped = 0
+    last_id = 0
+    while True:
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(
+                    Image.id, Image.filename, Image.category, Image.file_path,
+                    Image.thumbnails, Image.is_public, Image.content_hash
+                )
+                .where(
+                    Image.status == JobStatus.COMPLETED,
+                    Image.storage_backend != object_storage.name,
+                    Image.id > last_id
+                )
+                .order_by(Image.id)
+                .limit(PAGE_SIZE)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        # Upload concurrency is bounded by the backend (S3_UPLOAD_CONCURRENCY)
+        results = await asyncio.gather(*(offload_one(row) for row in rows), return_exceptions=True)
+        for row, result in zip(rows, results):
+            if result is True:
+                done += 1
+            else:
+                skipped += 1
+                if isinstance(result, Exception):
+                    print(f"❌ Image {row.id}: {result}")
+        print(f"... {done} uploaded, {skipped} skipped (up to id {last_id})")
+
+    print(f"✅ Offload complete: {done} uploaded, {skipped} skipped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
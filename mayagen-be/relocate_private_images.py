@@ -0,0 +1,67 @@
+"""
+Move files of existing images into the tree matching their visibility.
+
+Private images (is_public = false) used to sit next to public ones and were
+reachable by anyone through /images. This moves them (and their thumbnails)
+under `_private/`, where they are only served with a signed URL, and moves
+any public image found there back. Safe to run repeatedly.
+
+Usage:
+    python relocate_private_images.py
+    python relocate_private_images.py --dry-run
+"""
+import argparse
+import asyncio
+import os
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.database import get_session_context
+from app.models import Image, JobStatus
+from app.services.storage import image_dir, relocate_image_files
+
+PAGE_SIZE = 500
+
+
+async def main(dry_run: bool):
+    moved = 0
+    last_id = 0
+    while True:
+        async with get_session_context() as session:
+            result = await session.execute(
+                select(Image.id, Image.filename, Image.category, Image.file_path, Image.thumbnails, Image.is_public)
+                .where(Image.status == JobStatus.COMPLETED, Image.id > last_id)
+                .order_by(Image.id)
+                .limit(PAGE_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            for row in rows:
+                expected = os.path.join(image_dir(row.category, row.is_public), row.filename or "")
+                if row.file_path and os.path.abspath(row.file_path) == os.path.abspath(expected):
+                    continue
+                if dry_run:
+                    print(f"Would move image {row.id}: {row.file_path} -> {expected}")
+                    moved += 1
+                    continue
+
+                new_path = await asyncio.to_thread(
+                    relocate_image_files, row.file_path, row.category, row.filename, row.thumbnails, row.is_public
+                )
+                if new_path != row.file_path:
+                    await session.execute(update(Image).where(Image.id == row.id).values(file_path=new_path))
+                    moved += 1
+            await session.commit()
+
+    print(f"✅ {'Would move' if dry_run else 'Moved'} {moved} images.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move image files into their public/private tree")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
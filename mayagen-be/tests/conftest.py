@@ -0,0 +1,48 @@
+import asyncio
+import os
+import tempfile
+
+# Must be set before app.core.config is imported (dotenv never overrides it)
+_DB_DIR = tempfile.mkdtemp(prefix="mayagen_tests_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlmodel import SQLModel
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def db():
+    """Fresh schema on the test database; yields the app's session factory."""
+    from app import models  # noqa: F401  (registers the tables)
+    from app.database import async_session, engine
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+            await conn.run_sync(SQLModel.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(reset())
+    yield async_session
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def media_dirs(tmp_path, monkeypatch):
+    """OUTPUT_FOLDER / THUMBNAILS_DIR in a temp dir."""
+    from app.core import config
+
+    output = tmp_path / "synthetic_dataset"
+    thumbs = tmp_path / "thumbnails"
+    output.mkdir()
+    thumbs.mkdir()
+    monkeypatch.setattr(config, "OUTPUT_FOLDER", str(output))
+    monkeypatch.setattr(config, "THUMBNAILS_DIR", thumbs)
+    return output, thumbs
@@ -0,0 +1,34 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+import pytest
+
+from app.helpers import api_response_helper
+from app.helpers.api_response_helper import api_success, json_dumps
+
+
+@dataclass(slots=True)
+class Item:
+    id: int
+    name: str
+    created_at: datetime
+
+
+CONTENT = {"items": [Item(1, "chat noir", datetime(2026, 10, 18, 12, 0))], "total": 1}
+EXPECTED = {"items": [{"id": 1, "name": "chat noir", "created_at": "2026-10-18T12:00:00"}], "total": 1}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_dumps_with_and_without_orjson(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(api_response_helper, "orjson", None)
+    elif api_response_helper.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    assert json.loads(json_dumps(CONTENT)) == EXPECTED
+
+
+def test_api_success_renders_dataclasses():
+    response = api_success(data=CONTENT)
+    assert json.loads(response.body) == {"success": True, "message": "Success", "data": EXPECTED}
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import os
+import zipfile
+
+from app.services.archive import BatchArchiveStore, stream_zip
+
+
+def test_moved_image_is_archived_once(tmp_path):
+    store = BatchArchiveStore(str(tmp_path / "archives"))
+    public = tmp_path / "cats" / "img_1.png"
+    private = tmp_path / "_private" / "cats" / "img_1.png"
+    public.parent.mkdir(parents=True)
+    private.parent.mkdir(parents=True)
+    public.write_bytes(b"first image")
+    other = tmp_path / "cats" / "img_2.png"
+    other.write_bytes(b"second image")
+
+    asyncio.run(store.append(7, 1, "img_1.png", str(public)))
+    # Owner makes image 1 private before the batch finishes: its file moves
+    public.rename(private)
+    asyncio.run(store.append(7, 1, "img_1.png", str(private)))
+    path = asyncio.run(store.finalize(7, [
+        (1, "img_1.png", str(private)),
+        (2, "img_2.png", str(other)),
+    ]))
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == ["img_1.png", "img_2.png"]
+        assert archive.read("img_1.png") == b"first image"
+
+
+def test_discard_removes_unfinished_archive(tmp_path):
+    store = BatchArchiveStore(str(tmp_path / "archives"))
+    image = tmp_path / "img_1.png"
+    image.write_bytes(b"first image")
+
+    asyncio.run(store.append(7, 1, "img_1.png", str(image)))
+    assert os.path.exists(store.partial_path(7)) and os.path.exists(store.log_path(7))
+
+    asyncio.run(store.discard(7))
+    assert not os.path.exists(store.partial_path(7))
+    assert not os.path.exists(store.log_path(7))
+    assert 7 not in store._locks and 7 not in store._logs
+    assert store.get(7) is None
+
+    # Discarding again (an image finishing after the cancel) is harmless
+    asyncio.run(store.discard(7))
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_streamed_zip_opens_with_zipfile(tmp_path):
+    big = tmp_path / "big.png"
+    big.write_bytes(os.urandom(3000))
+    small = tmp_path / "small.png"
+    small.write_bytes(b"small image")
+    files = [
+        ("img.png", str(big)),
+        ("img.png", str(small)),                       # duplicate name
+        ("gone.png", str(tmp_path / "missing.png")),   # deleted meanwhile
+    ]
+
+    chunks = asyncio.run(_collect(stream_zip(files, chunk_size=1024)))
+
+    # Streamed in pieces, not buffered whole
+    assert len(chunks) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["img.png", "img_1.png"]
+        assert archive.read("img.png") == big.read_bytes()
+        assert archive.read("img_1.png") == b"small image"
+
+
+def test_streamed_zip_of_nothing_is_an_empty_archive():
+    chunks = asyncio.run(_collect(stream_zip([])))
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == []
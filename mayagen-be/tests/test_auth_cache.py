@@ -0,0 +1,44 @@
+import time
+from datetime import datetime
+
+from app.models import User
+from app.services import cache
+from app.services.auth_cache import AuthCache
+
+
+def _user():
+    return User(id=1, username="maya", email="maya@example.com", hashed_password="$2b$secret", created_at=datetime(2026, 1, 1))
+
+
+def test_cached_user_is_a_detached_snapshot():
+    auth = AuthCache(max_entries=8, ttl=60)
+    auth.put("token", _user())
+
+    first, second = auth.get("token"), auth.get("token")
+    assert first.username == "maya" and first.hashed_password == ""
+    first.username = "changed"
+    assert second.username == "maya" and auth.get("token").username == "maya"
+
+
+def test_snapshots_go_stale_for_at_most_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    auth = AuthCache(max_entries=8, ttl=60)
+    auth.put("token", _user())
+
+    now[0] += 59
+    assert auth.get("token") is not None
+    now[0] += 2
+    assert auth.get("token") is None  # Next request reloads the user from the database
+
+
+def test_entries_never_outlive_the_token():
+    auth = AuthCache(max_entries=8, ttl=60)
+    auth.put("expired", _user(), expires_at=time.time() - 1)
+    assert auth.get("expired") is None
+
+
+def test_ttl_zero_disables_the_cache():
+    auth = AuthCache(max_entries=8, ttl=0)
+    auth.put("token", _user())
+    assert auth.get("token") is None
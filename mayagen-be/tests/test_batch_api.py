@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import batch as batch_api, deps
+from app.api.batch import BatchFileCreate, BatchJobCreate
+from app.core import config
+from app.database import engine
+from app.models import BatchJob, BatchJobStatus, User
+from app.services.archive import BatchArchiveStore
+
+
+@pytest.mark.parametrize("category, expected", [
+    ("_private", "private"),
+    ("_objects", "objects"),
+    ("../x", "x"),
+    ("animals/cats", "animalscats"),
+    ("Street Art", "Street_Art"),
+    ("..", "uncategorized"),
+])
+def test_batch_categories_are_flat_folder_names(category, expected):
+    assert BatchFileCreate.model_validate({"category": category}).category == expected
+    template = BatchJobCreate.model_validate({"category": category, "target_subject": "cat", "total_images": 1})
+    assert template.category == expected
+
+
+def test_file_batch_category_defaults_to_uncategorized():
+    assert BatchFileCreate.model_validate({}).category == "uncategorized"
+
+
+def test_cancel_discards_the_unfinished_archive(db, tmp_path, monkeypatch):
+    store = BatchArchiveStore(str(tmp_path / "archives"))
+    monkeypatch.setattr(batch_api, "batch_archives", store)
+    image = tmp_path / "img_1.png"
+    image.write_bytes(b"first image")
+
+    async def create():
+        async with db() as session:
+            user = User(username="maya", email="maya@example.com", hashed_password="x")
+            session.add(user)
+            await session.commit()
+            batch = BatchJob(
+                category="cats", target_subject="cat", total_images=2,
+                status=BatchJobStatus.GENERATING, user_id=user.id
+            )
+            session.add(batch)
+            await session.commit()
+            await store.append(batch.id, 1, "img_1.png", str(image))
+            return user, batch.id
+
+    user, batch_id = asyncio.run(create())
+    asyncio.run(engine.dispose())
+    app = FastAPI()
+    app.include_router(batch_api.router)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+
+    response = TestClient(app).delete(f"/batch/{batch_id}")
+
+    assert response.status_code == 200
+    assert not os.path.exists(store.partial_path(batch_id))
+    assert not os.path.exists(store.log_path(batch_id))
+
+
+def test_prompt_file_over_the_batch_cap_is_rejected(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_IMAGES", 2)
+    monkeypatch.setattr(config, "BATCH_UPLOAD_DIR", tmp_path / "uploads")
+    app = FastAPI()
+    app.include_router(batch_api.router)
+    app.dependency_overrides[deps.get_current_user] = lambda: User(
+        id=1, username="maya", email="maya@example.com", hashed_password=""
+    )
+
+    response = TestClient(app).post(
+        "/batch",
+        files={"file": ("prompts.txt", b"a cat\na dog\na fox\n", "text/plain")},
+        data={"category": "animals"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "At most 2 prompts per file"
+    assert list((tmp_path / "uploads").iterdir()) == []
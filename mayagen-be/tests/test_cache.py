@@ -0,0 +1,72 @@
+import asyncio
+
+from app.helpers.etag_helper import make_etag
+from app.services.cache import MemoryCacheBackend, RedisCacheBackend
+
+
+def test_feed_etags_differ_between_memory_backends():
+    # Two workers (or one worker before and after a restart) each get their own backend
+    first = MemoryCacheBackend(max_entries=8, ttl=30)
+    second = MemoryCacheBackend(max_entries=8, ttl=30)
+
+    first_generation = asyncio.run(first.get_generation())
+    second_generation = asyncio.run(second.get_generation())
+
+    assert make_etag("images", first_generation, 1, 20) != make_etag("images", second_generation, 1, 20)
+
+
+def test_bump_generation_changes_feed_etag():
+    backend = MemoryCacheBackend(max_entries=8, ttl=30)
+    before = asyncio.run(backend.get_generation())
+    after = asyncio.run(backend.bump_generation())
+
+    assert after == before + 1
+    assert make_etag("recent", before, 8) != make_etag("recent", after, 8)
+
+
+class FakeRedis:
+    """The few redis.asyncio calls RedisCacheBackend makes, on a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    async def set(self, key, value, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+def redis_backend(client):
+    backend = RedisCacheBackend.__new__(RedisCacheBackend)
+    backend._client = client
+    backend._prefix = "mayagen:cache:"
+    return backend
+
+
+def test_redis_generation_is_seeded_randomly_when_missing():
+    first = redis_backend(FakeRedis())
+    second = redis_backend(FakeRedis())
+
+    generation = asyncio.run(first.get_generation())
+    assert generation != 0
+    assert asyncio.run(first.get_generation()) == generation
+    assert asyncio.run(second.get_generation()) != generation
+
+
+def test_redis_bump_after_flush_does_not_restart_at_one():
+    client = FakeRedis()
+    backend = redis_backend(client)
+    before = asyncio.run(backend.get_generation())
+    assert asyncio.run(backend.bump_generation()) == before + 1
+
+    client.data.clear()
+    assert asyncio.run(backend.bump_generation()) != 1
@@ -0,0 +1,87 @@
+import json
+import sys
+
+import pytest
+
+from app import cli
+from app.cli import ManifestIndex, entry_key
+from app.services.prompt_files import PromptRow
+
+
+class FakeProvider:
+    """ComfyUI stand-in: writes the prompt as the image, fails prompts listed in `failing`."""
+    failing = set()
+    calls = []
+
+    def __init__(self, host):
+        self.host = host
+
+    def generate(self, prompt, output_path, **kwargs):
+        FakeProvider.calls.append(prompt)
+        if prompt in FakeProvider.failing:
+            raise RuntimeError("ComfyUI unreachable")
+        with open(output_path, "w") as f:
+            f.write(prompt)
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "ComfyUIProvider", FakeProvider)
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    FakeProvider.failing = set()
+    FakeProvider.calls = []
+    prompts = tmp_path / "prompts.txt"
+    output = tmp_path / "out"
+
+    def run(*extra):
+        FakeProvider.calls = []
+        monkeypatch.setattr(sys, "argv", [
+            "cli", "--input", str(prompts), "--output", str(output), "--model", "sd15",
+            "--hosts", "a:8188,b:8188", "--retries", "0", *extra
+        ])
+        cli.run_batch_generation()
+        return sorted(FakeProvider.calls)
+
+    return prompts, output, run
+
+
+def _manifest(output):
+    with open(output / "manifest_prompts_txt.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_resumes_from_the_manifest(run):
+    prompts, output, run = run
+    prompts.write_text("a red cat\na blue dog\na green fox\n")
+    FakeProvider.failing = {"a blue dog"}
+
+    assert run() == ["a blue dog", "a green fox", "a red cat"]
+    records = _manifest(output)
+    assert sorted(record["status"] for record in records) == ["completed", "completed", "failed"]
+    assert {record["host"] for record in records} <= {"a:8188", "b:8188"}
+    assert not list(output.rglob("*.part"))
+
+    # Failed entries are kept failed unless asked to retry them
+    assert run() == []
+    FakeProvider.failing = set()
+    assert run("--retry-failed") == ["a blue dog"]
+
+    # An edited row and a deleted output are generated again
+    prompts.write_text("a red cat\na blue dog\na grey fox\n")
+    next(output.rglob("*a_red_cat.png")).unlink()
+    assert run() == ["a grey fox", "a red cat"]
+
+
+def test_manifest_index_ignores_torn_lines_and_edited_rows(tmp_path):
+    row = PromptRow(index=2, prompt="a red cat", model="sd15", width=512, height=512)
+    edited = PromptRow(index=2, prompt="a red dog", model="sd15", width=512, height=512)
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        json.dumps({"key": entry_key(row), "status": "completed"}) + "\n"
+        + '{"key": "000003-abc'
+    )
+
+    index = ManifestIndex(manifest)
+    assert index.get(entry_key(row)) == ManifestIndex.COMPLETED
+    assert index.get(entry_key(edited)) == 0
+    assert index.get(entry_key(PromptRow(index=9, prompt="x", model="sd15", width=512, height=512))) == 0
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+PILImage = pytest.importorskip("PIL.Image")
+from PIL.PngImagePlugin import PngInfo
+
+from app.services.compactor import compact_file, png_text
+
+
+def _comfy_png(path, text):
+    info = PngInfo()
+    for key, value in text.items():
+        info.add_text(key, value)
+    # Flat colour: compresses far better as lossless WebP than as a plain PNG
+    PILImage.new("RGB", (64, 64), (200, 40, 90)).save(path, format="PNG", pnginfo=info, compress_level=0)
+
+
+@pytest.mark.parametrize("fmt", ["webp", "png"])
+def test_compaction_keeps_comfyui_text_chunks(tmp_path, fmt):
+    text = {
+        "prompt": json.dumps({"3": {"inputs": {"text": "a <cat> & a dog\r\nüber"}}}),
+        "workflow": json.dumps({"nodes": [], "links": []}),
+        "Source Model": "sd15",
+    }
+    source = tmp_path / "img_1.png"
+    _comfy_png(source, text)
+    target = tmp_path / f"img_1.compact.{fmt}"
+
+    sizes = compact_file(str(source), str(target), fmt)
+
+    assert sizes is not None and sizes[1] < sizes[0]
+    with PILImage.open(target) as out:
+        assert png_text(out) == text
+
+
+def test_webp_without_metadata_has_no_xmp(tmp_path):
+    source = tmp_path / "img_2.png"
+    _comfy_png(source, {})
+    target = tmp_path / "img_2.compact.webp"
+
+    assert compact_file(str(source), str(target), "webp") is not None
+    with PILImage.open(target) as out:
+        assert png_text(out) == {}
+        assert not out.info.get("xmp")
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import json
+import os
+import tarfile
+from datetime import datetime
+
+import pytest
+
+from app.database import engine
+from app.models import Image, JobStatus
+from app.services.dataset_export import export_dataset
+
+
+@pytest.fixture
+def images(db, media_dirs):
+    output, _ = media_dirs
+    (output / "cats").mkdir()
+
+    async def create():
+        async with db() as session:
+            for i in range(1, 8):
+                path = output / "cats" / f"img_{i}.png"
+                if i != 3:  # file of image 3 is gone
+                    path.write_bytes(f"png {i}".encode() * i)
+                session.add(Image(
+                    id=i, prompt=f"a cat #{i}", width=512, height=512, model="sd15", provider="mock",
+                    category="cats", filename=path.name, file_path=str(path), batch_job_id=1 if i != 7 else 2,
+                    status=JobStatus.QUEUED if i == 6 else JobStatus.COMPLETED,
+                    created_at=datetime(2026, 10, 18, 12, i), settings={"seed": i}
+                ))
+            await session.commit()
+
+    asyncio.run(create())
+    asyncio.run(engine.dispose())
+
+
+def _export(path, **options):
+    summary = asyncio.run(export_dataset(str(path), batch_id=1, shard_max_samples=2, workers=1, **options))
+    asyncio.run(engine.dispose())
+    return summary
+
+
+def _sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_shards_and_manifest_match_the_selection(images, tmp_path):
+    out = tmp_path / "export"
+    summary = _export(out)
+
+    # Images 1, 2, 4, 5 of batch 1 (3 has no file, 6 isn't completed)
+    assert summary["samples"] == 4
+    assert summary["missing_files"] == 1
+    assert [shard["name"] for shard in summary["shards"]] == ["shard-000000.tar", "shard-000001.tar"]
+    assert json.loads((out / "dataset.json").read_text()) == summary
+
+    for shard in summary["shards"]:
+        assert _sha256(out / shard["name"]) == shard["sha256"]
+        assert (out / shard["name"]).stat().st_size == shard["bytes"]
+    with tarfile.open(out / "shard-000001.tar") as tar:
+        assert tar.getnames() == [
+            "0000000004.png", "0000000004.txt", "0000000004.json",
+            "0000000005.png", "0000000005.txt", "0000000005.json",
+        ]
+        assert tar.extractfile("0000000004.png").read() == b"png 4" * 4
+        assert tar.extractfile("0000000004.txt").read() == b"a cat #4"
+        assert json.loads(tar.extractfile("0000000004.json").read())["seed"] == 4
+
+    manifest = [json.loads(line) for line in (out / "manifest.jsonl").read_text().splitlines()]
+    assert [(record["key"], record["shard"]) for record in manifest] == [
+        ("0000000001", "shard-000000.tar"), ("0000000002", "shard-000000.tar"),
+        ("0000000004", "shard-000001.tar"), ("0000000005", "shard-000001.tar"),
+    ]
+    assert not list(out.glob("*.part"))
+
+
+def test_exports_are_byte_identical_and_resumable(images, tmp_path):
+    first = _export(tmp_path / "first")
+    assert _export(tmp_path / "second")["shards"] == first["shards"]
+
+    out = tmp_path / "first"
+    kept = (out / "shard-000000.tar").stat().st_mtime_ns
+    (out / "shard-000001.tar").unlink()
+    (out / "shard-000001.tar.part").write_bytes(b"interrupted")
+
+    assert _export(out, resume=True)["shards"] == first["shards"]
+    assert (out / "shard-000000.tar").stat().st_mtime_ns == kept
+    assert not (out / "shard-000001.tar.part").exists()
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.models import BatchJob, Image, JobStatus, User
+from app.services import duplicates, worker
+from app.services.duplicates import DuplicateIndex, format_hash
+
+
+@pytest.fixture(params=["numpy", "python"])
+def index(request, tmp_path, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(duplicates, "np", None)
+    elif duplicates.np is None:
+        pytest.skip("numpy not installed")
+    return DuplicateIndex(str(tmp_path / "phash.idx"), max_distance=4, workers=1)
+
+
+def _seed(db, hashes):
+    """One batch with a completed image per hash; returns (batch id, image ids)."""
+    async def create():
+        async with db() as session:
+            user = User(username="maya", email="maya@example.com", hashed_password="x")
+            session.add(user)
+            await session.commit()
+            batch = BatchJob(name="b", category="cats", target_subject="cat", total_images=len(hashes), user_id=user.id)
+            session.add(batch)
+            await session.commit()
+            rows = [
+                Image(prompt="cat", width=512, height=512, model="sd15", provider="mock", status=JobStatus.COMPLETED,
+                      batch_job_id=batch.id, user_id=user.id, phash=format_hash(value))
+                for value in hashes
+            ]
+            session.add_all(rows)
+            await session.commit()
+            return batch.id, [row.id for row in rows]
+    return asyncio.run(create())
+
+
+def test_matches_and_clusters(index):
+    index.add_many([(1, 7, 0b0000), (2, 7, 0b0011), (3, 7, 0xFFFF_0000), (4, 8, 0b0001)])
+
+    assert index.matches(0, batch_id=7) == [(1, 0), (2, 2)]
+    assert index.matches(0, exclude=1) == [(4, 1), (2, 2)]
+    assert index.clusters(7) == [[1, 2]]
+
+
+def test_add_replaces_an_images_earlier_hash(index):
+    index.add(1, 7, 0)
+    index.add(2, 7, 0)
+    index.add(2, 7, 0xFFFF_FFFF)  # Requeued image, new output
+
+    assert index.clusters(7) == []
+    assert index.hashed_count(7) == 2
+
+
+def test_adds_during_load_are_kept_once(db, index, monkeypatch):
+    batch_id, (first, second) = _seed(db, [0, 1])
+    read = index._read
+
+    def read_while_worker_adds():
+        # The worker completes an image while the saved index is being read
+        index.add(second, batch_id, 1)
+        index.add(999, batch_id, 0xFFFF_FFFF_0000_0000)
+        return read()
+    monkeypatch.setattr(index, "_read", read_while_worker_adds)
+
+    asyncio.run(index.start())
+
+    assert index.ready
+    assert index.hashed_count(batch_id) == 3
+    assert index.clusters(batch_id) == [[first, second]]
+
+
+def test_full_rebuild_does_not_duplicate_worker_adds(db, index):
+    batch_id, (first, second, third) = _seed(db, [0, 0xFF00_0000_0000_0000, 0x00FF_0000_0000_0000])
+    index.add(second, batch_id, 0xFF00_0000_0000_0000)
+
+    asyncio.run(index.sync())  # No saved file: full rebuild
+
+    assert index.hashed_count(batch_id) == 3
+    assert index.clusters(batch_id) == []  # Not a false [second, second] cluster
+
+
+def test_requeue_check_waits_for_the_index(monkeypatch):
+    loading = DuplicateIndex("unused.idx", max_distance=4, workers=1)
+    loading.add(1, 7, 0)
+    monkeypatch.setattr(worker, "duplicate_index", loading)
+    job = Image(id=2, prompt="cat", width=512, height=512, model="sd15", provider="mock", batch_job_id=7)
+
+    assert asyncio.run(worker.requeue_if_duplicate(None, job, 0, "unused.png")) is False
@@ -0,0 +1,26 @@
+import asyncio
+
+from app.services.events import Subscription
+
+
+def test_full_subscription_drops_oldest_events():
+    sub = Subscription(["image:1"], max_queue=2)
+    for n in range(3):
+        sub.push({"event": "image", "data": {"id": 1, "n": n}})
+
+    assert [event["data"]["n"] for event in sub.pending()] == [1, 2]
+    # pending() only looks: the events are still delivered
+    assert asyncio.run(sub.get(timeout=0.1))["data"]["n"] == 1
+
+
+def test_get_waits_for_push_and_times_out():
+    async def scenario():
+        sub = Subscription(["batch:1"], max_queue=4)
+        assert await sub.get(timeout=0.01) is None
+
+        asyncio.get_running_loop().call_later(0.01, sub.push, {"event": "batch", "data": {"id": 1}})
+        event = await sub.get(timeout=1)
+        assert event["data"]["id"] == 1
+        assert sub.pending() == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.api import deps, images
+from app.database import engine, get_session
+from app.models import Image, JobStatus, User
+
+
+@pytest.fixture
+def setup(db, media_dirs):
+    output, thumbs = media_dirs
+    (output / "cats").mkdir()
+    view = output / "cats" / "img_1.png"
+    view.write_bytes(b"png bytes")
+    (thumbs / "cats").mkdir()
+    (thumbs / "cats" / "img_1_256.webp").write_bytes(b"webp bytes")
+
+    async def create():
+        async with db() as session:
+            user = User(username="maya", email="maya@example.com", hashed_password="x")
+            session.add(user)
+            await session.commit()
+            img = Image(
+                prompt="a cat", width=512, height=512, model="sd15", provider="mock", category="cats",
+                filename="img_1.png", file_path=str(view), status=JobStatus.COMPLETED,
+                thumbnails={"256": "cats/img_1_256.webp"}, user_id=user.id
+            )
+            session.add(img)
+            await session.commit()
+            return user, img.id
+        
+    user, image_id = asyncio.run(create())
+    asyncio.run(engine.dispose())
+
+    app = FastAPI()
+    app.include_router(images.router)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+    return TestClient(app), db, image_id, output, thumbs
+
+
+def _row(db, image_id):
+    async def load():
+        async with db() as session:
+            return (await session.execute(select(Image).where(Image.id == image_id))).scalars().one()
+    row = asyncio.run(load())
+    asyncio.run(engine.dispose())
+    return row
+
+
+def test_making_an_image_private_moves_its_files(setup):
+    client, db, image_id, output, thumbs = setup
+
+    response = client.patch(f"/images/{image_id}", json={"is_public": False})
+
+    assert response.status_code == 200
+    row = _row(db, image_id)
+    assert row.is_public is False
+    assert row.file_path == str(output / "_private" / "cats" / "img_1.png")
+    assert (output / "_private" / "cats" / "img_1.png").read_bytes() == b"png bytes"
+    assert not (output / "cats" / "img_1.png").exists()
+    assert (thumbs / "_private" / "cats" / "img_1_256.webp").exists()
+
+
+def test_failed_commit_leaves_files_in_place(setup, monkeypatch):
+    client, db, image_id, output, thumbs = setup
+
+    async def failing_session():
+        async for session in get_session():
+            async def fail():
+                raise RuntimeError("database went away")
+            monkeypatch.setattr(session, "commit", fail)
+            yield session
+    client.app.dependency_overrides[get_session] = failing_session
+
+    response = client.patch(f"/images/{image_id}", json={"is_public": False})
+
+    assert response.status_code == 500
+    assert (output / "cats" / "img_1.png").exists()
+    assert not (output / "_private").exists()
+    row = _row(db, image_id)
+    assert row.is_public is True and row.file_path == str(output / "cats" / "img_1.png")
+
+
+def test_failed_move_reverts_row_and_files(setup, monkeypatch):
+    client, db, image_id, output, thumbs = setup
+    relocate = images.relocate_image_files
+    calls = []
+
+    def move_then_fail(*args):
+        calls.append(args)
+        result = relocate(*args)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return result
+    monkeypatch.setattr(images, "relocate_image_files", move_then_fail)
+
+    response = client.patch(f"/images/{image_id}", json={"is_public": False})
+
+    assert response.status_code == 500
+    assert len(calls) == 2  # The move, then the move back
+    assert (output / "cats" / "img_1.png").exists()
+    assert (thumbs / "cats" / "img_1_256.webp").exists()
+    row = _row(db, image_id)
+    assert row.is_public is True and row.file_path == str(output / "cats" / "img_1.png")
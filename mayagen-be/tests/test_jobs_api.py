@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import deps, jobs
+from app.core import config
+from app.models import User
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[deps.get_current_user] = lambda: User(
+        id=1, username="maya", email="maya@example.com", hashed_password=""
+    )
+    return TestClient(app)
+
+
+def _job(**overrides):
+    return {"prompt": "a cat", "model": "sd15", **overrides}
+
+
+def test_bulk_json_queues_every_job(client):
+    response = client.post("/generate/bulk", json=[_job(), _job(category="../dogs")])
+
+    assert response.status_code == 200
+    assert response.json()["data"]["count"] == 2
+
+
+def test_bulk_rejects_invalid_rows_with_their_numbers(client):
+    response = client.post("/generate/bulk", json=[_job(), _job(width=4096), _job(model="nope")])
+
+    assert response.status_code == 400
+    assert [error["row"] for error in response.json()["error"]] == [1, 2]
+
+
+def test_bulk_over_the_job_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(config, "BULK_MAX_JOBS", 2)
+    body = "\n".join(json.dumps(_job()) for _ in range(3))
+
+    response = client.post("/generate/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_bulk_body_over_the_byte_cap_is_413(client, monkeypatch, content_type):
+    monkeypatch.setattr(config, "BULK_MAX_BODY_BYTES", 1024)
+    jobs_list = [_job(prompt="x" * 100) for _ in range(20)]
+    body = json.dumps(jobs_list) if content_type == "application/json" else "\n".join(map(json.dumps, jobs_list))
+
+    # Declared length
+    response = client.post("/generate/bulk", content=body, headers={"Content-Type": content_type})
+    assert response.status_code == 413
+
+    # Chunked upload without Content-Length: cut off while streaming
+    def chunks():
+        for start in range(0, len(body), 256):
+            yield body[start:start + 256].encode()
+    response = client.post("/generate/bulk", content=chunks(), headers={"Content-Type": content_type})
+    assert response.status_code == 413
+
+
+def test_single_generate_validates_like_bulk(client):
+    response = client.post("/generate", json=_job(width=4096))
+    assert response.status_code == 400
+
+    response = client.post("/generate", json=_job(model="nope"))
+    assert response.status_code == 400
+
+    assert client.post("/generate", json=_job()).status_code == 200
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import media
+from app.services.storage import object_path
+
+CONTENT_HASH = "ab" * 32
+
+
+@pytest.fixture
+def client(media_dirs, monkeypatch):
+    output = media_dirs[0]
+    monkeypatch.setitem(media.MEDIA_ROOTS, "images", os.path.realpath(output))
+    obj = object_path(CONTENT_HASH)
+    os.makedirs(os.path.dirname(obj))
+    with open(obj, "wb") as f:
+        f.write(b"\x89PNG fake image bytes")
+    os.makedirs(os.path.join(output, "cats"))
+    os.link(obj, os.path.join(output, "cats", "img_1.png"))
+    with open(os.path.join(output, "cats", "img_2.png"), "wb") as f:
+        f.write(b"\x89PNG other bytes")
+    app = FastAPI()
+    app.include_router(media.router)
+    return TestClient(app)
+
+
+def test_content_hash_version_is_immutable(client):
+    response = client.get(f"/images/cats/img_1.png?v={CONTENT_HASH}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == media.CACHE_CONTROL
+    assert response.headers["etag"] == f'"{CONTENT_HASH}"'
+
+
+@pytest.mark.parametrize("path,version", [
+    ("cats/img_2.png", CONTENT_HASH),   # hash of another file
+    ("cats/img_1.png", "cd" * 32),      # no such object
+    ("cats/img_1.png", "0123456789abcdef"),
+    ("cats/img_1.png", "../" * 21 + "a"),
+])
+def test_unverified_version_must_revalidate(client, path, version):
+    response = client.get(f"/images/{path}", params={"v": version})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == media.UNVERSIONED_CACHE_CONTROL
+
+
+def test_unversioned_category_path_must_revalidate(client):
+    # The file leaves this path when the owner makes the image private
+    response = client.get("/images/cats/img_1.png")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers["cache-control"]
+    assert response.headers["cache-control"] == media.UNVERSIONED_CACHE_CONTROL
+
+    revalidated = client.get("/images/cats/img_1.png", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
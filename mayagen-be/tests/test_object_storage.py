@@ -0,0 +1,95 @@
+import asyncio
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.core import config
+from app.services.object_storage import StorageBackend, image_key, visibility_moves
+
+HASH = "ab" * 32
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    # S3 API stand-in (pip install "moto[s3]")
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    from app.services.object_storage import S3StorageBackend
+
+    monkeypatch.setattr(config, "S3_BUCKET", "mayagen-test")
+    monkeypatch.setattr(config, "S3_ENDPOINT_URL", None)
+    monkeypatch.setattr(config, "S3_ACCESS_KEY_ID", "testing")
+    monkeypatch.setattr(config, "S3_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(config, "S3_PREFIX", "mayagen/")
+    monkeypatch.setattr(config, "S3_PUBLIC_URL", None)
+    with moto.mock_aws():
+        boto3.client("s3", region_name=config.S3_REGION).create_bucket(Bucket="mayagen-test")
+        yield S3StorageBackend()
+
+
+def _keys(backend):
+    listing = backend.client.list_objects_v2(Bucket=backend.bucket)
+    return sorted(item["Key"] for item in listing.get("Contents", []))
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(StorageBackend):
+        async def upload(self, key, path, content_type):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_upload_is_content_addressed(s3, tmp_path):
+    image = tmp_path / "img_1.png"
+    image.write_bytes(b"png bytes")
+    key = image_key(HASH, True)
+
+    asyncio.run(s3.upload(key, str(image), "image/png"))
+    head = s3.client.head_object(Bucket=s3.bucket, Key="mayagen/" + key)
+    assert head["ContentType"] == "image/png"
+    assert "immutable" in head["CacheControl"]
+
+    # Same key again: already there, not re-sent
+    image.write_bytes(b"other bytes")
+    asyncio.run(s3.upload(key, str(image), "image/png"))
+    body = s3.client.get_object(Bucket=s3.bucket, Key="mayagen/" + key)["Body"].read()
+    assert body == b"png bytes"
+
+
+def test_visibility_move_keeps_shared_objects(s3, tmp_path):
+    image = tmp_path / "img_1.png"
+    image.write_bytes(b"png bytes")
+    thumb = tmp_path / "img_1_256.webp"
+    thumb.write_bytes(b"webp bytes")
+    thumbnails = {"256": "cats/img_1_256.webp"}
+
+    async def run():
+        await s3.upload(image_key(HASH, True), str(image), "image/png")
+        await s3.upload("public/thumbs/cats/img_1_256.webp", str(thumb), "image/webp")
+        # Another public image still shares the object: copy it, don't delete it
+        await s3.move(visibility_moves(HASH, thumbnails, to_public=False), keep=[image_key(HASH, True)])
+
+    asyncio.run(run())
+    assert _keys(s3) == sorted([
+        "mayagen/" + image_key(HASH, True),
+        "mayagen/" + image_key(HASH, False),
+        "mayagen/private/thumbs/cats/img_1_256.webp",
+    ])
+
+    asyncio.run(s3.delete([image_key(HASH, True)]))
+    assert "mayagen/" + image_key(HASH, True) not in _keys(s3)
+
+
+def test_urls_are_presigned_without_a_public_base(s3, monkeypatch):
+    assert s3.public_urls_expire
+    url = s3.url(image_key(HASH, True), True)
+    query = parse_qs(urlparse(url).query)
+    assert urlparse(url).path.endswith("/mayagen/" + image_key(HASH, True))
+    assert "X-Amz-Signature" in query
+
+    s3.public_url = "https://cdn.example.com"
+    assert s3.url(image_key(HASH, True), True) == "https://cdn.example.com/mayagen/" + image_key(HASH, True)
+    # Private objects are always presigned
+    assert "X-Amz-Signature" in s3.url(image_key(HASH, False), False)
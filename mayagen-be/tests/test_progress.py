@@ -0,0 +1,56 @@
+from app.services.progress import ProgressTable
+
+
+def test_progress_is_tracked_until_the_job_finishes():
+    table = ProgressTable()
+    table.start(1)
+    table.update(1, 5, 20)
+
+    progress = table.get(1)
+    assert progress["step"] == 5
+    assert progress["max_steps"] == 20
+    assert progress["percent"] == 25.0
+    assert progress["eta_seconds"] is not None
+    assert progress["has_preview"] is False
+
+    table.finish(1)
+    assert table.get(1) is None
+    # Late callbacks from the provider thread don't resurrect the entry
+    table.update(1, 6, 20)
+    table.set_preview(1, b"jpeg", "image/jpeg")
+    assert table.get(1) is None
+
+
+def test_new_sampling_pass_restarts_the_eta():
+    table = ProgressTable()
+    table.start(1)
+    table.update(1, 20, 20)
+    table._jobs[1].sampling_since = 0.0
+
+    table.update(1, 20, 20)
+    assert table._jobs[1].sampling_since == 0.0
+    # Hires fix: a second sampler with its own step count
+    table.update(1, 1, 10)
+    assert table._jobs[1].sampling_since > 0.0
+    assert table.get(1)["percent"] == 10.0
+
+
+def test_latest_preview_frame_is_kept():
+    table = ProgressTable()
+    table.start(1)
+    assert table.get_preview(1) is None
+
+    table.set_preview(1, b"first", "image/jpeg")
+    table.set_preview(1, b"second", "image/png")
+
+    assert table.get_preview(1) == (b"second", "image/png")
+    assert table.get(1)["preview_seq"] == 2
+
+
+def test_previews_can_be_disabled():
+    table = ProgressTable(keep_previews=False)
+    table.start(1)
+    table.set_preview(1, b"frame", "image/jpeg")
+
+    assert table.get_preview(1) is None
+    assert table.get(1)["has_preview"] is False
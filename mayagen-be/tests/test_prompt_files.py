@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app.services import prompt_files
+from app.services.prompt_files import count_groups, iter_grouped_rows
+
+DEFAULTS = {"model": "sd15", "width": 512, "height": 512}
+
+
+@pytest.fixture
+def many_sizes(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(60):
+            f.write(json.dumps({"prompt": f"cat {i}", "width": 512 + 64 * (i % 12), "seed": i}) + "\n")
+    return str(path)
+
+
+def _expected(path):
+    rows = list(prompt_files.iter_prompt_rows(path, DEFAULTS))
+    groups = count_groups(path, DEFAULTS)
+    return [row for group in groups for row in rows if row.group == group]
+
+
+def test_many_groups_are_spilled_in_one_pass(many_sizes, monkeypatch):
+    passes = []
+    read = prompt_files.iter_prompt_rows
+
+    def counting(*args, **kwargs):
+        passes.append(1)
+        return read(*args, **kwargs)
+
+    groups = count_groups(many_sizes, DEFAULTS)
+    assert prompt_files.GROUP_PASS_LIMIT < len(groups) <= prompt_files.GROUP_SPILL_LIMIT
+    monkeypatch.setattr(prompt_files, "iter_prompt_rows", counting)
+
+    rows = list(iter_grouped_rows(many_sizes, DEFAULTS, groups))
+
+    assert len(passes) == 1
+    assert rows == _expected(many_sizes)
+
+
+def test_few_groups_make_one_pass_each(many_sizes, monkeypatch):
+    monkeypatch.setattr(prompt_files, "GROUP_PASS_LIMIT", 12)
+    assert list(iter_grouped_rows(many_sizes, DEFAULTS)) == _expected(many_sizes)
+
+
+def test_too_many_groups_keep_file_order(many_sizes, monkeypatch):
+    monkeypatch.setattr(prompt_files, "GROUP_SPILL_LIMIT", 4)
+    rows = list(iter_grouped_rows(many_sizes, DEFAULTS))
+    assert [row.index for row in rows] == list(range(60))
@@ -0,0 +1,179 @@
+import pytest
+
+from app.models import BatchJob
+from app.services import prompt_generator
+from app.services.prompt_generator import (
+    IndexPermutation, PromptSpace, compile_template, estimate_unique_combinations, generate_prompts,
+    iter_prompts, sample_indices
+)
+from app.services.worker import template_images
+
+VARIATIONS = {
+    "colors": ["red", "blue", "green"],
+    "actions": ["sitting", "running"],
+    "environments": ["indoor", "outdoor", "forest", "beach"],
+}
+TEMPLATE = "A {color} {target} {action} in {environment}"
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 64, 1000, 4097])
+def test_index_permutation_is_a_bijection(n):
+    permutation = IndexPermutation(n, seed=42)
+    assert sorted(permutation[i] for i in range(n)) == list(range(n))
+    assert [int(i) for i in permutation.take(0, n)] == [permutation[i] for i in range(n)]
+
+
+def test_index_permutation_depends_only_on_the_seed():
+    assert list(IndexPermutation(1000, 7).take(0, 50)) == list(IndexPermutation(1000, 7).take(0, 50))
+    assert list(IndexPermutation(1000, 7).take(0, 50)) != list(IndexPermutation(1000, 8).take(0, 50))
+    # Any window of the sequence can be computed on its own
+    assert list(IndexPermutation(1000, 7).take(100, 10)) == list(IndexPermutation(1000, 7).take(0, 110))[100:]
+
+
+def test_sample_indices_repeat_only_after_every_index():
+    indices = [int(i) for i in sample_indices(10, 25, seed=3)]
+    assert sorted(indices[:10]) == list(range(10))
+    assert sorted(indices[10:20]) == list(range(10))
+
+
+def test_seeded_prompts_are_reproducible():
+    first = generate_prompts("cat", 12, VARIATIONS, TEMPLATE, seed=5)
+    assert generate_prompts("cat", 12, VARIATIONS, TEMPLATE, seed=5) == first
+    assert generate_prompts("cat", 12, VARIATIONS, TEMPLATE, seed=6) != first
+
+
+def test_first_n_prompts_are_distinct():
+    n = estimate_unique_combinations(VARIATIONS, TEMPLATE)
+    assert n == 3 * 2 * 4
+
+    prompts = generate_prompts("cat", n + 5, VARIATIONS, TEMPLATE, seed=1)
+    assert len(set(prompts[:n])) == n
+    assert set(prompts[n:]) <= set(prompts[:n])
+
+
+def test_overlapping_values_still_render_distinct_prompts():
+    # "big red" + "cat" and "big" + "red cat" render alike from different combinations
+    variations = {"colors": ["big", "big red"], "actions": ["red cat", "cat"]}
+    prompts = generate_prompts("", 3, variations, "{color} {action}", seed=0)
+    assert len(set(prompts)) == 3
+
+
+@pytest.mark.parametrize("template", [
+    "  A {color}   {target}\n{action} in {environment}  ",
+    "{target}: {color}, {action}",
+    "A {color!s} {target} {action:>8} in {environment}",   # str.format path
+])
+def test_compiled_templates_render_like_format(template):
+    compiled = compile_template(template)
+    values = {"color": "deep red", "target": "cat", "action": "running", "environment": "the forest"}
+    assert compiled.render(values) == " ".join(template.format(**values).split())
+
+
+def test_bulk_rendering_matches_single_prompts():
+    space = PromptSpace(VARIATIONS, TEMPLATE)
+    columns = space.unrank(range(space.size))
+    rendered = space.render("cat", columns, space.size)
+    expected = [
+        compile_template(TEMPLATE).render({"target": "cat", **{field: column[i] for field, column in columns.items()}})
+        for i in range(space.size)
+    ]
+    assert rendered == expected
+
+
+def test_numpy_and_pure_python_paths_agree(monkeypatch):
+    if prompt_generator.np is None:
+        pytest.skip("numpy is not installed")
+    with_numpy = generate_prompts("cat", 30, VARIATIONS, TEMPLATE, seed=9)
+    indices = [int(i) for i in IndexPermutation(5000, 9).take(0, 5000)]
+
+    monkeypatch.setattr(prompt_generator, "np", None)
+    assert generate_prompts("cat", 30, VARIATIONS, TEMPLATE, seed=9) == with_numpy
+    assert list(IndexPermutation(5000, 9).take(0, 5000)) == indices
+
+
+@pytest.mark.parametrize("start", [0, 1, 10, 23, 24, 30])
+def test_iter_prompts_resumes_at_any_index(start):
+    # 24 combinations: the later starts cross into the second permutation
+    expected = generate_prompts("cat", 40, VARIATIONS, TEMPLATE, seed=4)[start:]
+    choices = list(iter_prompts("cat", VARIATIONS, TEMPLATE, seed=4, start=start, count=40 - start, chunk_size=7))
+
+    assert [choice.prompt for choice in choices] == expected
+    assert [choice.index for choice in choices] == list(range(start, 40))
+
+
+def test_iter_prompts_reports_the_chosen_values():
+    for choice in iter_prompts("cat", VARIATIONS, TEMPLATE, seed=4, count=24):
+        assert choice.prompt == TEMPLATE.format(target="cat", **choice.variations)
+
+
+def test_template_batch_resume_rebuilds_the_same_rows():
+    batch = BatchJob(
+        id=3, category="animals/cats", target_subject="cat", total_images=30,
+        variations=VARIATIONS, base_prompt_template=TEMPLATE, seed=11, user_id=1
+    )
+    full = [(image.filename, image.prompt) for image in template_images(batch, 0)]
+    resumed = [(image.filename, image.prompt) for image in template_images(batch, 17)]
+
+    assert len(full) == 30
+    assert resumed == full[17:]
+    assert resumed[0][0] == "animals_cats_3_0018.png"
+
+
+EXCLUSIONS = [
+    {"environment": "beach", "action": "sitting"},
+    {"colors": "red", "environments": "forest"},
+]
+
+
+def _excluded(values):
+    return any(all(values[key.rstrip("s")] == value for key, value in rule.items()) for rule in EXCLUSIONS)
+
+
+def test_exclusions_are_never_emitted():
+    n = estimate_unique_combinations(VARIATIONS, TEMPLATE, exclusions=EXCLUSIONS)
+    # 24 minus 3 beach+sitting minus 2 red+forest
+    assert n == 19
+
+    choices = list(iter_prompts("cat", VARIATIONS, TEMPLATE, seed=2, count=2 * n, exclusions=EXCLUSIONS))
+    assert not any(_excluded(choice.variations) for choice in choices)
+    assert len({choice.prompt for choice in choices[:n]}) == n
+
+    weights = {"environments": {"beach": 0.9}}
+    assert not any(
+        "beach" in prompt and "sitting" in prompt
+        for prompt in generate_prompts("cat", 200, VARIATIONS, TEMPLATE, unique=False, seed=2, weights=weights, exclusions=EXCLUSIONS)
+    )
+
+
+def test_weighted_prompts_repeat_only_after_every_combination():
+    weights = {"colors": {"red": 0.8}, "environments": {"indoor": 0.5}}
+    n = estimate_unique_combinations(VARIATIONS, TEMPLATE, weights, EXCLUSIONS)
+    prompts = generate_prompts("cat", n, VARIATIONS, TEMPLATE, seed=3, weights=weights, exclusions=EXCLUSIONS)
+    assert len(set(prompts)) == n
+
+    resumed = [choice.prompt for choice in iter_prompts("cat", VARIATIONS, TEMPLATE, seed=3, start=5, count=n - 5, weights=weights, exclusions=EXCLUSIONS)]
+    assert resumed == prompts[5:]
+
+
+def test_weights_shift_the_value_mix():
+    prompts = generate_prompts("cat", 2000, VARIATIONS, TEMPLATE, unique=False, seed=1, weights={"colors": {"red": 0.8}})
+    share = sum(prompt.startswith("A red ") for prompt in prompts) / len(prompts)
+    assert 0.75 < share < 0.85
+
+
+def test_zero_weights_drop_values():
+    # Unlisted values split the remaining share
+    weights = {"colors": {"red": 0}}
+    assert estimate_unique_combinations(VARIATIONS, TEMPLATE, weights) == 2 * 2 * 4
+    assert all("red" not in prompt for prompt in generate_prompts("cat", 16, VARIATIONS, TEMPLATE, seed=0, weights=weights))
+
+    with pytest.raises(ValueError, match="zero weight"):
+        PromptSpace(VARIATIONS, TEMPLATE, weights={"colors": {"red": 1, "blue": 0, "green": 0}, "actions": {"sitting": 0, "running": 0}})
+
+
+def test_exclusions_that_rule_out_everything_are_rejected():
+    exclusions = [{"action": "sitting"}, {"action": "running"}]
+    with pytest.raises(ValueError, match="No prompt combination"):
+        estimate_unique_combinations(VARIATIONS, TEMPLATE, exclusions=exclusions)
+    # Rules on values or fields the template doesn't have match nothing
+    assert estimate_unique_combinations(VARIATIONS, TEMPLATE, exclusions=[{"action": "flying"}, {"mood": "happy"}]) == 24
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import auth
+from app.core import security
+from app.database import engine
+from app.models import User
+from app.services import rate_limit
+from app.services.rate_limit import SlidingWindowLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_limiter_blocks_until_the_window_slides(clock):
+    limiter = SlidingWindowLimiter(max_hits=2, window_seconds=60)
+    limiter.hit("1.2.3.4")
+    clock.now += 10
+    limiter.hit("1.2.3.4")
+
+    assert limiter.retry_after("1.2.3.4") == 51
+    assert limiter.retry_after("5.6.7.8") is None
+
+    clock.now += 51
+    assert limiter.retry_after("1.2.3.4") is None
+
+
+def test_limiter_reset_and_key_bound(clock):
+    limiter = SlidingWindowLimiter(max_hits=1, window_seconds=60, max_keys=2)
+    limiter.hit("maya")
+    limiter.reset("maya")
+    assert limiter.retry_after("maya") is None
+
+    for key in ("a", "b", "c"):
+        limiter.hit(key)
+    # Least recently seen key forgotten
+    assert limiter.retry_after("a") is None
+    assert limiter.retry_after("c") is not None
+
+
+def test_password_hashing_runs_in_the_pool(monkeypatch):
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)
+
+    async def roundtrip():
+        hashed = await security.get_password_hash_async("secret")
+        return hashed, await security.verify_password_async("secret", hashed), await security.verify_password_async("nope", hashed)
+
+    hashed, ok, wrong = asyncio.run(roundtrip())
+    assert hashed.startswith("$2b$04$")
+    assert ok and not wrong
+
+
+def test_failed_logins_are_throttled_before_hashing(db, monkeypatch):
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(auth, "username_limiter", SlidingWindowLimiter(max_hits=2, window_seconds=60))
+    monkeypatch.setattr(auth, "ip_limiter", SlidingWindowLimiter(max_hits=100, window_seconds=60))
+
+    async def create():
+        async with db() as session:
+            session.add(User(username="maya", email="maya@example.com", hashed_password=security.get_password_hash("secret")))
+            await session.commit()
+
+    asyncio.run(create())
+    asyncio.run(engine.dispose())
+    app = FastAPI()
+    app.include_router(auth.router)
+    client = TestClient(app)
+
+    for _ in range(2):
+        assert client.post("/token", data={"username": "maya", "password": "wrong"}).status_code == 401
+
+    calls = []
+    monkeypatch.setattr(security, "verify_password", lambda *args: calls.append(args) or True)
+    response = client.post("/token", data={"username": "Maya", "password": "secret"})
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    assert calls == []
@@ -0,0 +1,67 @@
+import json
+from dataclasses import asdict
+from datetime import datetime
+from types import SimpleNamespace
+
+from app import schemas
+from app.core.security import media_url_expiry
+from app.helpers.api_response_helper import json_dumps
+from app.models import JobStatus
+
+
+def test_public_urls_do_not_expire_on_local_storage(monkeypatch):
+    monkeypatch.setattr(schemas.object_storage, "public_urls_expire", False)
+    assert schemas.public_url_expiry() is None
+
+
+def test_presigned_public_urls_carry_the_signing_window(monkeypatch):
+    # S3 without S3_PUBLIC_URL: feed ETags must change when the window rolls over
+    monkeypatch.setattr(schemas.object_storage, "public_urls_expire", True)
+    assert schemas.public_url_expiry() == media_url_expiry()
+
+
+def test_public_image_urls_are_versioned_by_content_hash():
+    url = schemas.image_url("cats", "img_1.png", True, "ab" * 32, "local")
+    assert url.endswith("/images/cats/img_1.png?v=" + "ab" * 32)
+
+
+def test_unhashed_public_urls_have_no_version():
+    assert "?" not in schemas.image_url("cats", "img_1.png", True, None, "local")
+    thumb_url, _ = schemas.thumbnail_urls({"256": "cats/img_1_256.webp"}, True, "local")
+    assert "?" not in thumb_url
+
+
+def _image_row(**overrides):
+    row = {
+        "id": 1, "filename": "img_1.png", "category": "cats", "prompt": "a cat", "model": "sd15",
+        "width": 512, "height": 512, "created_at": datetime(2026, 10, 18, 12, 0), "is_public": True,
+        "status": JobStatus.COMPLETED, "thumbnails": {"512": "cats/img_1_512.webp", "256": "cats/img_1_256.webp"},
+        "content_hash": None, "storage_backend": "local",
+    }
+    return SimpleNamespace(**{**row, **overrides})
+
+
+def test_list_columns_leave_out_settings():
+    for columns in (schemas.IMAGE_LIST_COLUMNS, schemas.RECENT_IMAGE_COLUMNS, schemas.BATCH_IMAGE_COLUMNS):
+        assert "settings" not in {column.key for column in columns}
+
+
+def test_list_item_from_row():
+    item = schemas.ImageListItem.from_row(_image_row(), None)
+
+    assert item.url.endswith("/images/cats/img_1.png")
+    assert item.thumb_url.endswith("/thumbs/cats/img_1_256.webp")
+    assert item.srcset.endswith("/thumbs/cats/img_1_512.webp 512w")
+    assert item.created_at == "2026-10-18T12:00:00"
+    assert item.created_by == "Anonymous"
+
+
+def test_unfinished_list_item_has_no_url():
+    item = schemas.ImageListItem.from_row(_image_row(status=JobStatus.PROCESSING, thumbnails=None), "maya")
+    assert item.url is None and item.thumb_url is None
+    assert item.created_by == "maya"
+
+
+def test_list_items_serialize_like_dicts():
+    item = schemas.ImageListItem.from_row(_image_row(), "maya")
+    assert json.loads(json_dumps(item)) == json.loads(json.dumps(asdict(item)))
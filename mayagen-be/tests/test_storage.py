@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+from app.services.storage import (
+    object_path, release_object, restore_view, safe_category_name, store_file
+)
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_identical_outputs_share_one_object(media_dirs):
+    output, _ = media_dirs
+    first = _write(output / "cats" / "img_1.png", b"same pixels")
+    second = _write(output / "dogs" / "img_2.png", b"same pixels")
+
+    content_hash, existed = store_file(first)
+    assert content_hash == hashlib.sha256(b"same pixels").hexdigest()
+    assert not existed
+    assert store_file(second) == (content_hash, True)
+    # Storing again (re-run) is a no-op
+    assert store_file(first) == (content_hash, False)
+
+    obj = object_path(content_hash)
+    assert obj.startswith(os.path.join(str(output), "_objects", content_hash[:2], content_hash[2:4]))
+    assert os.path.samefile(obj, first) and os.path.samefile(obj, second)
+    assert os.stat(obj).st_nlink == 3
+
+
+def test_release_object_only_when_no_view_links_to_it(media_dirs):
+    output, _ = media_dirs
+    first = _write(output / "cats" / "img_1.png", b"same pixels")
+    second = _write(output / "dogs" / "img_2.png", b"same pixels")
+    content_hash, _ = store_file(first)
+    store_file(second)
+
+    os.remove(first)
+    assert not release_object(content_hash)  # img_2 still uses it
+    os.remove(second)
+    assert release_object(content_hash)
+    assert not os.path.exists(object_path(content_hash))
+    assert not release_object(content_hash)
+
+
+def test_restore_view_relinks_a_missing_file(media_dirs):
+    output, _ = media_dirs
+    view = _write(output / "cats" / "img_1.png", b"pixels")
+    content_hash, _ = store_file(view)
+    os.remove(view)
+
+    assert restore_view(view, content_hash)
+    assert os.path.samefile(view, object_path(content_hash))
+    assert not restore_view(view, "00" * 32)
+
+
+def test_categories_never_collide_with_reserved_folders():
+    assert safe_category_name("_objects") == "objects"
+    assert safe_category_name("_private") == "private"
@@ -0,0 +1,61 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services.thumbnails import ThumbnailService, render_thumbnails
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def _png(path, size=(800, 600), mode="RGB"):
+    PIL.new(mode, size, "orange").save(path)
+
+
+def test_render_never_upscales(tmp_path):
+    source = tmp_path / "img_1.png"
+    _png(source)
+
+    rendered = render_thumbnails(str(source), str(tmp_path / "out"), "img_1", [1024, 256, 512, 2048], "webp", 80)
+
+    # 1024 and 2048 collapse into one full-width copy
+    assert rendered == {"256": "img_1_256.webp", "512": "img_1_512.webp", "800": "img_1_800.webp"}
+    with PIL.open(tmp_path / "out" / "img_1_256.webp") as thumb:
+        assert thumb.size == (256, 192)
+    assert not [name for name in os.listdir(tmp_path / "out") if name.endswith(".tmp")]
+
+
+def test_render_converts_palette_images(tmp_path):
+    source = tmp_path / "img_1.png"
+    _png(source, mode="P")
+
+    rendered = render_thumbnails(str(source), str(tmp_path / "out"), "img_1", [128], "webp", 80)
+
+    with PIL.open(tmp_path / "out" / rendered["128"]) as thumb:
+        assert thumb.mode in ("RGB", "RGBA")
+
+
+def test_service_stores_paths_relative_to_the_thumbnail_root(media_dirs):
+    output, thumbs = media_dirs
+    (output / "cats").mkdir()
+    _png(output / "cats" / "img_1.png")
+    service = ThumbnailService(widths=[256], fmt="webp", quality=80, workers=1)
+    try:
+        public = asyncio.run(service.render("cats", "img_1.png", str(output / "cats" / "img_1.png")))
+        private = asyncio.run(service.render("cats", "img_1.png", str(output / "cats" / "img_1.png"), is_public=False))
+        missing = asyncio.run(service.render("cats", "img_2.png", str(output / "cats" / "img_2.png")))
+    finally:
+        service.shutdown()
+
+    assert public == {"256": "cats/img_1_256.webp"}
+    assert (thumbs / "cats" / "img_1_256.webp").is_file()
+    assert private == {"256": "cats/img_1_256.webp"}
+    assert (thumbs / "_private" / "cats" / "img_1_256.webp").is_file()
+    assert missing is None
+
+
+def test_unsupported_avif_falls_back_to_webp(monkeypatch):
+    from app.services import thumbnails
+
+    monkeypatch.setattr(thumbnails.pil_features, "check", lambda feature: False)
+    assert ThumbnailService(widths=[256], fmt="avif", quality=80, workers=1).format == "webp"